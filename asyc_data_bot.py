@@ -1,11 +1,20 @@
-import praw
+import asyncio
 import logging
 import sqlite3
-import random
 import time
 import threading
 import config
-from collections import defaultdict
+import metrics
+from concurrent.futures import ThreadPoolExecutor
+from db_writer import DatabaseWriter
+from seen_index import SeenIndex
+from crawl_checkpoints import HEAD, BACKFILL, load_checkpoint, walk_search
+from reddit_client import RedditPool
+from comment_hydration import CommentHydrator
+from search_index import create_search_index
+from migrations import migrate
+from work_scheduler import WorkScheduler
+from metrics import POSTS_FETCHED, POSTS_SKIPPED
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -49,213 +58,223 @@ def setup_database():
                  (ticker TEXT PRIMARY KEY,
                   last_fetched REAL)''')
 
+    # Full-text indexes over titles, selftext and comment bodies, kept in sync by triggers
+    create_search_index(conn)
+
     conn.commit()
+    # Every table added since (tickers, crawl state, aggregates, ...) comes from the schema migrations
+    migrate(conn)
     return conn
 
-# Check the rate limit and sleep if necessary
-def check_rate_limit(reddit, backoff=2):
-    remaining = int(reddit.auth.limits.get('remaining', 1))
-    reset_time = reddit.auth.limits.get('reset_timestamp', time.time() + 60)
-    current_time = time.time()
-    
-    if remaining < 10:
-        sleep_duration = max(reset_time - current_time, 1)
-        logger.info(f"Rate limit close to being exhausted. Sleeping for {sleep_duration} seconds.")
-        time.sleep(sleep_duration + 5 + (backoff ** 2))
-        return True
-    return False
-
-# Fetch and process Reddit comments for a specific post
-def fetch_comments(post, conn, progress):
-    c = conn.cursor()
-    comment_data = []
-    comments_fetched = 0
-    comments_skipped = 0
-    
-    post.comments.replace_more(limit=None)
-    
-    for comment in post.comments.list()[:10]:
-        c.execute("SELECT comment_id FROM comments WHERE comment_id=?", (comment.id,))
-        if c.fetchone():
-            comments_skipped += 1
-            continue
-
-        comment_data.append({
-            'comment_id': comment.id,
-            'post_id': post.id,
-            'author': comment.author.name if comment.author else None,
-            'body': comment.body,
-            'timestamp': comment.created_utc,
-            'score': comment.score,
-            'permalink': comment.permalink
-        })
-        comments_fetched += 1
-    
-    if comment_data:
-        c.executemany('''INSERT INTO comments (comment_id, post_id, author, body, timestamp, score, permalink)
-                         VALUES (:comment_id, :post_id, :author, :body, :timestamp, :score, :permalink)''', comment_data)
-        conn.commit()
-    
-    progress['comments_fetched'] += comments_fetched
-    progress['comments_skipped'] += comments_skipped
+CRAWL_SECONDS = metrics.REGISTRY.histogram('crawl_unit_seconds', "Wall time of one (ticker, subreddit, query) crawl",
+                                           ['ticker', 'subreddit'])
 
-# Periodic logging of progress
-def log_progress(progress_dict):
+# Periodic logging of progress: the counters only ever grow, so each report is the difference to the last one
+def log_progress(interval=30):
+    last = {}
     while True:
-        time.sleep(30)
-        for ticker, progress in progress_dict.items():
-            logger.debug(f"Progress for {ticker} in the last 30 seconds:\n"
-                         f" - Posts Fetched: {progress['posts_fetched']}\n"
-                         f" - Posts Skipped: {progress['posts_skipped']}\n"
-                         f" - Comments Fetched: {progress['comments_fetched']}\n"
-                         f" - Comments Skipped: {progress['comments_skipped']}")
-            # Reset progress counters
-            progress['posts_fetched'] = 0
-            progress['posts_skipped'] = 0
-            progress['comments_fetched'] = 0
-            progress['comments_skipped'] = 0
-
-# Fetch historical data from Reddit
-def fetch_historical_data(ticker, subreddit_name, progress):
-    conn = setup_database()
-    logger.info(f"Fetching historical data for {ticker} from {subreddit_name}")
-    
-    reddit = praw.Reddit(
-        client_id=config.API_KEYS['reddit_client_id'],
-        client_secret=config.API_KEYS['reddit_client_secret'],
-        user_agent=config.API_KEYS['reddit_user_agent']
-    )
-    
-    queries = config.SETTINGS['tickers_and_keywords'][ticker]
+        time.sleep(interval)
+        totals = metrics.progress_totals()
+        for ticker, counts in totals.items():
+            previous = last.get(ticker, {})
+            delta = {name: count - previous.get(name, 0) for name, count in counts.items()}
+            if not any(delta.values()):
+                continue
+            logger.info(f"Progress for {ticker} in the last {interval} seconds:\n"
+                        f" - Posts Fetched: {delta['posts_fetched']}\n"
+                        f" - Posts Skipped: {delta['posts_skipped']}\n"
+                        f" - Comments Fetched: {delta['comments_fetched']}\n"
+                        f" - Comments Skipped: {delta['comments_skipped']}")
+        last = totals
+
+# Serve collector metrics locally if a port is configured; a second collector on the same port just goes without
+def start_metrics_server():
+    port = config.SETTINGS.get('metrics_port')
+    if port is None:
+        return None
+    try:
+        return metrics.start_http_server(port, host=config.SETTINGS.get('metrics_host', '127.0.0.1'))
+    except OSError as e:
+        logger.warning(f"Could not serve metrics on port {port}: {e}")
+        return None
+
+# Warm-load the shared index of post and comment IDs already stored
+def load_seen_index(conn):
+    return SeenIndex.load(conn,
+                          snapshot_path=config.SETTINGS.get('seen_index_path', 'seen_ids.bloom'),
+                          capacity=config.SETTINGS.get('seen_index_capacity', 5000000),
+                          error_rate=config.SETTINGS.get('seen_index_error_rate', 1e-6))
+
+# Comments are fetched off the crawl path, most discussed posts first
+def start_comment_hydrator(seen, writer):
+    return CommentHydrator(seen, writer, setup_database,
+                           workers=config.SETTINGS.get('comment_workers', 2),
+                           queue_size=config.SETTINGS.get('comment_queue_size', 10000),
+                           limit=config.SETTINGS.get('comments_per_post', 10),
+                           max_depth=config.SETTINGS.get('comment_max_depth', 2)).start()
+
+# Open a checkpointed walk over one search listing (makes no request yet). The walk holds its
+# client from the pool until it ends: its steps run one at a time, possibly on different worker
+# threads, so no client or session is ever used by two threads at once.
+def open_search(reddit, subreddit_name, checkpoint, max_posts):
+    return walk_search(reddit.subreddit(subreddit_name), checkpoint, max_posts)
+
+# Step a search walk to its next post (blocking, runs on a worker thread)
+def next_post(walk):
+    return next(walk, None)
+
+# Run a blocking Reddit call on the worker pool without stalling the event loop
+async def run_blocking(executor, func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+# Store a post unless it has been seen before and queue it for comment hydration; True if it was new
+def store_post(post, ticker, subreddit_name, seen, writer, hydrator):
+    # Known posts are skipped before their comments are fetched
+    if not seen.claim_post(post.id):
+        writer.add_post_tickers(post.id, [ticker], post.created_utc)
+        POSTS_SKIPPED.inc(ticker=ticker, subreddit=subreddit_name)
+        return False
 
-    backoff = 2
+    writer.add_post({
+        'id': post.id,
+        'ticker': ticker,
+        'timestamp': post.created_utc,
+        'title': post.title,
+        'text': post.selftext,
+        'score': post.score,
+        'comments': post.num_comments,
+        'last_fetched': post.created_utc
+    })
+    writer.add_post_tickers(post.id, [ticker], post.created_utc)
+    POSTS_FETCHED.inc(ticker=ticker, subreddit=subreddit_name)
+    logger.info(f'Fetched 1 post for {ticker}')
+
+    hydrator.submit(post, ticker, subreddit_name)
+
+    writer.set_progress(ticker, post.created_utc)
+    return True
+
+# Fetch historical data for one (ticker, subreddit, query) search, resuming from its checkpoint.
+# Returns the number of new posts found above and below the covered range, and the checkpoint
+# (None if it could not be loaded).
+async def fetch_historical_data(ticker, subreddit_name, query, conn, seen, writer, hydrator, pool, executor, semaphore):
+    checkpoint = None
+    reddit = None
+    max_posts = config.SETTINGS.get('crawl_max_posts', 1000)
+    new_posts = {HEAD: 0, BACKFILL: 0}
 
     try:
-        subreddit = reddit.subreddit(subreddit_name)
-        
-        c = conn.cursor()
-        c.execute("SELECT last_fetched FROM progress WHERE ticker=?", (ticker,))
-        last_fetched = c.fetchone()
-        last_fetched = last_fetched[0] if last_fetched else 0
-
-        for query in queries:
-            for post in subreddit.search(query, sort='new', time_filter='all'):
-                #if post.created_utc <= last_fetched:
-                #    continue
-
-                if check_rate_limit(reddit, backoff):
-                    backoff += 1
-                else:
-                    backoff = 2
-                
-                c.execute("SELECT id FROM news WHERE id=?", (post.id,))
-                if c.fetchone():
-                    progress['posts_skipped'] += 1
-                    continue
-                
-                if not post.stickied:
-                    news_data = [{
-                        'id': post.id,
-                        'ticker': ticker,
-                        'timestamp': post.created_utc,
-                        'title': post.title,
-                        'text': post.selftext,
-                        'score': post.score,
-                        'comments': post.num_comments,
-                        'last_fetched': post.created_utc
-                    }]
-                    
-                    c.executemany('''INSERT INTO news (id, ticker, timestamp, title, text, score, comments, last_fetched)
-                                     VALUES (:id, :ticker, :timestamp, :title, :text, :score, :comments, :last_fetched)''', news_data)
-                    conn.commit()
-                    progress['posts_fetched'] += 1
-                    logger.info(f'Fetched 1 post for {ticker}')
-                    fetch_comments(post, conn, progress)
-                    
-                    c.execute("INSERT OR REPLACE INTO progress (ticker, last_fetched) VALUES (?, ?)",
-                              (ticker, post.created_utc))
-                    conn.commit()
+        checkpoint = load_checkpoint(conn, ticker, subreddit_name, query)
+        logger.info(f"Fetching historical data for {ticker} from {subreddit_name} ({query})")
+        reddit = await run_blocking(executor, pool.get)
+        walk = open_search(reddit, subreddit_name, checkpoint, max_posts)
+
+        while True:
+            async with semaphore:
+                item = await run_blocking(executor, next_post, walk)
+            if item is None:
+                break
+            post, phase = item
+
+            if not post.stickied and store_post(post, ticker, subreddit_name, seen, writer, hydrator):
+                new_posts[phase] += 1
+
+            checkpoint.advance(post, phase)
+            writer.save_checkpoint(checkpoint)
     except Exception as e:
-        logger.error(f"Error fetching historical data for {ticker}: {e}")
+        logger.error(f"Error fetching historical data for {ticker} from {subreddit_name}: {e}")
     finally:
-        conn.close()
+        if reddit is not None:
+            pool.put(reddit)
+        # Also records a walk that reached the covered range or the end of the listing
+        if checkpoint is not None:
+            writer.save_checkpoint(checkpoint)
+    return new_posts[HEAD], new_posts[BACKFILL], checkpoint
+
+# Crawl units handed out by the scheduler until the pass quota is used up or nothing is due
+async def crawl_worker(scheduler, quota, conn, seen, writer, hydrator, pool, executor, semaphore):
+    while quota[0] > 0:
+        unit = scheduler.take()
+        if unit is None:
+            return
+        quota[0] -= 1
+
+        ticker, subreddit_name, query = unit
+        started_at = time.time()
+        try:
+            head_new, backfill_new, checkpoint = await fetch_historical_data(
+                ticker, subreddit_name, query, conn, seen, writer, hydrator, pool, executor, semaphore)
+            CRAWL_SECONDS.observe(time.time() - started_at, ticker=ticker, subreddit=subreddit_name)
+            if checkpoint is not None:
+                writer.save_schedule(scheduler.record(unit, started_at, head_new, backfill_new, checkpoint))
+        except Exception as e:
+            logger.error(f"Error crawling {ticker} from {subreddit_name} ({query}): {e}")
+        finally:
+            # A unit that failed before it was recorded is handed out again on a later take()
+            scheduler.release(unit)
 
-# Fetch real-time data from Reddit
-def fetch_realtime_data(ticker, subreddit_name, progress):
+# Run one pass of up to `units_per_pass` crawl units, `concurrency` at a time; returns the units crawled.
+# The writer, comment hydrator and Reddit client pool outlive the pass, so hydration never holds
+# up the next crawl and clients keep their sessions and tokens.
+async def collect(scheduler, concurrency, units_per_pass, seen, writer, hydrator, pool):
     conn = setup_database()
-    c = conn.cursor()
-    backoff = 1
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    quota = [units_per_pass]
 
     try:
-        logger.info(f"Fetching real-time data for {ticker} from {subreddit_name}")
-        
-        reddit = praw.Reddit(
-            client_id=config.API_KEYS['reddit_client_id'],
-            client_secret=config.API_KEYS['reddit_client_secret'],
-            user_agent=config.API_KEYS['reddit_user_agent']
-        )
-        
-        queries = config.SETTINGS['tickers_and_keywords'][ticker]
-
-        subreddit = reddit.subreddit(subreddit_name)
-        
-        for post in subreddit.stream.submissions():
-            if check_rate_limit(reddit, backoff):
-                backoff += 1
-            else:
-                backoff = 1
-            
-            if any(query.lower() in post.title.lower() for query in queries):
-                c.execute("SELECT id FROM news WHERE id=?", (post.id,))
-                if c.fetchone():
-                    progress['posts_skipped'] += 1
-                    continue
-                
-                if not post.stickied:
-                    news_data = [{
-                        'id': post.id,
-                        'ticker': ticker,
-                        'timestamp': post.created_utc,
-                        'title': post.title,
-                        'text': post.selftext,
-                        'score': post.score,
-                        'comments': post.num_comments
-                    }]
-                    
-                    c.executemany('''INSERT INTO news (id, ticker, timestamp, title, text, score, comments)
-                                     VALUES (:id, :ticker, :timestamp, :title, :text, :score, :comments)''', news_data)
-                    conn.commit()
-                    progress['posts_fetched'] += 1
-                    logger.info(f'Fetched 1 post for {ticker}')
-                    
-                    fetch_comments(post, conn, progress)
-    except Exception as e:
-        logger.error(f"Error fetching real-time data for {ticker}: {e}")
+        await asyncio.gather(*[
+            crawl_worker(scheduler, quota, conn, seen, writer, hydrator, pool, executor, semaphore)
+            for _ in range(concurrency)
+        ])
     finally:
+        executor.shutdown(wait=True)
+        # The hydrator keeps claiming comments, so copy the seen index while none is claimed but
+        # unqueued, then flush: every ID in the saved snapshot is in the database
+        with hydrator.claim_lock:
+            snapshot = seen.snapshot(conn)
+        writer.sync()
+        seen.save(conn, snapshot)
         conn.close()
+    return units_per_pass - quota[0]
 
 # Main function to run the bot
 def main():
-    tickers = list(config.SETTINGS['tickers_and_keywords'].keys())
-    subreddits = ['investing', 'stocks', 'news', 'finance', 'technology', 'cryptocurrency']
-    progress_dict = defaultdict(lambda: {'posts_fetched': 0, 'posts_skipped': 0, 'comments_fetched': 0, 'comments_skipped': 0})
-    
+    units = [(ticker, subreddit_name, query)
+             for ticker, queries in config.SETTINGS['tickers_and_keywords'].items()
+             for subreddit_name in config.SETTINGS['subreddits']
+             for query in queries]
+    concurrency = config.SETTINGS.get('collector_concurrency', 8)
+    units_per_pass = config.SETTINGS.get('units_per_pass', len(units))
+    start_metrics_server()
+
     # Start logging thread
-    logging_thread = threading.Thread(target=log_progress, args=(progress_dict,))
+    logging_thread = threading.Thread(target=log_progress)
     logging_thread.daemon = True  # Daemon thread will exit when the main program exits
     logging_thread.start()
 
-    while True:
-        ticker = random.choice(tickers)
-        subreddit_name = random.choice(subreddits)
-
-        # Fetch real-time data
-        # fetch_realtime_data(ticker, subreddit_name, progress_dict[ticker])
+    conn = setup_database()
+    seen = load_seen_index(conn)
+    scheduler = WorkScheduler.load(conn, units, min_interval=config.SETTINGS.get('unit_min_interval', 300))
+    conn.close()
 
-        # Fetch historical data
-        fetch_historical_data(ticker, subreddit_name, progress_dict[ticker])
+    writer = DatabaseWriter(setup_database,
+                            batch_size=config.SETTINGS.get('db_batch_size', 500),
+                            batch_interval=config.SETTINGS.get('db_batch_interval', 1.0)).start()
+    hydrator = start_comment_hydrator(seen, writer)
+    # One client per concurrent walk
+    pool = RedditPool(concurrency)
+    try:
+        while True:
+            # Crawl the units with the most expected new data first
+            if not asyncio.run(collect(scheduler, concurrency, units_per_pass, seen, writer, hydrator, pool)):
+                # Every unit was crawled recently; wait for some to become due again
+                time.sleep(30)
+    finally:
+        # Queued hydration work is kept in comment_hydration and resumed on the next start
+        hydrator.stop(drain=False)
+        writer.stop()
 
-        # Adjust the sleep duration to control the frequency of selecting a new ticker and subreddit
-        #time.sleep(1)
 if __name__ == "__main__":
     main()
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from market_data import get_provider, period_start
+
+logger = logging.getLogger(__name__)
+
+# Local OHLCV bar store. Bars live in one Arrow IPC file per interval and ticker
+# (bars/1d/AAPL.arrow), read through a memory map, so a year of daily bars or months of minute
+# bars loads without parsing. history() asks the market data provider only for bars at or after
+# the newest stored one (that bar may have been partial when it was stored) and merges them in,
+# instead of downloading the whole period on every call. refresh() does the same for a whole
+# universe with one bulk request per group of symbols that need the same span.
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+
+def _to_table(frame, metadata):
+    index = frame.index if frame.index.tz is not None else frame.index.tz_localize('UTC')
+    arrays = [pa.array(index.tz_convert('UTC').as_unit('ns').asi8, type=pa.int64())]
+    for column in COLUMNS:
+        values = frame[column] if column in frame else pd.Series(0.0, index=frame.index)
+        arrays.append(pa.array(values.to_numpy(dtype='float64'), type=pa.float64()))
+    schema = pa.schema([('timestamp', pa.int64())] + [(column, pa.float64()) for column in COLUMNS],
+                       metadata={'bar_store': json.dumps(metadata)})
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _to_frame(table, tz):
+    frame = table.drop(['timestamp']).to_pandas()
+    frame.index = pd.DatetimeIndex(pd.to_datetime(table.column('timestamp').to_numpy(), unit='ns', utc=True)).tz_convert(tz)
+    frame.index.name = 'Date'
+    return frame
+
+
+class BarStore:
+    # refresh_seconds: how long stored bars are served without asking the provider for newer ones.
+    # provider: a market_data provider, yfinance by default.
+    def __init__(self, root='bars', refresh_seconds=900, provider=None):
+        self.root = root
+        self.refresh_seconds = refresh_seconds
+        self.provider = provider or get_provider()
+
+    def path(self, ticker, interval='1d'):
+        return os.path.join(self.root, interval, f"{ticker.replace('/', '_')}.arrow")
+
+    # The stored bars as an Arrow table (zero-copy over the memory map) and the store's metadata
+    def read_table(self, ticker, interval='1d'):
+        try:
+            with pa.memory_map(self.path(ticker, interval)) as source:
+                table = pa.ipc.open_file(source).read_all()
+        except FileNotFoundError:
+            return None, {}
+        return table, json.loads(table.schema.metadata[b'bar_store'])
+
+    def _write(self, ticker, interval, table):
+        path = self.path(ticker, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with pa.OSFile(path + '.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(path + '.tmp', path)
+
+    # What a ticker needs for a request starting at start_ns: ('full', start_ns) when nothing or
+    # not enough is stored, ('delta', newest bar) when the stored bars are due a refresh, else None
+    def _plan(self, table, metadata, start_ns):
+        if table is None or start_ns < metadata['covered_from']:
+            return 'full', start_ns
+        if time.time() - metadata['checked_at'] >= self.refresh_seconds:
+            return 'delta', table.column('timestamp')[-1].as_py()
+        return None
+
+    # Bars for ticker over period as a DataFrame shaped like yf.Ticker(ticker).history(period=...)
+    def history(self, ticker, period='1y', interval='1d'):
+        start = period_start(period)
+        start_ns = start.value if start is not None else 0
+        table, metadata = self.read_table(ticker, interval)
+        plan = self._plan(table, metadata, start_ns)
+        if plan is not None:
+            kind, since = plan
+            frames, errors = self._fetch([ticker], interval, since, period if kind == 'full' else None)
+            if ticker in errors:
+                logger.warning(f"Could not fetch {interval} bars for {ticker}: {errors[ticker]}")
+            if ticker in frames:
+                table, metadata = self._store(ticker, interval, kind, since, frames[ticker], table, metadata)
+        if table is None:
+            return pd.DataFrame(columns=COLUMNS)
+
+        frame = _to_frame(table, metadata['tz'])
+        return frame[frame.index >= start] if start is not None else frame
+
+    # Bring the stored bars of many tickers up to date for period; returns {ticker: error}
+    def refresh(self, tickers, period='1y', interval='1d'):
+        start = period_start(period)
+        start_ns = start.value if start is not None else 0
+        stored, groups = {}, {}
+        for ticker in tickers:
+            table, metadata = stored[ticker] = self.read_table(ticker, interval)
+            plan = self._plan(table, metadata, start_ns)
+            if plan is not None:
+                groups.setdefault(plan, []).append(ticker)
+
+        errors = {}
+        for (kind, since), group in groups.items():
+            frames, group_errors = self._fetch(group, interval, since, period if kind == 'full' else None)
+            errors.update(group_errors)
+            for ticker, frame in frames.items():
+                self._store(ticker, interval, kind, since, frame, *stored[ticker])
+        return errors
+
+    # period when the whole period is wanted, else every bar from since (UTC nanoseconds) on
+    def _fetch(self, tickers, interval, since, period=None):
+        if period is not None:
+            return self.provider.history(tickers, interval, period=period)
+        return self.provider.history(tickers, interval, start=pd.Timestamp(since, tz='UTC') if since else None,
+                                     period=None if since else 'max')
+
+    # Save fetched bars: a full fetch replaces the file, a delta is merged into the stored bars
+    def _store(self, ticker, interval, kind, since, frame, table, metadata):
+        if frame.index.tz is None:
+            frame = frame.tz_localize('UTC')
+        if kind == 'full':
+            metadata = {'tz': str(frame.index.tz or 'UTC'), 'covered_from': since, 'checked_at': time.time()}
+            table = _to_table(frame, metadata)
+            self._write(ticker, interval, table)
+            return table, metadata
+
+        metadata = dict(metadata, checked_at=time.time())
+        timestamps = table.column('timestamp')
+        events = False
+        for column in ('Dividends', 'Stock Splits'):
+            if column in frame:
+                # The refetched last bar only counts if its event is new since it was stored
+                last = frame.index == pd.Timestamp(since, tz='UTC')
+                values = frame[column].where(~last | (frame[column] != table.column(column)[-1].as_py()), 0)
+                events = events or bool((values != 0).any())
+        if events:
+            # Adjusted prices before a split or dividend change, so the stored bars are stale
+            logger.info(f"{ticker} had a split or dividend; refetching its {interval} bars")
+            frames, errors = self._fetch([ticker], interval, metadata['covered_from'])
+            if ticker not in frames:
+                logger.warning(f"Could not refetch {interval} bars for {ticker}: {errors.get(ticker)}")
+                return table, metadata
+            return self._store(ticker, interval, 'full', metadata['covered_from'], frames[ticker], None, None)
+
+        delta = _to_table(frame, metadata)
+        # Stored bars from the first fetched one onward are replaced by their fresh versions
+        keep = int(np.searchsorted(timestamps.to_numpy(), delta.column('timestamp')[0].as_py()))
+        table = pa.concat_tables([table.slice(0, keep).replace_schema_metadata(delta.schema.metadata), delta])
+        logger.info(f"Fetched {delta.num_rows} {interval} bars for {ticker}")
+        self._write(ticker, interval, table)
+        return table, metadata
@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import config
+import reddit_client
+import asyc_data_bot
+import data_collection_bot
+from fake_reddit import CorpusExhausted, FakeRedditSession, RecordingSession, ReplaySession, SyntheticCorpus
+from rate_limiter import shared_budget
+from work_scheduler import WorkScheduler
+
+# Ingest benchmark for both collectors. Runs the real PRAW and collector code against an offline
+# Reddit stand-in (a synthetic corpus or a replayed recording) in a scratch directory and reports
+# posts/sec, comments/sec, database batch commit latency and time spent idle on the rate limit.
+#
+#   python bench_ingest.py                              # synthetic corpus, both collectors
+#   python bench_ingest.py --record reddit.jsonl        # live Reddit, saving every response
+#   python bench_ingest.py --replay reddit.jsonl        # rerun against the saved responses
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def make_session(args):
+    if args.record:
+        return RecordingSession(args.record)
+    if args.replay:
+        return ReplaySession(args.replay, latency=args.latency,
+                             window_quota=args.window_quota, window_seconds=args.window_seconds)
+    keywords = [keyword for keywords in config.SETTINGS['tickers_and_keywords'].values() for keyword in keywords]
+    corpus = SyntheticCorpus(config.SETTINGS['subreddits'], keywords,
+                             posts_per_subreddit=args.posts, comments_per_post=args.comments, seed=args.seed)
+    return FakeRedditSession(corpus, arrivals_per_poll=args.arrivals_per_poll, latency=args.latency,
+                             window_quota=args.window_quota, window_seconds=args.window_seconds)
+
+
+# Historical collector: one scheduler pass over every (ticker, subreddit, query) unit
+def run_historical(args):
+    units = [(ticker, subreddit_name, query)
+             for ticker, queries in config.SETTINGS['tickers_and_keywords'].items()
+             for subreddit_name in config.SETTINGS['subreddits']
+             for query in queries]
+    conn = asyc_data_bot.setup_database()
+    seen = asyc_data_bot.load_seen_index(conn)
+    scheduler = WorkScheduler.load(conn, units)
+    conn.close()
+
+    writer = asyc_data_bot.DatabaseWriter(asyc_data_bot.setup_database,
+                                          batch_size=config.SETTINGS.get('db_batch_size', 500),
+                                          batch_interval=config.SETTINGS.get('db_batch_interval', 1.0)).start()
+    hydrator = asyc_data_bot.start_comment_hydrator(seen, writer)
+    try:
+        asyncio.run(asyc_data_bot.collect(scheduler, args.concurrency, len(units), seen, writer, hydrator,
+                                                reddit_client.RedditPool(args.concurrency)))
+    finally:
+        hydrator.stop()
+        writer.stop()
+    return [writer]
+
+
+# Realtime collector: stream until the stand-in runs out of posts
+def run_realtime(args):
+    conn = data_collection_bot.setup_database()
+    seen = asyc_data_bot.load_seen_index(conn)
+    writer = data_collection_bot.DatabaseWriter(data_collection_bot.setup_database,
+                                                batch_size=config.SETTINGS.get('db_batch_size', 500),
+                                                batch_interval=config.SETTINGS.get('db_batch_interval', 1.0)).start()
+    hydrator = asyc_data_bot.start_comment_hydrator(seen, writer)
+    try:
+        data_collection_bot.fetch_realtime_data(config.SETTINGS['subreddits'], seen, writer, hydrator)
+    except CorpusExhausted as e:
+        logger.info(f"Realtime stream ended: {e}")
+    finally:
+        hydrator.stop()
+        writer.stop()
+        seen.save(conn)
+        conn.close()
+    return [writer]
+
+
+def report(name, elapsed, writers, idle, requests):
+    conn = sqlite3.connect('news_data.db')
+    posts = conn.execute("SELECT COUNT(*) FROM news").fetchone()[0]
+    comments = conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
+    conn.close()
+    latencies = [latency for writer in writers for latency in writer.flush_latencies]
+
+    print(f"{name}:")
+    print(f"  elapsed            {elapsed:10.2f} s")
+    print(f"  reddit requests    {requests:10d}")
+    print(f"  posts              {posts:10d}  ({posts / elapsed:.1f}/s)")
+    print(f"  comments           {comments:10d}  ({comments / elapsed:.1f}/s)")
+    print(f"  db commits         {len(latencies):10d}  "
+          f"(p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+          f"max {max(latencies, default=0) * 1000:.1f} ms)")
+    print(f"  rate-limit idle    {idle:10.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Reddit ingestion against an offline Reddit stand-in")
+    parser.add_argument('--collector', choices=['historical', 'realtime', 'both'], default='both')
+    parser.add_argument('--posts', type=int, default=200, help="synthetic posts per subreddit")
+    parser.add_argument('--comments', type=int, default=20, help="average synthetic comments per post")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.02, help="simulated seconds per Reddit request")
+    parser.add_argument('--window-quota', type=int, default=100000, help="requests allowed per rate-limit window")
+    parser.add_argument('--window-seconds', type=float, default=600.0, help="length of a rate-limit window")
+    parser.add_argument('--arrivals-per-poll', type=int, default=5, help="new posts per realtime stream poll")
+    parser.add_argument('--concurrency', type=int, default=config.SETTINGS.get('collector_concurrency', 8))
+    parser.add_argument('--replay', help="serve Reddit responses from a recording instead of a synthetic corpus")
+    parser.add_argument('--record', help="use live Reddit and append every response to this file")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    logger.setLevel(args.log_level)
+    for path in ('record', 'replay'):
+        if getattr(args, path):
+            setattr(args, path, os.path.abspath(getattr(args, path)))
+
+    collectors = {'historical': run_historical, 'realtime': run_realtime}
+    names = list(collectors) if args.collector == 'both' else [args.collector]
+    start_dir = os.getcwd()
+    for name in names:
+        # Each collector gets a fresh database, seen index and stand-in
+        with tempfile.TemporaryDirectory() as scratch:
+            os.chdir(scratch)
+            try:
+                reddit_client.session = make_session(args)
+                idle_before = shared_budget.wait_seconds
+                start = time.monotonic()
+                writers = collectors[name](args)
+                elapsed = time.monotonic() - start
+                report(name, elapsed, writers, shared_budget.wait_seconds - idle_before,
+                       getattr(reddit_client.session, 'requests', 0))
+            finally:
+                reddit_client.session = None
+                os.chdir(start_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import logging
+import sqlite3
+import time
+import config
+from sentiment_backends import BACKENDS
+from sentiment_model import SentimentModel
+from sentiment_scorer import row_text
+
+# Sentiment inference benchmark. Scores the same texts with each backend, without the result cache,
+# and reports texts/sec, per-call latency percentiles and how often each backend agrees with the
+# first one listed (the eager PyTorch baseline by default) on the label.
+#
+#   python bench_sentiment.py                                  # posts and comments from news_data.db
+#   python bench_sentiment.py --backends pytorch,int8 --threads 4
+#   python bench_sentiment.py --texts headlines.txt            # one text per line
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def load_texts(args):
+    if args.texts:
+        with open(args.texts) as f:
+            return [line.strip() for line in f if line.strip()][:args.limit]
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        posts = conn.execute("SELECT rowid, title, text FROM news ORDER BY random() LIMIT ?", (args.limit // 2,))
+        texts = [row_text('news', row) for row in posts]
+        comments = conn.execute("SELECT rowid, body FROM comments ORDER BY random() LIMIT ?",
+                                (args.limit - len(texts),))
+        texts += [row_text('comments', row) for row in comments]
+    finally:
+        conn.close()
+    return [text for text in texts if text.strip()]
+
+
+# Score texts in calls of call_size; returns (results, per-call latencies, total seconds)
+def run_backend(model, texts, call_size):
+    results, latencies = [], []
+    start = time.perf_counter()
+    for offset in range(0, len(texts), call_size):
+        call_start = time.perf_counter()
+        results += model.predict(texts[offset:offset + call_size])
+        latencies.append(time.perf_counter() - call_start)
+    return results, latencies, time.perf_counter() - start
+
+
+def report(name, texts, latencies, elapsed, results, baseline):
+    print(f"{name}:")
+    print(f"  texts              {len(texts):10d}  ({len(texts) / elapsed:.1f}/s)")
+    print(f"  call latency       p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    if baseline is not None:
+        agree = sum(a['label'] == b['label'] for a, b in zip(results, baseline))
+        drift = max((abs(a['score'] - b['score']) for a, b in zip(results, baseline) if a['label'] == b['label']),
+                    default=0.0)
+        print(f"  label agreement    {agree / len(texts) * 100:9.2f} %  (max score drift {drift:.4f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sentiment inference backends")
+    parser.add_argument('--backends', default=','.join(BACKENDS),
+                        help="comma-separated backends; the first is the baseline for agreement")
+    parser.add_argument('--db', default='news_data.db')
+    parser.add_argument('--texts', help="file with one text per line instead of the database")
+    parser.add_argument('--limit', type=int, default=2000, help="texts to score")
+    parser.add_argument('--call-size', type=int, default=64, help="texts per predict() call")
+    parser.add_argument('--warmup', type=int, default=32, help="texts scored before timing starts")
+    parser.add_argument('--threads', type=int, default=config.SETTINGS.get('sentiment_threads'))
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level)
+    texts = load_texts(args)
+    if not texts:
+        parser.error("no texts to score")
+
+    baseline = None
+    for name in args.backends.split(','):
+        model = SentimentModel(config.SETTINGS.get('sentiment_model_name'),
+                               max_length=config.SETTINGS.get('sentiment_max_length', 512),
+                               window_overlap=config.SETTINGS.get('sentiment_window_overlap', 64),
+                               max_windows=config.SETTINGS.get('sentiment_max_windows', 16),
+                               max_batch_tokens=config.SETTINGS.get('sentiment_batch_tokens', 8192),
+                               max_batch_size=config.SETTINGS.get('sentiment_max_batch_size', 64),
+                               backend=name, threads=args.threads)
+        model.predict(texts[:args.warmup])
+        results, latencies, elapsed = run_backend(model, texts, args.call_size)
+        report(name, texts, latencies, elapsed, results, baseline)
+        if baseline is None:
+            baseline = results
+
+
+if __name__ == "__main__":
+    main()
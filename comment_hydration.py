@@ -0,0 +1,188 @@
+import bisect
+import itertools
+import logging
+import threading
+from praw.models import MoreComments
+from reddit_client import create_reddit
+from metrics import REGISTRY, COMMENTS_FETCHED, COMMENTS_SKIPPED
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+HYDRATION_SECONDS = REGISTRY.histogram('comment_hydration_seconds', "Time to fetch and queue the comments of one post")
+DROPPED = REGISTRY.counter('comment_hydration_dropped_total',
+                           "Posts left in the comment_hydration backlog because the in-memory queue was full")
+PENDING = REGISTRY.gauge('comment_hydration_pending', "Posts waiting for comment hydration")
+
+
+# Fetch the top comments of a post in a single request: Reddit sorts by score and cuts the tree
+# at `limit`, and MoreComments stubs are only expanded (once) if that left too few comments
+def fetch_top_comments(post, limit=10, max_depth=2):
+    post.comment_sort = 'top'
+    post.comment_limit = limit
+
+    def collect():
+        return [comment for comment in post.comments.list()
+                if not isinstance(comment, MoreComments) and getattr(comment, 'depth', 0) <= max_depth]
+
+    comments = collect()
+    if len(comments) < limit and any(isinstance(c, MoreComments) for c in post.comments.list()):
+        post.comments.replace_more(limit=1)
+        comments = collect()
+
+    comments.sort(key=lambda comment: comment.score, reverse=True)
+    return [{
+        'comment_id': comment.id,
+        'post_id': post.id,
+        'author': comment.author.name if comment.author else None,
+        'body': comment.body,
+        'timestamp': comment.created_utc,
+        'score': comment.score,
+        'permalink': comment.permalink
+    } for comment in comments[:limit]]
+
+
+# Deferred comment fetching: fetchers hand posts over and move on, worker threads hydrate the
+# most discussed posts first. Every submitted post is also recorded in the comment_hydration table
+# and removed once its comments are written, so the in-memory queue is only a window on that
+# backlog: when it is full the least discussed post stays in the table, and when it runs dry (or
+# at startup) it is refilled from the table. A post whose fetch fails max_attempts times is given up.
+# Workers fetch by post ID with their own Reddit client, never with the fetcher's.
+class CommentHydrator:
+    def __init__(self, seen, writer, connect, workers=2, queue_size=10000, limit=10, max_depth=2, max_attempts=3):
+        self.seen = seen
+        self.writer = writer
+        self.connect = connect
+        self.workers = workers
+        self.queue_size = queue_size
+        self.limit = limit
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.pending = []  # sorted ascending by (num_comments, score, seq); the last entry is served next
+        self.queued = set()  # post IDs pending or in flight
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.dropped = 0
+        self.backlog = True  # comment_hydration may hold posts that are not queued in memory
+        self.stopping = False
+        self.threads = []
+        self.local = threading.local()
+        # Held from claiming a post's comments until they are queued for writing
+        self.claim_lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"CommentHydrator-{i}")
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        PENDING.set_function(lambda: len(self.pending))
+        return self
+
+    # Queue a post for comment hydration; its comments are counted under ticker and subreddit
+    def submit(self, post, ticker, subreddit):
+        if not post.num_comments:
+            return
+        self.writer.add_hydration(post.id, ticker, subreddit, post.num_comments, post.score)
+        self._queue(post.id, post.num_comments, post.score, ticker, subreddit)
+
+    # Add a post to the in-memory queue; False if the queue is full of more discussed posts,
+    # in which case it only waits in the table
+    def _queue(self, post_id, num_comments, score, ticker, subreddit):
+        entry = (num_comments or 0, score or 0, next(self.counter), post_id, (ticker, subreddit))
+        with self.condition:
+            if post_id in self.queued:
+                return True
+            if len(self.pending) >= self.queue_size:
+                DROPPED.inc()
+                self.dropped += 1
+                self.backlog = True
+                if entry[:3] <= self.pending[0][:3]:
+                    return False
+                self.queued.discard(self.pending.pop(0)[3])
+            bisect.insort(self.pending, entry, key=lambda e: e[:3])
+            self.queued.add(post_id)
+            self.condition.notify()
+            return True
+
+    # Refill the queue with the most discussed posts in comment_hydration that aren't queued yet
+    def _reload(self):
+        # Posts submitted or finished so far must be committed before the table is read
+        self.writer.sync()
+        conn = self.connect()
+        try:
+            rows = conn.execute('''SELECT post_id, num_comments, score, ticker, subreddit FROM comment_hydration
+                                   WHERE attempts < ? ORDER BY num_comments DESC, score DESC LIMIT ?''',
+                                (self.max_attempts, self.queue_size + self.in_flight)).fetchall()
+        finally:
+            conn.close()
+        loaded = [row for row in rows if row[0] not in self.queued]
+        for post_id, num_comments, score, ticker, subreddit in loaded:
+            if not self._queue(post_id, num_comments, score, ticker, subreddit or 'unknown'):
+                break
+        if loaded:
+            logger.info(f"Queued {len(loaded)} posts from the comment hydration backlog")
+        return loaded
+
+    # Stop the workers; with drain=True every queued post is hydrated first. Undrained posts stay
+    # in comment_hydration for the next start.
+    def stop(self, drain=True):
+        with self.condition:
+            if drain:
+                while self.pending or self.in_flight:
+                    self.condition.wait()
+            self.stopping = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+        if self.dropped:
+            logger.warning(f"Left {self.dropped} posts in the comment hydration backlog because the queue was full")
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.backlog and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+                if not self.pending:
+                    # One worker refills the queue from the table; the others wait for it
+                    self.backlog = False
+                    self.in_flight += 1
+                    post_id = None
+                else:
+                    _, _, _, post_id, (ticker, subreddit) = self.pending.pop()
+                    self.in_flight += 1
+
+            try:
+                if post_id is None:
+                    if self._reload():
+                        with self.condition:
+                            # More may be left than fitted in the queue
+                            self.backlog = True
+                else:
+                    with HYDRATION_SECONDS.time():
+                        self._hydrate(post_id, ticker, subreddit)
+            except Exception as e:
+                if post_id is None:
+                    logger.error(f"Error loading the comment hydration backlog: {e}")
+                else:
+                    logger.error(f"Error fetching comments for post {post_id}: {e}")
+                    self.writer.fail_hydration(post_id)
+            finally:
+                with self.condition:
+                    self.in_flight -= 1
+                    self.queued.discard(post_id)
+                    self.condition.notify_all()
+
+    def _hydrate(self, post_id, ticker, subreddit):
+        reddit = getattr(self.local, 'reddit', None)
+        if reddit is None:
+            reddit = self.local.reddit = create_reddit()
+        comment_data = fetch_top_comments(reddit.submission(id=post_id), self.limit, self.max_depth)
+        with self.claim_lock:
+            new_comments = [comment for comment in comment_data if self.seen.claim_comment(comment['comment_id'])]
+            self.writer.add_comments(new_comments)
+        self.writer.finish_hydration(post_id)
+        COMMENTS_FETCHED.inc(len(new_comments), ticker=ticker, subreddit=subreddit)
+        COMMENTS_SKIPPED.inc(len(comment_data) - len(new_comments), ticker=ticker, subreddit=subreddit)
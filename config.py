@@ -20,7 +20,40 @@ SETTINGS = {
         "TSLA": ["Tesla", "Musk", "Model 3", "EV"],
         "NVDA": ["Nvidia", "AI", "GPU", "Blackwell"],
         "AVGO": ["Broadcomm", "Semiconductor", "GPU", "AI"]
-    }
-    
+    },
+    'subreddits': ['investing', 'stocks', 'news', 'finance', 'technology', 'cryptocurrency'],
+    'collector_concurrency': 8,  # Max number of Reddit requests in flight in asyc_data_bot
+    'crawl_max_posts': 1000,  # Max posts walked per (ticker, subreddit, query) search before moving on
+    'unit_min_interval': 300,  # Min seconds between two crawls of the same (ticker, subreddit, query)
+    'comment_workers': 2,  # Threads fetching comments for stored posts
+    'comment_queue_size': 10000,  # Posts waiting for comments in memory; the rest wait in the comment_hydration table
+    'comments_per_post': 10,  # Top comments (by score) stored per post
+    'comment_max_depth': 2,  # Deepest reply level stored (0 = top-level comments only)
+    'db_batch_size': 500,  # Max records per write transaction
+    'db_batch_interval': 1.0,  # Max seconds a queued record waits before it is committed
+    'seen_index_path': 'seen_ids.bloom',  # Snapshot of the seen post/comment ID index
+    'seen_index_capacity': 5000000,  # IDs the index is sized for before it is grown on the next load
+    'seen_index_error_rate': 1e-6,  # Chance that a new post or comment is mistaken for a known one
+    'metrics_port': 9108,  # Local port serving Prometheus metrics at /metrics; None disables it
+    'metrics_host': '127.0.0.1',  # Interface the metrics endpoint listens on
+    'sentiment_model_name': 'distilbert-base-uncased-finetuned-sst-2-english',  # Model used to score posts and comments
+    'sentiment_max_length': 512,  # Max tokens per model window; longer texts are split into overlapping windows
+    'sentiment_window_overlap': 64,  # Tokens shared by consecutive windows of a long text
+    'sentiment_max_windows': 16,  # Windows scored per text; the rest of very long texts is ignored
+    'sentiment_batch_tokens': 8192,  # Max padded tokens per model batch; short texts share bigger batches
+    'sentiment_max_batch_size': 64,  # Max texts per model batch
+    'sentiment_backend': 'pytorch',  # Inference engine: 'pytorch' (eager), 'onnx' (ONNX Runtime) or 'int8' (quantized)
+    'sentiment_threads': None,  # CPU threads for inference; None lets the backend decide
+    'sentiment_chunk_size': 1024,  # Unscored rows read and committed together by sentiment_scorer.py
+    'sentiment_poll_interval': 30,  # Seconds sentiment_scorer.py sleeps once everything is scored
+    'sentiment_cache_path': 'sentiment_cache.db',  # Sentiment results by model and normalized text
+    'sentiment_cache_lru_size': 100000,  # Cached results also kept in memory
+    'sentiment_horizons': {'1h': 3600, '1d': 86400, '7d': 604800},  # Half-lives (seconds) of the per-ticker sentiment EWMAs
+    'sentiment_bucket_seconds': 3600,  # Width of the per-ticker sentiment time buckets
+    'sentiment_metrics_port': 9109,  # Metrics port of sentiment_scorer.py; None disables it
+    'sentiment_service_address': None,  # Socket of sentiment_service.py ('path.sock' or 'host:port'); None loads the model in-process
+    'sentiment_service_authkey': None,  # Shared secret clients send to sentiment_service.py; required for TCP
+    'sentiment_service_max_batch': 256,  # Max texts the service scores per micro-batch
+    'sentiment_service_max_wait': 0.01,  # Seconds a request waits for others to join its micro-batch
 }
 
@@ -0,0 +1,88 @@
+import time
+
+HEAD = 'head'
+BACKFILL = 'backfill'
+
+CHECKPOINT_COLUMNS = ['ticker', 'subreddit', 'query', 'newest_utc', 'oldest_utc', 'head_cursor',
+                      'head_newest_utc', 'backfill_cursor', 'backfill_done', 'updated_at']
+
+
+# Crawl position of one (ticker, subreddit, query) search listing.
+# Posts between oldest_utc and newest_utc are fully covered. A head walk picks up posts newer
+# than newest_utc and can be resumed from head_cursor; the backfill walk continues past
+# oldest_utc from backfill_cursor until Reddit runs out of results.
+class CrawlCheckpoint:
+    def __init__(self, ticker, subreddit, query, newest_utc=None, oldest_utc=None, head_cursor=None,
+                 head_newest_utc=None, backfill_cursor=None, backfill_done=0, updated_at=None):
+        self.ticker = ticker
+        self.subreddit = subreddit
+        self.query = query
+        self.newest_utc = newest_utc
+        self.oldest_utc = oldest_utc
+        self.head_cursor = head_cursor
+        self.head_newest_utc = head_newest_utc
+        self.backfill_cursor = backfill_cursor
+        self.backfill_done = backfill_done
+        self.updated_at = updated_at
+
+    # Record that a post has been stored, so a restart resumes right after it
+    def advance(self, post, phase):
+        if phase == HEAD:
+            self.head_cursor = post.fullname
+            self.head_newest_utc = max(self.head_newest_utc or 0, post.created_utc)
+        else:
+            if self.newest_utc is None:
+                self.newest_utc = post.created_utc
+            self.backfill_cursor = post.fullname
+            self.oldest_utc = min(self.oldest_utc or post.created_utc, post.created_utc)
+        self.updated_at = time.time()
+
+    def finish_head(self):
+        if self.head_newest_utc is not None:
+            self.newest_utc = max(self.newest_utc or 0, self.head_newest_utc)
+        self.head_cursor = None
+        self.head_newest_utc = None
+        self.updated_at = time.time()
+
+    def finish_backfill(self):
+        self.backfill_done = 1
+        self.updated_at = time.time()
+
+    def as_row(self):
+        return {column: getattr(self, column) for column in CHECKPOINT_COLUMNS}
+
+
+def load_checkpoint(conn, ticker, subreddit, query):
+    c = conn.cursor()
+    c.execute(f"SELECT {', '.join(CHECKPOINT_COLUMNS)} FROM crawl_checkpoints WHERE ticker=? AND subreddit=? AND query=?",
+              (ticker, subreddit, query))
+    row = c.fetchone()
+    if row is None:
+        return CrawlCheckpoint(ticker, subreddit, query)
+    return CrawlCheckpoint(*row)
+
+# Walk a search listing from its checkpoint, yielding (post, phase): first the posts newer than
+# the covered range, then older ones from the backfill cursor. Stops after max_posts posts.
+# The caller stores each post and then calls checkpoint.advance(post, phase).
+def walk_search(subreddit, checkpoint, max_posts=None):
+    walked = 0
+
+    if checkpoint.newest_utc is not None:
+        params = {'after': checkpoint.head_cursor} if checkpoint.head_cursor else {}
+        for post in subreddit.search(checkpoint.query, sort='new', time_filter='all', limit=None, params=params):
+            if post.created_utc <= checkpoint.newest_utc:
+                break
+            yield post, HEAD
+            walked += 1
+            if max_posts and walked >= max_posts:
+                return
+        checkpoint.finish_head()
+
+    if not checkpoint.backfill_done:
+        params = {'after': checkpoint.backfill_cursor} if checkpoint.backfill_cursor else {}
+        for post in subreddit.search(checkpoint.query, sort='new', time_filter='all', limit=None, params=params):
+            yield post, BACKFILL
+            walked += 1
+            if max_posts and walked >= max_posts:
+                return
+        checkpoint.finish_backfill()
@@ -1,18 +1,25 @@
-import yfinance as yf
 import logging
+from market_data import get_provider
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 class StockBasicInfo:
-    def __init__(self, ticker):
+    # Info fields read below; the shared fundamentals cache keeps them fresh for a day
+    FIELDS = ['shortName', 'sector', 'longBusinessSummary', 'marketCap']
+
+    def __init__(self, ticker, provider=None):
         self.ticker = ticker
         self.info = None
+        self.provider = provider or get_provider()
 
     def fetch_info(self):
         logger.info(f"Fetching basic info for {self.ticker}")
-        self.info = yf.Ticker(self.ticker).info
+        infos, errors = self.provider.info([self.ticker], fields=self.FIELDS)
+        if self.ticker in errors:
+            logger.error(f"Error fetching basic info for {self.ticker}: {errors[self.ticker]}")
+        self.info = infos.get(self.ticker, {})
 
     def get_basic_info(self):
         if not self.info:
@@ -1,18 +1,25 @@
-import yfinance as yf
 import logging
+from market_data import get_provider
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 class StockFinancialData:
-    def __init__(self, ticker):
+    # Info fields read below; StockBasicInfo shares the same cached info payload
+    FIELDS = ['volume', 'forwardPE', 'trailingEps', 'marketCap', 'totalRevenue']
+
+    def __init__(self, ticker, provider=None):
         self.ticker = ticker
         self.data = None
+        self.provider = provider or get_provider()
 
     def fetch_data(self):
         logger.info(f"Fetching financial data for {self.ticker}")
-        self.data = yf.Ticker(self.ticker).info
+        infos, errors = self.provider.info([self.ticker], fields=self.FIELDS)
+        if self.ticker in errors:
+            logger.error(f"Error fetching financial data for {self.ticker}: {errors[self.ticker]}")
+        self.data = infos.get(self.ticker, {})
 
     def get_financial_data(self):
         if not self.data:
@@ -31,7 +38,10 @@ class StockFinancialData:
 
     def get_income_statement(self):
         logger.info(f"Fetching income statement for {self.ticker}")
-        income_stmt = yf.Ticker(self.ticker).financials
+        statements, errors = self.provider.financials([self.ticker])
+        if self.ticker in errors:
+            logger.error(f"Error fetching income statement for {self.ticker}: {errors[self.ticker]}")
+        income_stmt = statements.get(self.ticker)
         logger.info(f"Income statement data for {self.ticker}: {income_stmt}")
         return income_stmt
 
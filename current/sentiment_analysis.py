@@ -1,19 +1,27 @@
-from transformers import pipeline
 from scipy.stats import zscore
 import logging
+import config
+import sentiment_service
+from sentiment_model import DEFAULT_MODEL
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 class SentimentAnalysis:
-    def __init__(self):
+    # service_address points at a running sentiment_service.py (by default the one in config.SETTINGS);
+    # without one the model is loaded once per process
+    def __init__(self, cache_path='sentiment_cache.db', backend='pytorch', service_address=None, service_authkey=None):
         logger.info("Loading sentiment analysis model")
-        self.sentiment_model = pipeline("sentiment-analysis")
+        self.sentiment_model = sentiment_service.connect(
+            service_address or config.SETTINGS.get('sentiment_service_address'),
+            service_authkey or config.SETTINGS.get('sentiment_service_authkey'),
+            model_name=DEFAULT_MODEL, cache_path=cache_path, backend=backend)
 
     def analyze_sentiment(self, texts):
         logger.info(f"Analyzing sentiment for texts: {texts}")
-        results = self.sentiment_model(texts)
+        # Long texts are scored over overlapping token windows; texts seen before come from the cache
+        results = self.sentiment_model.predict(texts)
         logger.info(f"Sentiment analysis results: {results}")
         return results
 
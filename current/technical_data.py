@@ -1,26 +1,32 @@
-import yfinance as yf
 import pandas as pd
 import logging
+from bar_store import BarStore
+from indicators import IndicatorEngine
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 class StockTechnicalData:
-    def __init__(self, ticker):
+    def __init__(self, ticker, bar_store=None):
         self.ticker = ticker
         self.history = None
+        self.indicators = None
+        self.bar_store = bar_store or BarStore()
 
     def fetch_history(self):
         logger.info(f"Fetching historical data for {self.ticker}")
-        self.history = yf.Ticker(self.ticker).history(period="1y")
+        # Only bars newer than the stored ones are downloaded
+        self.history = self.bar_store.history(self.ticker, period="1y")
         logger.info(f"Fetched {len(self.history)} data points")
+        # Indicators share the engine's cumulative sums instead of each rolling over the prices again
+        self.indicators = IndicatorEngine(self.history['Close'], self.history.index)
 
     def calculate_sma(self, window=14):
         if self.history is None:
             self.fetch_history()
         logger.info(f"Calculating SMA for {self.ticker} with window {window}")
-        sma = self.history['Close'].rolling(window=window).mean()
+        sma = self.indicators.series(self.indicators.sma([window])[0])
         logger.info(f"Calculated SMA for {self.ticker}")
         return sma
 
@@ -28,13 +34,7 @@ class StockTechnicalData:
         if self.history is None:
             self.fetch_history()
         logger.info(f"Calculating RSI for {self.ticker} with window {window}")
-        delta = self.history['Close'].diff(1)
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        avg_gain = gain.rolling(window=window).mean()
-        avg_loss = loss.rolling(window=window).mean()
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
+        rsi = self.indicators.series(self.indicators.rsi([window], method='sma')[0])
         logger.info(f"Calculated RSI for {self.ticker}")
         return rsi
 
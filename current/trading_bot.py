@@ -3,17 +3,19 @@ import time
 import logging
 
 # Importing necessary modules from other scripts (assuming they are in the same directory)
-from basic_info import StockBasicInfo
-from financial_data import StockFinancialData
-from technical_data import StockTechnicalData
-from sentiment_analysis import SentimentAnalysis
-from risk_management import RiskManagement
+from .basic_info import StockBasicInfo
+from .financial_data import StockFinancialData
+from .technical_data import StockTechnicalData
+from .sentiment_analysis import SentimentAnalysis
+from .risk_management import RiskManagement
 
 logging.basicConfig(level=logging.INFO)
 
 class TradingBot:
     def __init__(self):
         self.portfolio = {}  # Placeholder for portfolio management
+        # Loaded once and reused by every daily update
+        self.sentiment_analyzer = SentimentAnalysis()
 
     def daily_update(self):
         logging.info("Starting daily update")
@@ -43,10 +45,9 @@ class TradingBot:
 
         # Perform sentiment analysis
         logging.info("Performing sentiment analysis")
-        sentiment_analyzer = SentimentAnalysis()
         texts = ["This stock is amazing!", "Terrible results, wouldn't buy."]
-        sentiments = sentiment_analyzer.analyze_sentiment(texts)
-        normalized_scores = sentiment_analyzer.normalize_scores(sentiments)
+        sentiments = self.sentiment_analyzer.analyze_sentiment(texts)
+        normalized_scores = self.sentiment_analyzer.normalize_scores(sentiments)
         logging.info(f"Sentiments: {sentiments}")
         logging.info(f"Normalized Scores: {normalized_scores}")
 
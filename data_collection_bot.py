@@ -1,10 +1,19 @@
-import praw
 import logging
 import sqlite3
 import threading
 import time
 import config
-from collections import defaultdict
+import metrics
+from db_writer import DatabaseWriter
+from keyword_matcher import KeywordMatcher
+from seen_index import SeenIndex
+from crawl_checkpoints import load_checkpoint, walk_search
+from rate_limiter import REALTIME, shared_budget
+from reddit_client import create_reddit
+from comment_hydration import CommentHydrator
+from search_index import create_search_index
+from migrations import migrate
+from metrics import POSTS_FETCHED, POSTS_SKIPPED
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -48,217 +57,179 @@ def setup_database():
                  (ticker TEXT PRIMARY KEY,
                   last_fetched REAL)''')
 
+    # Full-text indexes over titles, selftext and comment bodies, kept in sync by triggers
+    create_search_index(conn)
+
     conn.commit()
+    # Every table added since (tickers, crawl state, aggregates, ...) comes from the schema migrations
+    migrate(conn)
     return conn
 
-# Check the rate limit and sleep if necessary
-def check_rate_limit(reddit, backoff=2):
-    remaining = int(reddit.auth.limits.get('remaining', 1))
-    reset_time = reddit.auth.limits.get('reset_timestamp', time.time() + 60)
-    current_time = time.time()
-    
-    if remaining < 10:
-        sleep_duration = max(reset_time - current_time, 1)
-        logger.info(f"Rate limit close to being exhausted. Sleeping for {sleep_duration} seconds.")
-        time.sleep(sleep_duration + 5 + (backoff ** 2))
-        return True
-    return False
-
-# Fetch and process Reddit comments for a specific post
-def fetch_comments(post, conn, progress):
-    c = conn.cursor()
-    comment_data = []
-    comments_fetched = 0
-    comments_skipped = 0
-    
-    post.comments.replace_more(limit=None)
-    
-    for comment in post.comments.list()[:10]:
-        c.execute("SELECT comment_id FROM comments WHERE comment_id=?", (comment.id,))
-        if c.fetchone():
-            comments_skipped += 1
-            continue
-
-        comment_data.append({
-            'comment_id': comment.id,
-            'post_id': post.id,
-            'author': comment.author.name if comment.author else None,
-            'body': comment.body,
-            'timestamp': comment.created_utc,
-            'score': comment.score,
-            'permalink': comment.permalink
-        })
-        comments_fetched += 1
-    
-    if comment_data:
-        c.executemany('''INSERT INTO comments (comment_id, post_id, author, body, timestamp, score, permalink)
-                         VALUES (:comment_id, :post_id, :author, :body, :timestamp, :score, :permalink)''', comment_data)
-        conn.commit()
-    
-    progress['comments_fetched'] += comments_fetched
-    progress['comments_skipped'] += comments_skipped
-
-# Periodic logging of progress
-def log_progress(progress_dict):
-    
+# Periodic logging of progress: the counters only ever grow, so each report is the difference to the last one
+def log_progress(interval=30):
+    last = {}
     while True:
-        time.sleep(30)
-        for ticker, progress in progress_dict.items():
-            logger.debug(f"Progress for {ticker} in the last 30 seconds:\n"
-                        f" - Posts Fetched: {progress['posts_fetched']}\n"
-                        f" - Posts Skipped: {progress['posts_skipped']}\n"
-                        f" - Comments Fetched: {progress['comments_fetched']}\n"
-                        f" - Comments Skipped: {progress['comments_skipped']}")
-            # Reset progress counters
-            progress['posts_fetched'] = 0
-            progress['posts_skipped'] = 0
-            progress['comments_fetched'] = 0
-            progress['comments_skipped'] = 0
-        
+        time.sleep(interval)
+        totals = metrics.progress_totals()
+        for ticker, counts in totals.items():
+            previous = last.get(ticker, {})
+            delta = {name: count - previous.get(name, 0) for name, count in counts.items()}
+            if not any(delta.values()):
+                continue
+            logger.info(f"Progress for {ticker} in the last {interval} seconds:\n"
+                        f" - Posts Fetched: {delta['posts_fetched']}\n"
+                        f" - Posts Skipped: {delta['posts_skipped']}\n"
+                        f" - Comments Fetched: {delta['comments_fetched']}\n"
+                        f" - Comments Skipped: {delta['comments_skipped']}")
+        last = totals
+
+# Serve collector metrics locally if a port is configured; a second collector on the same port just goes without
+def start_metrics_server():
+    port = config.SETTINGS.get('metrics_port')
+    if port is None:
+        return None
+    try:
+        return metrics.start_http_server(port, host=config.SETTINGS.get('metrics_host', '127.0.0.1'))
+    except OSError as e:
+        logger.warning(f"Could not serve metrics on port {port}: {e}")
+        return None
+
 
 # Fetch historical data from Reddit
-def fetch_historical_data(ticker, progress):
+def fetch_historical_data(ticker, seen, writer, hydrator):
     conn = setup_database()
     logger.info(f"Fetching historical data for {ticker}")
     
-    reddit = praw.Reddit(
-        client_id=config.API_KEYS['reddit_client_id'],
-        client_secret=config.API_KEYS['reddit_client_secret'],
-        user_agent=config.API_KEYS['reddit_user_agent']
-    )
+    reddit = create_reddit()
     
-    subreddits = ['investing', 'stocks', 'news', 'finance', 'technology', 'cryptocurrency']
+    subreddits = config.SETTINGS['subreddits']
     queries = config.SETTINGS['tickers_and_keywords'][ticker]
 
-    backoff = 2
-
     try:
         for subreddit_name in subreddits:
             subreddit = reddit.subreddit(subreddit_name)
-            
-            c = conn.cursor()
-            c.execute("SELECT last_fetched FROM progress WHERE ticker=?", (ticker,))
-            last_fetched = c.fetchone()
-            last_fetched = last_fetched[0] if last_fetched else 0
 
             for query in queries:
-                for post in subreddit.search(query, sort='new', time_filter='all'):
-                    if post.created_utc <= last_fetched:
+                # Each (ticker, subreddit, query) listing resumes from its own checkpoint
+                checkpoint = load_checkpoint(conn, ticker, subreddit_name, query)
+                for post, phase in walk_search(subreddit, checkpoint, config.SETTINGS.get('crawl_max_posts', 1000)):
+                    if post.stickied:
+                        checkpoint.advance(post, phase)
                         continue
 
-                    if check_rate_limit(reddit, backoff):
-                        backoff += 1
-                    else:
-                        backoff = 2
-                    
-                    c.execute("SELECT id FROM news WHERE id=?", (post.id,))
-                    if c.fetchone():
-                        progress['posts_skipped'] += 1
+                    if not seen.claim_post(post.id):
+                        writer.add_post_tickers(post.id, [ticker], post.created_utc)
+                        POSTS_SKIPPED.inc(ticker=ticker, subreddit=subreddit_name)
+                        checkpoint.advance(post, phase)
+                        writer.save_checkpoint(checkpoint)
                         continue
                     
-                    if not post.stickied:
-                        news_data = [{
-                            'id': post.id,
-                            'ticker': ticker,
-                            'timestamp': post.created_utc,
-                            'title': post.title,
-                            'text': post.selftext,
-                            'score': post.score,
-                            'comments': post.num_comments,
-                            'last_fetched': post.created_utc
-                        }]
+                    writer.add_post({
+                        'id': post.id,
+                        'ticker': ticker,
+                        'timestamp': post.created_utc,
+                        'title': post.title,
+                        'text': post.selftext,
+                        'score': post.score,
+                        'comments': post.num_comments,
+                        'last_fetched': post.created_utc
+                    })
+                    writer.add_post_tickers(post.id, [ticker], post.created_utc)
+                    POSTS_FETCHED.inc(ticker=ticker, subreddit=subreddit_name)
+                    logger.info(f'Fetched 1 post for {ticker}')
+                    hydrator.submit(post, ticker, subreddit_name)
                         
-                        c.executemany('''INSERT INTO news (id, ticker, timestamp, title, text, score, comments, last_fetched)
-                                         VALUES (:id, :ticker, :timestamp, :title, :text, :score, :comments, :last_fetched)''', news_data)
-                        conn.commit()
-                        progress['posts_fetched'] += 1
-                        logger.info(f'Fetched 1 post for {ticker}')
-                        fetch_comments(post, conn, progress)
-                        
-                        c.execute("INSERT OR REPLACE INTO progress (ticker, last_fetched) VALUES (?, ?)",
-                                  (ticker, post.created_utc))
-                        conn.commit()
+                    writer.set_progress(ticker, post.created_utc)
+                    checkpoint.advance(post, phase)
+                    writer.save_checkpoint(checkpoint)
+                writer.save_checkpoint(checkpoint)
     except Exception as e:
         logger.error(f"Error fetching historical data for {ticker}: {e}")
     finally:
         conn.close()
 
-# Fetch real-time data from Reddit
-def fetch_realtime_data(ticker, progress):
-    conn = setup_database()
-    c = conn.cursor()
-    backoff = 1
+# Fetch real-time data from one combined stream over all subreddits and route posts to the matching tickers
+def fetch_realtime_data(subreddits, seen, writer, hydrator):
+    # The stream shares the request budget with backfill threads but is always served first
+    shared_budget.set_priority(REALTIME)
 
     try:
-        logger.info(f"Fetching real-time data for {ticker}")
-        
-        reddit = praw.Reddit(
-            client_id=config.API_KEYS['reddit_client_id'],
-            client_secret=config.API_KEYS['reddit_client_secret'],
-            user_agent=config.API_KEYS['reddit_user_agent']
-        )
+        subreddit_names = '+'.join(subreddits)
+        logger.info(f"Fetching real-time data from {subreddit_names}")
         
-        subreddits = ['investing', 'stocks', 'news', 'finance', 'technology', 'cryptocurrency']
-        queries = config.SETTINGS['tickers_and_keywords'][ticker]
+        reddit = create_reddit()
 
-        for subreddit_name in subreddits:
-            subreddit = reddit.subreddit(subreddit_name)
+        subreddit = reddit.subreddit(subreddit_names)
+        matcher = KeywordMatcher(config.SETTINGS['tickers_and_keywords'])
+        
+        for post in subreddit.stream.submissions():
+            # One pass over title and selftext finds every matching ticker
+            tickers = matcher.match_tickers(post.title, post.selftext)
+            if not tickers or post.stickied:
+                continue
+
+            subreddit_name = post.subreddit.display_name
+            if not seen.claim_post(post.id):
+                # The post may be stored under other tickers; link it to every ticker it matches now
+                writer.add_post_tickers(post.id, tickers, post.created_utc)
+                for ticker in tickers:
+                    POSTS_SKIPPED.inc(ticker=ticker, subreddit=subreddit_name)
+                continue
             
-            for post in subreddit.stream.submissions():
-                if check_rate_limit(reddit, backoff):
-                    backoff += 1
-                else:
-                    backoff = 1
-                
-                if any(query.lower() in post.title.lower() for query in queries):
-                    c.execute("SELECT id FROM news WHERE id=?", (post.id,))
-                    if c.fetchone():
-                        progress['posts_skipped'] += 1
-                        continue
-                    
-                    if not post.stickied:
-                        news_data = [{
-                            'id': post.id,
-                            'ticker': ticker,
-                            'timestamp': post.created_utc,
-                            'title': post.title,
-                            'text': post.selftext,
-                            'score': post.score,
-                            'comments': post.num_comments
-                        }]
-                        
-                        c.executemany('''INSERT INTO news (id, ticker, timestamp, title, text, score, comments)
-                                         VALUES (:id, :ticker, :timestamp, :title, :text, :score, :comments)''', news_data)
-                        conn.commit()
-                        progress['posts_fetched'] += 1
-                        logger.info(f'Fetched 1 post for {ticker}')
-                        
-                        fetch_comments(post, conn, progress)
+            writer.add_post({
+                'id': post.id,
+                'ticker': tickers[0],
+                'timestamp': post.created_utc,
+                'title': post.title,
+                'text': post.selftext,
+                'score': post.score,
+                'comments': post.num_comments
+            })
+            writer.add_post_tickers(post.id, tickers, post.created_utc)
+            for ticker in tickers:
+                POSTS_FETCHED.inc(ticker=ticker, subreddit=subreddit_name)
+            logger.info(f"Fetched 1 post for {', '.join(tickers)} from r/{subreddit_name}")
+            
+            hydrator.submit(post, tickers[0], subreddit_name)
     except Exception as e:
-        logger.error(f"Error fetching real-time data for {ticker}: {e}")
-    finally:
-        conn.close()
+        logger.error(f"Error fetching real-time data from {'+'.join(subreddits)}: {e}")
 
 # Main function to run the bot
 def main():
     tickers = config.SETTINGS['tickers_and_keywords'].keys()
-    progress_dict = defaultdict(lambda: {'posts_fetched': 0, 'posts_skipped': 0, 'comments_fetched': 0, 'comments_skipped': 0})
+    subreddits = config.SETTINGS['subreddits']
     
     threads = []
+
+    # All fetcher threads share one seen-ID index and one writer, so only one connection ever writes to news_data.db
+    conn = setup_database()
+    seen = SeenIndex.load(conn,
+                          snapshot_path=config.SETTINGS.get('seen_index_path', 'seen_ids.bloom'),
+                          capacity=config.SETTINGS.get('seen_index_capacity', 5000000),
+                          error_rate=config.SETTINGS.get('seen_index_error_rate', 1e-6))
+    writer = DatabaseWriter(setup_database,
+                            batch_size=config.SETTINGS.get('db_batch_size', 500),
+                            batch_interval=config.SETTINGS.get('db_batch_interval', 1.0)).start()
+    hydrator = CommentHydrator(seen, writer, setup_database,
+                               workers=config.SETTINGS.get('comment_workers', 2),
+                               queue_size=config.SETTINGS.get('comment_queue_size', 10000),
+                               limit=config.SETTINGS.get('comments_per_post', 10),
+                               max_depth=config.SETTINGS.get('comment_max_depth', 2)).start()
     
+    start_metrics_server()
+
     # Start logging thread
-    logging_thread = threading.Thread(target=log_progress, args=(progress_dict,))
+    logging_thread = threading.Thread(target=log_progress)
     logging_thread.daemon = True  # Daemon thread will exit when the main program exits
     logging_thread.start()
 
-    for ticker in tickers:
-        thread = threading.Thread(target=fetch_realtime_data, args=(ticker, progress_dict[ticker]))
-        threads.append(thread)
-        thread.start()
-        time.sleep(1)
+    # A single stream covers every subreddit and ticker
+    thread = threading.Thread(target=fetch_realtime_data, args=(subreddits, seen, writer, hydrator))
+    threads.append(thread)
+    thread.start()
     """ 
     for ticker in tickers:
-        thread = threading.Thread(target=fetch_historical_data, args=(ticker, progress_dict[ticker]))
+        thread = threading.Thread(target=fetch_historical_data, args=(ticker, seen, writer, hydrator))
         threads.append(thread)
         thread.start()
         time.sleep(1) 
@@ -267,5 +238,10 @@ def main():
     for thread in threads:
         thread.join()
 
+    hydrator.stop()
+    writer.stop()
+    seen.save(conn)
+    conn.close()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,203 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from metrics import REGISTRY
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+INSERT_NEWS = '''INSERT OR IGNORE INTO news (id, ticker, timestamp, title, text, score, comments, last_fetched)
+                 VALUES (:id, :ticker, :timestamp, :title, :text, :score, :comments, :last_fetched)'''
+
+INSERT_COMMENTS = '''INSERT OR IGNORE INTO comments (comment_id, post_id, author, body, timestamp, score, permalink)
+                     VALUES (:comment_id, :post_id, :author, :body, :timestamp, :score, :permalink)'''
+
+INSERT_NEWS_TICKERS = '''INSERT OR IGNORE INTO news_tickers (post_id, ticker, timestamp)
+                         VALUES (:post_id, :ticker, :timestamp)'''
+
+INSERT_HYDRATION = '''INSERT OR IGNORE INTO comment_hydration (post_id, ticker, subreddit, num_comments, score, queued_at)
+                      VALUES (:post_id, :ticker, :subreddit, :num_comments, :score, :queued_at)'''
+
+DELETE_HYDRATION = "DELETE FROM comment_hydration WHERE post_id = :post_id"
+
+FAIL_HYDRATION = "UPDATE comment_hydration SET attempts = attempts + 1 WHERE post_id = :post_id"
+
+UPSERT_PROGRESS = "INSERT OR REPLACE INTO progress (ticker, last_fetched) VALUES (:ticker, :last_fetched)"
+
+UPSERT_CHECKPOINT = '''INSERT OR REPLACE INTO crawl_checkpoints
+                       (ticker, subreddit, query, newest_utc, oldest_utc, head_cursor, head_newest_utc,
+                        backfill_cursor, backfill_done, updated_at)
+                       VALUES (:ticker, :subreddit, :query, :newest_utc, :oldest_utc, :head_cursor, :head_newest_utc,
+                               :backfill_cursor, :backfill_done, :updated_at)'''
+
+UPSERT_SCHEDULE = '''INSERT OR REPLACE INTO crawl_schedule
+                     (ticker, subreddit, query, runs, last_run_at, rate_ewma, backfill_yield_ewma,
+                      backfill_done, last_new_posts)
+                     VALUES (:ticker, :subreddit, :query, :runs, :last_run_at, :rate_ewma, :backfill_yield_ewma,
+                             :backfill_done, :last_new_posts)'''
+
+# Statements are flushed in this order so posts land before their comments and crawl positions,
+# and a post's hydration work is recorded before it can be marked done
+STATEMENT_ORDER = [INSERT_NEWS, INSERT_NEWS_TICKERS, INSERT_HYDRATION, INSERT_COMMENTS, DELETE_HYDRATION,
+                   FAIL_HYDRATION, UPSERT_PROGRESS, UPSERT_CHECKPOINT, UPSERT_SCHEDULE]
+
+_STOP = object()
+
+COMMIT_SECONDS = REGISTRY.histogram('db_commit_seconds', "Duration of one batched write transaction")
+RECORDS_WRITTEN = REGISTRY.counter('db_records_written_total', "Records committed to news_data.db")
+QUEUE_DEPTH = REGISTRY.gauge('db_writer_queue_depth', "Records waiting for the database writer")
+WRITE_RETRIES = REGISTRY.counter('db_write_retries_total', "Batched write transactions retried after an error")
+RECORDS_FAILED = REGISTRY.counter('db_records_failed_total', "Records that could not be written even on their own")
+
+
+# Single writer for news_data.db: fetchers queue records, one thread batches them into transactions
+class DatabaseWriter:
+    def __init__(self, connect, batch_size=500, batch_interval=1.0, queue_size=10000, max_retries=5, retry_delay=1.0):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay  # seconds before the first retry, doubling up to a minute
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.records_written = 0
+        self.flush_latencies = deque(maxlen=10000)  # seconds per committed batch, most recent last
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="DatabaseWriter")
+        self.thread.daemon = True
+        self.thread.start()
+        QUEUE_DEPTH.set_function(self.queue.qsize)
+        return self
+
+    # Block until everything queued so far has been committed
+    def sync(self):
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    # Flush everything still queued and wait for the writer thread to exit
+    def stop(self):
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    # Queue a post; blocks when the writer is behind so fetchers cannot outrun the disk
+    def add_post(self, news_data):
+        news_data.setdefault('last_fetched', None)
+        self.queue.put((INSERT_NEWS, news_data))
+
+    # Link a post to every ticker it matched; timestamp is the post's, for per-ticker time range reads
+    def add_post_tickers(self, post_id, tickers, timestamp):
+        for ticker in tickers:
+            self.queue.put((INSERT_NEWS_TICKERS, {'post_id': post_id, 'ticker': ticker, 'timestamp': timestamp}))
+
+    def add_comments(self, comment_data):
+        for comment in comment_data:
+            self.queue.put((INSERT_COMMENTS, comment))
+
+    # Record that a post's comments still have to be fetched
+    def add_hydration(self, post_id, ticker, subreddit, num_comments, score):
+        self.queue.put((INSERT_HYDRATION, {'post_id': post_id, 'ticker': ticker, 'subreddit': subreddit,
+                                           'num_comments': num_comments, 'score': score, 'queued_at': time.time()}))
+
+    def finish_hydration(self, post_id):
+        self.queue.put((DELETE_HYDRATION, {'post_id': post_id}))
+
+    def fail_hydration(self, post_id):
+        self.queue.put((FAIL_HYDRATION, {'post_id': post_id}))
+
+    def set_progress(self, ticker, last_fetched):
+        self.queue.put((UPSERT_PROGRESS, {'ticker': ticker, 'last_fetched': last_fetched}))
+
+    def save_checkpoint(self, checkpoint):
+        self.queue.put((UPSERT_CHECKPOINT, checkpoint.as_row()))
+
+    def save_schedule(self, stats):
+        self.queue.put((UPSERT_SCHEDULE, stats))
+
+    def _open(self):
+        conn = self.connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL only fsyncs at checkpoints in WAL mode; a crash can lose the last batch but never corrupts the file
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _flush(self, conn, pending):
+        count = sum(len(rows) for rows in pending.values())
+        if not count:
+            return
+        start = time.monotonic()
+        with conn:
+            for statement in STATEMENT_ORDER:
+                if pending[statement]:
+                    conn.executemany(statement, pending[statement])
+        elapsed = time.monotonic() - start
+        self.flush_latencies.append(elapsed)
+        self.records_written += count
+        COMMIT_SECONDS.observe(elapsed)
+        RECORDS_WRITTEN.inc(count)
+        logger.debug(f"Committed {count} records")
+        for statement in STATEMENT_ORDER:
+            pending[statement] = []
+
+    # Commit a batch, retrying with backoff: every post and comment ID in it is already claimed in the
+    # seen index, so a discarded row would never be fetched again. While it retries the queue fills
+    # up and fetchers block. If the batch still fails, its rows are written one at a time so a single
+    # bad row cannot hold back the rest, and any row that fails on its own is logged in full.
+    def _commit(self, conn, pending, count):
+        for attempt in range(self.max_retries):
+            try:
+                self._flush(conn, pending)
+                return
+            except Exception as e:
+                delay = min(self.retry_delay * 2 ** attempt, 60.0)
+                logger.error(f"Error writing batch of {count} records, retrying in {delay:.1f}s: {e}")
+                WRITE_RETRIES.inc()
+                time.sleep(delay)
+
+        logger.error(f"Writing batch of {count} records one record at a time")
+        for statement in STATEMENT_ORDER:
+            for params in pending[statement]:
+                try:
+                    with conn:
+                        conn.execute(statement, params)
+                    self.records_written += 1
+                    RECORDS_WRITTEN.inc()
+                except Exception as e:
+                    RECORDS_FAILED.inc()
+                    logger.error(f"Could not write record {params!r}: {e}")
+            pending[statement] = []
+
+    def _run(self):
+        conn = self._open()
+        pending = {statement: [] for statement in STATEMENT_ORDER}
+        pending_count = 0
+        deadline = time.monotonic() + self.batch_interval
+        stopping = False
+
+        try:
+            while not stopping:
+                try:
+                    item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    item = None
+
+                synced = None
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    synced = item
+                elif item is not None:
+                    statement, params = item
+                    pending[statement].append(params)
+                    pending_count += 1
+
+                if stopping or synced or pending_count >= self.batch_size or time.monotonic() >= deadline:
+                    self._commit(conn, pending, pending_count)
+                    pending_count = 0
+                    deadline = time.monotonic() + self.batch_interval
+                if synced:
+                    synced.set()
+        finally:
+            conn.close()
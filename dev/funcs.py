@@ -1,7 +1,7 @@
-import yfinance as yf
 import re
 import requests
 from bs4 import BeautifulSoup
+from market_data import get_provider
 
 def extract_keywords(text):
     # Simple function to split text into keywords
@@ -36,9 +36,9 @@ def scrape_wikipedia_for_keywords(url):
     return extract_keywords(summary)
 
 def generate_keywords(ticker):
-    # Fetch company info from yfinance
-    stock = yf.Ticker(ticker)
-    company_info = stock.info
+    # Company info through the shared fundamentals cache; names and summaries are kept for a month
+    infos, errors = get_provider().info([ticker], fields=['longName', 'longBusinessSummary'])
+    company_info = infos.get(ticker, {})
     
     # Get the company name
     company_name = company_info.get('longName', '')
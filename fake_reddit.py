@@ -0,0 +1,341 @@
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Offline stand-ins for the HTTP session behind PRAW. They answer the handful of Reddit API
+# endpoints the collectors use (search, new, comments, morechildren) with Reddit-shaped JSON
+# and x-ratelimit headers, so the real PRAW and collector code runs without credentials.
+# Install one with `reddit_client.session = FakeRedditSession(...)`.
+
+BASE36 = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+TITLE_TEMPLATES = [
+    "{keyword} beats expectations this quarter",
+    "Is {keyword} overvalued right now?",
+    "Thoughts on {keyword} after the earnings call",
+    "{keyword} announces new product line",
+    "Why I'm selling my {keyword} position",
+    "Analysts raise price target citing {keyword}",
+]
+
+FILLER_TITLES = [
+    "Daily discussion thread",
+    "What are you buying this week?",
+    "Index funds vs picking stocks",
+    "Bond yields and what they mean for retirees",
+]
+
+FILLER_WORDS = ("market growth revenue guidance margin dividend valuation outlook demand supply "
+                "quarter earnings risk rally dip hold long short volume trend").split()
+
+
+def to_base36(number):
+    digits = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        digits = BASE36[remainder] + digits
+        if not number:
+            return digits
+
+
+# Raised by the fake "new" listing once every post has been streamed, which ends the collector's stream.
+# Like KeyboardInterrupt it is not an Exception, so it passes through prawcore and the collector's own
+# error handling instead of being logged as a failed request; bench_ingest.py catches it.
+class CorpusExhausted(BaseException):
+    pass
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload, headers):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = CaseInsensitiveDict(headers)
+
+    def json(self):
+        return self.payload
+
+    @property
+    def text(self):
+        return json.dumps(self.payload)
+
+    @property
+    def content(self):
+        return self.text.encode()
+
+
+# Deterministic synthetic subreddits: posts mentioning the tracked keywords, with comment trees
+class SyntheticCorpus:
+    def __init__(self, subreddits, keywords, posts_per_subreddit=200, comments_per_post=20, seed=0, start_utc=None):
+        rng = random.Random(seed)
+        self.posts = {}
+        self.by_subreddit = {}
+        self.comments = {}
+        self.comment_index = {}
+        self.next_id = 36 ** 5
+
+        start_utc = start_utc or time.time()
+        for subreddit in subreddits:
+            created_utc = start_utc
+            self.by_subreddit[subreddit] = []
+            for _ in range(posts_per_subreddit):
+                created_utc -= rng.expovariate(1 / 600)
+                post = self._make_post(rng, subreddit, keywords, created_utc)
+                self.posts[post['id']] = post
+                self.by_subreddit[subreddit].append(post)
+                self.comments[post['id']] = self._make_comments(rng, post, comments_per_post)
+
+        # Stream order: oldest first, across all subreddits
+        self.stream_order = sorted(self.posts.values(), key=lambda post: post['created_utc'])
+
+    def _new_id(self):
+        self.next_id += 1
+        return to_base36(self.next_id)
+
+    def _make_post(self, rng, subreddit, keywords, created_utc):
+        post_id = self._new_id()
+        if keywords and rng.random() < 0.8:
+            title = rng.choice(TITLE_TEMPLATES).format(keyword=rng.choice(keywords))
+        else:
+            title = rng.choice(FILLER_TITLES)
+        return {
+            'id': post_id,
+            'name': 't3_' + post_id,
+            'subreddit': subreddit,
+            'subreddit_name_prefixed': 'r/' + subreddit,
+            'title': title,
+            'selftext': ' '.join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(0, 120))),
+            'created_utc': created_utc,
+            'score': int(rng.paretovariate(1.5)),
+            'num_comments': 0,
+            'stickied': False,
+            'is_self': True,
+            'author': f'user{rng.randint(1, 5000)}',
+            'permalink': f'/r/{subreddit}/comments/{post_id}/',
+            'url': f'https://www.reddit.com/r/{subreddit}/comments/{post_id}/',
+        }
+
+    def _make_comments(self, rng, post, comments_per_post):
+        top_level = []
+        thread = []
+        for _ in range(rng.randint(0, 2 * comments_per_post)):
+            parent = rng.choice(thread) if thread and rng.random() < 0.5 else None
+            comment_id = self._new_id()
+            comment = {
+                'id': comment_id,
+                'name': 't1_' + comment_id,
+                'parent_id': parent['name'] if parent else post['name'],
+                'link_id': post['name'],
+                'body': ' '.join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(3, 60))),
+                'score': int(rng.paretovariate(1.2)) - 1,
+                'created_utc': post['created_utc'] + rng.uniform(1, 86400),
+                'author': f'user{rng.randint(1, 5000)}',
+                'permalink': f"{post['permalink']}{comment_id}/",
+                'depth': parent['depth'] + 1 if parent else 0,
+                'replies': [],
+            }
+            (parent['replies'] if parent else top_level).append(comment)
+            thread.append(comment)
+            self.comment_index[comment_id] = comment
+        post['num_comments'] = len(thread)
+        return top_level
+
+
+# Shared request handling: token endpoint, simulated latency and a rate-limit window
+class _FakeSession:
+    def __init__(self, latency=0.0, window_quota=1000, window_seconds=600.0):
+        self.headers = {}
+        self.latency = latency
+        self.window_quota = window_quota
+        self.window_seconds = window_seconds
+        self.window_start = time.monotonic()
+        self.used = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def _rate_limit(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.window_seconds:
+                self.window_start = now
+                self.used = 0
+            self.used += 1
+            self.requests += 1
+            headers = {
+                'x-ratelimit-used': str(self.used),
+                'x-ratelimit-remaining': str(float(max(self.window_quota - self.used, 0))),
+                'x-ratelimit-reset': str(int(self.window_start + self.window_seconds - now) + 1),
+            }
+            return headers, self.used > self.window_quota
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        path = urlparse(url).path.strip('/')
+        if path.endswith('api/v1/access_token'):
+            return FakeResponse(200, {'access_token': 'offline', 'expires_in': 86400,
+                                      'scope': '*', 'token_type': 'bearer'}, {})
+
+        headers, limited = self._rate_limit()
+        if limited:
+            return FakeResponse(429, {'message': 'Too Many Requests', 'error': 429}, headers)
+        payload = self.route(method.upper(), path, dict(params or {}), dict(data or {}))
+        if payload is None:
+            return FakeResponse(404, {'message': 'Not Found', 'error': 404}, headers)
+        return FakeResponse(200, payload, headers)
+
+    def route(self, method, path, params, data):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _listing(children, after=None):
+    return {'kind': 'Listing', 'data': {'after': after, 'before': None, 'dist': len(children), 'children': children}}
+
+
+# Serves a SyntheticCorpus; the "new" listing releases arrivals_per_poll posts per request to emulate a live firehose
+class FakeRedditSession(_FakeSession):
+    def __init__(self, corpus, arrivals_per_poll=5, **kwargs):
+        super().__init__(**kwargs)
+        self.corpus = corpus
+        self.arrivals_per_poll = arrivals_per_poll
+        self.released = 0
+
+    def route(self, method, path, params, data):
+        parts = path.split('/')
+        if len(parts) >= 3 and parts[0] == 'r' and parts[2] == 'search':
+            return self._search(parts[1].split('+'), params)
+        if len(parts) >= 3 and parts[0] == 'r' and parts[2] == 'new':
+            return self._new(parts[1].split('+'), params)
+        if len(parts) >= 2 and parts[0] == 'comments':
+            return self._comments(parts[1], params)
+        if path == 'api/morechildren':
+            return self._more_children(data)
+        return None
+
+    def _search(self, subreddits, params):
+        query = params.get('q', '').lower()
+        posts = sorted((post for subreddit in subreddits for post in self.corpus.by_subreddit.get(subreddit, [])
+                        if query in post['title'].lower() or query in post['selftext'].lower()),
+                       key=lambda post: post['created_utc'], reverse=True)
+        return self._page(posts, params)
+
+    def _page(self, posts, params):
+        start = 0
+        if params.get('after'):
+            names = [post['name'] for post in posts]
+            start = names.index(params['after']) + 1 if params['after'] in names else len(posts)
+        page = posts[start:start + int(params.get('limit') or 25)]
+        after = page[-1]['name'] if page and start + len(page) < len(posts) else None
+        return _listing([{'kind': 't3', 'data': dict(post)} for post in page], after)
+
+    def _new(self, subreddits, params):
+        with self.lock:
+            if self.released >= len(self.corpus.stream_order):
+                raise CorpusExhausted(f"all {self.released} posts streamed")
+            self.released = min(self.released + self.arrivals_per_poll, len(self.corpus.stream_order))
+            released = self.corpus.stream_order[:self.released]
+        posts = [post for post in reversed(released) if post['subreddit'] in subreddits]
+        if params.get('before'):
+            names = [post['name'] for post in posts]
+            if params['before'] in names:
+                posts = posts[:names.index(params['before'])]
+        return self._page(posts, {'limit': params.get('limit')})
+
+    def _comments(self, post_id, params):
+        post = self.corpus.posts.get(post_id)
+        if post is None:
+            return None
+        limit = int(params.get('limit') or 200)
+        top_level = self.corpus.comments[post_id]
+        if params.get('sort', 'confidence') in ('top', 'best', 'confidence'):
+            top_level = sorted(top_level, key=lambda comment: comment['score'], reverse=True)
+
+        # Emit whole top-level threads until `limit` comments are used, then one "more" stub for the rest
+        budget = [limit]
+        children = []
+        remaining = []
+        for comment in top_level:
+            if budget[0] > 0:
+                children.append(self._comment_thing(comment, budget))
+            else:
+                remaining.append(comment['id'])
+        if remaining:
+            children.append({'kind': 'more', 'data': {'count': len(remaining), 'name': 't1__', 'id': '_',
+                                                      'parent_id': post['name'], 'depth': 0, 'children': remaining}})
+        return [_listing([{'kind': 't3', 'data': dict(post)}]), _listing(children)]
+
+    def _comment_thing(self, comment, budget):
+        budget[0] -= 1
+        data = {key: value for key, value in comment.items() if key != 'replies'}
+        replies = [self._comment_thing(reply, budget) for reply in comment['replies'] if budget[0] > 0]
+        data['replies'] = _listing(replies) if replies else ''
+        return {'kind': 't1', 'data': data}
+
+    def _more_children(self, data):
+        things = []
+        for comment_id in data.get('children', '').split(','):
+            comment = self.corpus.comment_index.get(comment_id)
+            if comment is not None:
+                things.append({'kind': 't1', 'data': {**{key: value for key, value in comment.items() if key != 'replies'},
+                                                      'replies': ''}})
+        return {'json': {'errors': [], 'data': {'things': things}}}
+
+
+# Wraps a real session and appends every API response to a JSON-lines file for ReplaySession
+class RecordingSession:
+    def __init__(self, path, session=None):
+        self.session = session or requests.Session()
+        self.headers = self.session.headers
+        self.path = path
+        self.lock = threading.Lock()
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        response = self.session.request(method, url, params=params, data=data, **kwargs)
+        path = urlparse(url).path.strip('/')
+        if not path.endswith('api/v1/access_token') and response.status_code == 200:
+            record = {'method': method.upper(), 'path': path, 'params': _replay_params(params),
+                      'data': _replay_params(data), 'body': response.json()}
+            with self.lock, open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+# Serves responses captured by RecordingSession; repeated requests get the recorded answers in order
+class ReplaySession(_FakeSession):
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = {}
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                key = (record['method'], record['path'], json.dumps(record['params']), json.dumps(record['data']))
+                self.responses.setdefault(key, []).append(record['body'])
+        self.served = {}
+
+    def route(self, method, path, params, data):
+        key = (method, path, json.dumps(_replay_params(params)), json.dumps(_replay_params(data)))
+        bodies = self.responses.get(key)
+        if not bodies:
+            return None
+        with self.lock:
+            index = self.served.get(key, 0)
+            self.served[key] = index + 1
+        return bodies[min(index, len(bodies) - 1)]
+
+
+# Request parameters that identify a response; volatile ones are left out
+def _replay_params(params):
+    if not params:
+        return {}
+    if not isinstance(params, dict):
+        params = dict(params)
+    return {key: str(value) for key, value in sorted(params.items()) if key not in ('raw_json', 'api_type')}
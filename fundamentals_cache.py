@@ -0,0 +1,206 @@
+import io
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+QUARTER = 91 * DAY
+
+# Fundamentals cached per (kind, symbol). Statements change quarterly; an info payload is as fresh
+# as the most volatile field the caller asks for, so a request for the sector reuses a month-old
+# payload while one for the market cap needs today's.
+KIND_TTLS = {
+    'info': DAY,
+    'financials': QUARTER,
+    'balance_sheet': QUARTER,
+    'cashflow': QUARTER,
+}
+
+FIELD_TTLS = {
+    'shortName': 30 * DAY,
+    'longName': 30 * DAY,
+    'sector': 30 * DAY,
+    'industry': 30 * DAY,
+    'longBusinessSummary': 30 * DAY,
+    'website': 30 * DAY,
+    'country': 30 * DAY,
+    'fullTimeEmployees': QUARTER,
+    'trailingEps': QUARTER,
+    'totalRevenue': QUARTER,
+    'revenueGrowth': QUARTER,
+    'profitMargins': QUARTER,
+    'marketCap': DAY,
+    'volume': DAY,
+    'forwardPE': DAY,
+    'trailingPE': DAY,
+}
+
+
+def _encode_json(value):
+    return json.dumps(value, default=str).encode()
+
+
+def _decode_json(payload):
+    return json.loads(payload)
+
+
+# Statements have dates as columns; Parquet wants string column names, so they are stored transposed
+def _encode_frame(frame):
+    buffer = io.BytesIO()
+    frame.T.to_parquet(buffer)
+    return buffer.getvalue()
+
+
+def _decode_frame(payload):
+    return pd.read_parquet(io.BytesIO(payload)).T
+
+
+CODECS = {
+    'info': (_encode_json, _decode_json),
+    'financials': (_encode_frame, _decode_frame),
+    'balance_sheet': (_encode_frame, _decode_frame),
+    'cashflow': (_encode_frame, _decode_frame),
+}
+
+
+# Wraps a market_data provider and caches its fundamentals in SQLite, shared by every class and
+# process using the same path. Concurrent requests for the same (kind, symbol) share one fetch.
+# Symbols read through the cache are watched: a background thread refetches them once they expire,
+# so long-running bots read fresh entries without waiting. If a fetch fails, the stale entry is
+# served. history() is passed straight through.
+class CachedProvider:
+    def __init__(self, provider, path='fundamentals_cache.db', kind_ttls=KIND_TTLS, field_ttls=FIELD_TTLS,
+                 refresh_interval=300):
+        self.provider = provider
+        self.kind_ttls = kind_ttls
+        self.field_ttls = field_ttls
+        self.lock = threading.Lock()
+        self.inflight = {}  # (kind, symbol) -> Future of the fetch in progress
+        self.watched = {}  # (kind, symbol) -> shortest TTL it has been read with
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS fundamentals
+                             (kind TEXT,
+                              symbol TEXT,
+                              fetched_at REAL,
+                              payload BLOB,
+                              PRIMARY KEY (kind, symbol)) WITHOUT ROWID''')
+        self.conn.commit()
+        self.stopped = threading.Event()
+        if refresh_interval:
+            self.refresher = threading.Thread(target=self._refresh_loop, args=(refresh_interval,),
+                                              name="fundamentals-refresh", daemon=True)
+            self.refresher.start()
+
+    def history(self, symbols, interval='1d', period=None, start=None):
+        return self.provider.history(symbols, interval, period=period, start=start)
+
+    # fields: the info fields the caller needs; the payload must be fresh for the shortest TTL among them
+    def info(self, symbols, fields=None):
+        default = self.kind_ttls['info']
+        ttl = min((self.field_ttls.get(field, default) for field in fields), default=default) if fields else default
+        return self.get('info', symbols, ttl)
+
+    def financials(self, symbols, fields=None):
+        return self.get('financials', symbols, self.kind_ttls['financials'])
+
+    def balance_sheet(self, symbols, fields=None):
+        return self.get('balance_sheet', symbols, self.kind_ttls['balance_sheet'])
+
+    def cashflow(self, symbols, fields=None):
+        return self.get('cashflow', symbols, self.kind_ttls['cashflow'])
+
+    def _load(self, kind, symbol):
+        row = self.conn.execute("SELECT fetched_at, payload FROM fundamentals WHERE kind = ? AND symbol = ?",
+                                (kind, symbol)).fetchone()
+        return (row[0], CODECS[kind][1](row[1])) if row else None
+
+    # Cached values no older than ttl seconds, fetching the rest; returns (values, errors) by symbol
+    def get(self, kind, symbols, ttl):
+        now = time.time()
+        results, errors, stale, waiting, mine = {}, {}, {}, {}, []
+        with self.lock:
+            for symbol in dict.fromkeys(symbols):
+                self.watched[(kind, symbol)] = min(ttl, self.watched.get((kind, symbol), ttl))
+                cached = self._load(kind, symbol)
+                if cached is not None and now - cached[0] < ttl:
+                    results[symbol] = cached[1]
+                    continue
+                if cached is not None:
+                    stale[symbol] = cached[1]
+                future = self.inflight.get((kind, symbol))
+                if future is None:
+                    future = self.inflight[(kind, symbol)] = Future()
+                    mine.append(symbol)
+                waiting[symbol] = future
+
+        if mine:
+            self._fetch(kind, mine)
+        for symbol, future in waiting.items():
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                if symbol in stale:
+                    logger.warning(f"Serving cached {kind} for {symbol} after a failed refresh: {e}")
+                    results[symbol] = stale[symbol]
+                else:
+                    errors[symbol] = str(e)
+        return results, errors
+
+    def _fetch(self, kind, symbols):
+        try:
+            fetched, failed = getattr(self.provider, kind)(symbols)
+        except Exception as e:
+            fetched, failed = {}, dict.fromkeys(symbols, str(e))
+        now = time.time()
+        encode = CODECS[kind][0]
+        error = None
+        try:
+            with self.lock:
+                with self.conn:
+                    self.conn.executemany("INSERT OR REPLACE INTO fundamentals (kind, symbol, fetched_at, payload) "
+                                          "VALUES (?, ?, ?, ?)",
+                                          [(kind, symbol, now, encode(value)) for symbol, value in fetched.items()])
+        except Exception as e:
+            logger.error(f"Error caching {kind} for {len(fetched)} symbols: {e}")
+            error = e
+        finally:
+            # Waiters in other threads block on these futures, so they are resolved whatever happened above
+            with self.lock:
+                for symbol in symbols:
+                    future = self.inflight.pop((kind, symbol))
+                    if error is not None:
+                        future.set_exception(error)
+                    elif symbol in fetched:
+                        future.set_result(fetched[symbol])
+                    else:
+                        future.set_exception(LookupError(failed.get(symbol, "no data")))
+
+    # Refetch watched entries that have expired, one bulk request per kind and TTL
+    def _refresh_loop(self, interval):
+        while not self.stopped.wait(interval):
+            now = time.time()
+            due = {}
+            with self.lock:
+                for (kind, symbol), ttl in self.watched.items():
+                    fetched_at = self.conn.execute("SELECT fetched_at FROM fundamentals WHERE kind = ? AND symbol = ?",
+                                                   (kind, symbol)).fetchone()
+                    if fetched_at is not None and now - fetched_at[0] >= ttl:
+                        due.setdefault((kind, ttl), []).append(symbol)
+            for (kind, ttl), symbols in due.items():
+                try:
+                    _, errors = self.get(kind, symbols, ttl)
+                    logger.info(f"Refreshed {kind} for {len(symbols) - len(errors)}/{len(symbols)} symbols")
+                except Exception as e:
+                    logger.error(f"Error refreshing {kind} for {len(symbols)} symbols: {e}")
+
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,350 @@
+import math
+import numpy as np
+import pandas as pd
+
+# Vectorized technical indicators over an aligned price matrix (time x tickers). Every method takes
+# a list of windows and returns one (window, time, ticker) array, so a whole universe and
+# parameter grid is computed in one pass:
+#
+#   engine = IndicatorEngine.from_frames(bar_frames)        # {ticker: OHLCV frame}
+#   sma = engine.sma([10, 20, 50, 200])                     # shape (4, T, N)
+#   middle, upper, lower = engine.bollinger([20], k=2.0)
+#   state, crosses = engine.ma_cross([20, 50], [100, 200])  # shape (2, 2, T, N)
+#
+# Rolling sums for every window come from one shared pair of cumulative sums (of prices and
+# squared prices), so each extra window costs a subtraction. A window containing a missing price
+# gives NaN, as pandas' rolling(window) does. Prices are shifted by each ticker's first value
+# before summing, which keeps the differences of large cumulative sums accurate.
+
+
+# Align per-ticker frames on the union of their timestamps; returns (index, tickers, matrix)
+def price_matrix(frames, column='Close'):
+    tickers = list(frames)
+    aligned = pd.concat({ticker: frames[ticker][column] for ticker in tickers}, axis=1).sort_index()
+    return aligned.index, tickers, aligned.to_numpy(dtype='float64')
+
+
+def _leading(shape):
+    return np.full(shape, np.nan)
+
+
+class IndicatorEngine:
+    def __init__(self, prices, index=None, tickers=None):
+        prices = np.asarray(prices, dtype='float64')
+        self.prices = prices.reshape(len(prices), -1)
+        self.index = index
+        self.tickers = tickers
+        self.valid = np.isfinite(self.prices)
+
+        first = np.argmax(self.valid, axis=0)
+        self.shift = np.where(self.valid.any(axis=0), self.prices[first, np.arange(self.prices.shape[1])], 0.0)
+        shifted = np.where(self.valid, self.prices - self.shift, 0.0)
+        zeros = np.zeros((1, self.prices.shape[1]))
+        self.sums = np.concatenate([zeros, np.cumsum(shifted, axis=0)])
+        self.squares = np.concatenate([zeros, np.cumsum(shifted * shifted, axis=0)])
+        self.complete = bool(self.valid.all())
+        self.counts = None if self.complete else np.concatenate([zeros, np.cumsum(self.valid, axis=0)])
+
+    @classmethod
+    def from_frames(cls, frames, column='Close'):
+        index, tickers, matrix = price_matrix(frames, column)
+        return cls(matrix, index, tickers)
+
+    # Sum over the trailing window ending at each row, written into out; NaN until the window is
+    # full of valid prices
+    def _window(self, cumulative, window, out=None):
+        out = np.empty(self.prices.shape) if out is None else out
+        out[:window - 1] = np.nan
+        if window <= len(self.prices):
+            np.subtract(cumulative[window:], cumulative[:-window], out=out[window - 1:])
+            if not self.complete:
+                out[window - 1:][(self.counts[window:] - self.counts[:-window]) != window] = np.nan
+        return out
+
+    def sma(self, windows):
+        windows = list(windows)
+        result = np.empty((len(windows),) + self.prices.shape)
+        for out, window in zip(result, windows):
+            self._window(self.sums, window, out)
+            out /= window
+            out += self.shift
+        return result
+
+    def rolling_std(self, windows, ddof=1):
+        windows = list(windows)
+        result = np.empty((len(windows),) + self.prices.shape)
+        total = np.empty(self.prices.shape)
+        for out, window in zip(result, windows):
+            self._window(self.sums, window, total)
+            self._window(self.squares, window, out)
+            total *= total
+            total /= window
+            out -= total
+            out /= window - ddof
+            np.maximum(out, 0.0, out=out)
+            np.sqrt(out, out=out)
+        return result
+
+    # (middle, upper, lower) bands, each (window, time, ticker)
+    def bollinger(self, windows, k=2.0, ddof=1):
+        middle = self.sma(windows)
+        width = k * self.rolling_std(windows, ddof)
+        return middle, middle + width, middle - width
+
+    # Exponential moving average with alpha = 2 / (span + 1), seeded with each ticker's first price
+    # (pandas' ewm(span=span, adjust=False).mean()). A missing price carries the previous value.
+    def ema(self, spans):
+        alphas = (2.0 / (np.asarray(spans, dtype='float64') + 1.0))[:, None]
+        result = np.empty((len(spans),) + self.prices.shape)
+        current = np.full((len(spans), self.prices.shape[1]), np.nan)
+        for t, row in enumerate(self.prices):
+            valid = self.valid[t]
+            updated = np.where(np.isnan(current), row, alphas * row + (1.0 - alphas) * current)
+            current = np.where(valid, updated, current)
+            result[:, t] = current
+        return result
+
+    # Relative strength index. 'wilder' seeds each average with the mean of the first `window`
+    # changes and then smooths with alpha = 1 / window; 'sma' takes rolling means of gains and
+    # losses (Cutler's RSI), which is what the bots' calculate_rsi has always reported.
+    def rsi(self, windows, method='wilder'):
+        delta = np.diff(self.prices, axis=0, prepend=np.nan)
+        gains = np.where(delta > 0, delta, 0.0)
+        losses = np.where(delta < 0, -delta, 0.0)
+        result = []
+        for window in windows:
+            if method == 'sma':
+                average_gain = self._rolling_mean(gains, window)
+                average_loss = self._rolling_mean(losses, window)
+            elif method == 'wilder':
+                average_gain, average_loss = self._wilder(gains, losses, np.isfinite(delta), window)
+            else:
+                raise ValueError(f"Unknown RSI method {method!r}")
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result.append(100.0 - 100.0 / (1.0 + average_gain / average_loss))
+        return np.stack(result)
+
+    @staticmethod
+    def _rolling_mean(values, window):
+        out = _leading(values.shape)
+        if window <= len(values):
+            cumulative = np.concatenate([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+            out[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+        return out
+
+    @staticmethod
+    def _wilder(gains, losses, changed, window):
+        shape = gains.shape
+        average_gain, average_loss = _leading(shape), _leading(shape)
+        seen = np.zeros(shape[1])
+        gain_state, loss_state = np.zeros(shape[1]), np.zeros(shape[1])
+        for t in range(shape[0]):
+            step = changed[t]
+            seeding = step & (seen < window)
+            gain_state = np.where(seeding, gain_state + gains[t], gain_state)
+            loss_state = np.where(seeding, loss_state + losses[t], loss_state)
+            seen = seen + step
+            seeded = seeding & (seen == window)
+            gain_state = np.where(seeded, gain_state / window, gain_state)
+            loss_state = np.where(seeded, loss_state / window, loss_state)
+            smoothing = step & ~seeding
+            gain_state = np.where(smoothing, (gain_state * (window - 1) + gains[t]) / window, gain_state)
+            loss_state = np.where(smoothing, (loss_state * (window - 1) + losses[t]) / window, loss_state)
+            ready = seen >= window
+            average_gain[t] = np.where(ready, gain_state, np.nan)
+            average_loss[t] = np.where(ready, loss_state, np.nan)
+        return average_gain, average_loss
+
+    # Moving-average cross for every (short, long) pair. state is +1 while the short average is above
+    # the long one, -1 while below, 0 when equal or not yet defined; crosses is +1 on the row of a
+    # golden cross, -1 on a death cross and 0 elsewhere. Both are (short, long, time, ticker).
+    def ma_cross(self, short_windows, long_windows, kind='sma'):
+        averages = self.sma if kind == 'sma' else self.ema
+        short, long = averages(short_windows), averages(long_windows)
+        short, long = short[:, None], long[None, :]
+        # Comparisons with NaN are False, so undefined averages give 0
+        state = (short > long).astype(np.int8) - (short < long).astype(np.int8)
+        crosses = np.zeros_like(state)
+        previous, current = state[:, :, :-1], state[:, :, 1:]
+        crosses[:, :, 1:] = np.where((current != previous) & (current != 0) & (previous != 0), current, 0)
+        return state, crosses
+
+    # One indicator row per ticker as a Series (e.g. engine.series(engine.sma([20])[0], 'AAPL'))
+    def series(self, values, ticker=0):
+        column = self.tickers.index(ticker) if self.tickers and not isinstance(ticker, int) else ticker
+        return pd.Series(values[:, column], index=self.index)
+
+
+
+# Streaming versions of the indicators above for live bars: update(price) takes the newest close and
+# returns the indicator's new value in O(1) whatever the history length, matching the batch value
+# on the same prices (NaN until enough prices have been seen, NaN for a missing price). state()
+# returns a JSON-serializable checkpoint and from_state() resumes from one.
+class _Streaming:
+    def state(self):
+        return {name: getattr(self, name) for klass in type(self).__mro__ for name in getattr(klass, '__slots__', ())}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(**state)
+
+
+# The last `window` prices in a ring buffer with their running sum and sum of squares. As in the
+# engine, prices are shifted by the first one seen, and the sums are recomputed from the buffer
+# whenever it wraps around so rounding errors don't accumulate.
+class StreamingSMA(_Streaming):
+    __slots__ = ('window', 'buffer', 'position', 'seen', 'missing', 'shift', 'total', 'total_sq')
+
+    def __init__(self, window, buffer=None, position=0, seen=0, missing=0, shift=None, total=0.0, total_sq=0.0):
+        self.window = window
+        self.buffer = buffer if buffer is not None else [0.0] * window  # shifted prices, None if missing
+        self.position = position
+        self.seen = seen
+        self.missing = missing  # missing prices in the window
+        self.shift = shift
+        self.total = total
+        self.total_sq = total_sq
+
+    def push(self, price):
+        valid = price == price
+        if valid and self.shift is None:
+            self.shift = price
+        value = price - self.shift if valid else 0.0
+        old = self.buffer[self.position]
+        if old is None:
+            self.missing -= 1
+        self.buffer[self.position] = value if valid else None
+        self.missing += not valid
+        self.seen += 1
+        self.position = (self.position + 1) % self.window
+        if self.position == 0:
+            values = [value or 0.0 for value in self.buffer]
+            self.total = math.fsum(values)
+            self.total_sq = math.fsum(value * value for value in values)
+        else:
+            old = old or 0.0
+            self.total += value - old
+            self.total_sq += value * value - old * old
+
+    @property
+    def ready(self):
+        return self.seen >= self.window and not self.missing
+
+    @property
+    def mean(self):
+        return self.total / self.window + self.shift if self.ready else math.nan
+
+    def update(self, price):
+        self.push(price)
+        return self.mean
+
+
+# Rolling variance (ddof=1 like pandas' rolling std); update() returns the variance, and the
+# window's mean and std are available as properties
+class StreamingVariance(StreamingSMA):
+    __slots__ = ('ddof',)
+
+    def __init__(self, window, ddof=1, **state):
+        super().__init__(window, **state)
+        self.ddof = ddof
+
+    @property
+    def variance(self):
+        if not self.ready:
+            return math.nan
+        return max((self.total_sq - self.total * self.total / self.window) / (self.window - self.ddof), 0.0)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def update(self, price):
+        self.push(price)
+        return self.variance
+
+
+class StreamingEMA(_Streaming):
+    __slots__ = ('span', 'value')
+
+    def __init__(self, span, value=None):
+        self.span = span
+        self.value = value
+
+    def update(self, price):
+        if price == price:
+            alpha = 2.0 / (self.span + 1.0)
+            self.value = price if self.value is None else alpha * price + (1.0 - alpha) * self.value
+        return self.value if self.value is not None else math.nan
+
+
+def _rsi(average_gain, average_loss):
+    if average_loss == 0:
+        return 100.0 if average_gain > 0 else math.nan
+    return 100.0 - 100.0 / (1.0 + average_gain / average_loss)
+
+
+# method as in IndicatorEngine.rsi: 'wilder' or 'sma'
+class StreamingRSI(_Streaming):
+    __slots__ = ('window', 'method', 'previous', 'seen', 'average_gain', 'average_loss', 'gains', 'losses')
+
+    def __init__(self, window, method='wilder', previous=math.nan, seen=0, average_gain=0.0, average_loss=0.0,
+                 gains=None, losses=None):
+        if method not in ('wilder', 'sma'):
+            raise ValueError(f"Unknown RSI method {method!r}")
+        self.window = window
+        self.method = method
+        self.previous = previous
+        self.seen = seen  # price changes seen, for the Wilder seed
+        self.average_gain = average_gain
+        self.average_loss = average_loss
+        self.gains = StreamingSMA.from_state(gains) if gains else StreamingSMA(window)
+        self.losses = StreamingSMA.from_state(losses) if losses else StreamingSMA(window)
+
+    def state(self):
+        return dict(super().state(), gains=self.gains.state(), losses=self.losses.state())
+
+    def update(self, price):
+        delta = price - self.previous
+        self.previous = price
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        if self.method == 'sma':
+            return _rsi(self.gains.update(gain), self.losses.update(loss))
+
+        if delta == delta:
+            if self.seen < self.window:
+                self.average_gain += gain
+                self.average_loss += loss
+                self.seen += 1
+                if self.seen == self.window:
+                    self.average_gain /= self.window
+                    self.average_loss /= self.window
+            else:
+                self.average_gain = (self.average_gain * (self.window - 1) + gain) / self.window
+                self.average_loss = (self.average_loss * (self.window - 1) + loss) / self.window
+        if self.seen < self.window:
+            return math.nan
+        return _rsi(self.average_gain, self.average_loss)
+
+
+# Moving-average cross as in IndicatorEngine.ma_cross; update() returns (state, cross)
+class StreamingMACross(_Streaming):
+    __slots__ = ('short_window', 'long_window', 'kind', 'short', 'long', 'current')
+
+    def __init__(self, short_window, long_window, kind='sma', short=None, long=None, current=0):
+        averages = StreamingSMA if kind == 'sma' else StreamingEMA
+        self.short_window = short_window
+        self.long_window = long_window
+        self.kind = kind
+        self.short = averages.from_state(short) if short else averages(short_window)
+        self.long = averages.from_state(long) if long else averages(long_window)
+        self.current = current
+
+    def state(self):
+        return dict(super().state(), short=self.short.state(), long=self.long.state())
+
+    def update(self, price):
+        short, long = self.short.update(price), self.long.update(price)
+        previous, self.current = self.current, int(short > long) - int(short < long)
+        cross = self.current if previous and self.current and previous != self.current else 0
+        return self.current, cross
@@ -0,0 +1,76 @@
+import re
+
+_END = ''
+
+
+# Lowercase a keyword and collapse its whitespace so "Model  3" and "model 3" are the same key
+def normalize_keyword(keyword):
+    return ' '.join(keyword.lower().split())
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+# Build a regex from a character trie, so every text position tries at most one branch per character
+def _trie_pattern(node):
+    branches = []
+    for char, child in sorted(node.items()):
+        if char == _END:
+            continue
+        token = r'\s+' if char == ' ' else re.escape(char)
+        branches.append(token + _trie_pattern(child))
+
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if _END in node:
+        return '(?:' + pattern + ')?'
+    return pattern
+
+
+# Matches every ticker keyword in one scan of a post; built once from SETTINGS['tickers_and_keywords']
+class KeywordMatcher:
+    def __init__(self, tickers_and_keywords):
+        self.tickers = list(tickers_and_keywords)
+        self.owners = {}  # normalized keyword -> [(ticker, keyword), ...]
+        for ticker, keywords in tickers_and_keywords.items():
+            for keyword in keywords:
+                key = normalize_keyword(keyword)
+                if key:
+                    self.owners.setdefault(key, []).append((ticker, keyword))
+
+        # The regex returns the longest keyword at each position; shorter keywords that end
+        # on a word boundary inside it ("Model" inside "Model 3") are resolved from this table
+        self.prefixes = {
+            key: [key[:i] for i in range(1, len(key))
+                  if key[:i] in self.owners and not (_is_word_char(key[i - 1]) and _is_word_char(key[i]))]
+            for key in self.owners
+        }
+
+        trie = {}
+        for key in self.owners:
+            node = trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node[_END] = {}
+
+        # The lookahead makes matches overlap, so "Google Cloud" and "Cloud" are both found
+        self.pattern = re.compile(r'(?<!\w)(?=(' + _trie_pattern(trie) + r')(?!\w))', re.IGNORECASE)
+
+    # Return {ticker: set of matched keywords} for all given texts, in config ticker order
+    def match(self, *texts):
+        text = '\n'.join(t for t in texts if t)
+        found = set()
+        for hit in self.pattern.findall(text):
+            key = normalize_keyword(hit)
+            found.add(key)
+            found.update(self.prefixes[key])
+
+        matches = {}
+        for key in found:
+            for ticker, keyword in self.owners[key]:
+                matches.setdefault(ticker, set()).add(keyword)
+        return {ticker: matches[ticker] for ticker in self.tickers if ticker in matches}
+
+    def match_tickers(self, *texts):
+        return list(self.match(*texts))
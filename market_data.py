@@ -0,0 +1,249 @@
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import yfinance as yf
+from fundamentals_cache import CachedProvider
+
+logger = logging.getLogger(__name__)
+
+# Market data for many symbols at once. A provider answers for a list of symbols and returns
+# (results by symbol, errors by symbol), so one bad ticker never fails a whole universe:
+#
+#   history(symbols, interval='1d', period=None, start=None) -> ({symbol: OHLCV frame}, errors)
+#   info(symbols, fields=None)                              -> ({symbol: info dict}, errors)
+#   financials / balance_sheet / cashflow(symbols)          -> ({symbol: statement frame}, errors)
+#
+# fields names the info fields the caller will read; caching providers use it to pick a TTL.
+# YFinanceProvider downloads history in batches with yf.download and runs the per-symbol
+# endpoints (info, statements) on a bounded thread pool. FileProvider serves a snapshot saved
+# with save_snapshot(), so tests and benchmarks run offline against the same interface.
+# fundamentals_cache.CachedProvider wraps either one with a shared on-disk cache.
+
+_PERIOD = re.compile(r'^(\d+)(d|wk|mo|y)$')
+
+
+# Start of a yfinance period ('5d', '3mo', '1y', 'ytd', 'max') ending now; None for 'max'
+def period_start(period, now=None):
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return pd.Timestamp(year=now.year, month=1, day=1, tz='UTC')
+    match = _PERIOD.match(period)
+    if not match:
+        raise ValueError(f"Unsupported period {period!r}")
+    amount, unit = int(match.group(1)), match.group(2)
+    offset = {'d': pd.DateOffset(days=amount), 'wk': pd.DateOffset(weeks=amount),
+              'mo': pd.DateOffset(months=amount), 'y': pd.DateOffset(years=amount)}[unit]
+    return now - offset
+
+
+class YFinanceProvider:
+    def __init__(self, max_workers=8, batch_size=100):
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="market-data")
+
+    def history(self, symbols, interval='1d', period=None, start=None):
+        frames, errors = {}, {}
+        symbols = list(dict.fromkeys(symbols))
+        for offset in range(0, len(symbols), self.batch_size):
+            batch = symbols[offset:offset + self.batch_size]
+            span = {'start': start} if start is not None else {'period': period or '1y'}
+            try:
+                data = yf.download(batch, interval=interval, group_by='ticker', actions=True, auto_adjust=True,
+                                   ignore_tz=False, threads=self.max_workers, progress=False, **span)
+            except Exception as e:
+                logger.error(f"Error downloading {interval} history for {len(batch)} symbols: {e}")
+                errors.update(dict.fromkeys(batch, str(e)))
+                continue
+            # yfinance logs per-symbol failures and leaves those symbols' columns empty
+            columns = set(data.columns.get_level_values(0)) if data is not None else set()
+            for symbol in batch:
+                frame = data[symbol.upper()].dropna(how='all') if symbol.upper() in columns else None
+                if frame is None or frame.empty:
+                    errors[symbol] = "no data"
+                else:
+                    frame.columns.name = None
+                    frames[symbol] = frame
+        return frames, errors
+
+    # Run function(symbol) for every symbol on the thread pool
+    def fetch_each(self, symbols, function):
+        results, errors = {}, {}
+        futures = {symbol: self.pool.submit(function, symbol) for symbol in dict.fromkeys(symbols)}
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                errors[symbol] = str(e)
+        return results, errors
+
+    def info(self, symbols, fields=None):
+        return self.fetch_each(symbols, lambda symbol: yf.Ticker(symbol).info)
+
+    def financials(self, symbols, fields=None):
+        return self.fetch_each(symbols, lambda symbol: yf.Ticker(symbol).financials)
+
+    def balance_sheet(self, symbols, fields=None):
+        return self.fetch_each(symbols, lambda symbol: yf.Ticker(symbol).balance_sheet)
+
+    def cashflow(self, symbols, fields=None):
+        return self.fetch_each(symbols, lambda symbol: yf.Ticker(symbol).cashflow)
+
+
+# Reads a snapshot directory:
+#   <root>/history/<interval>/<SYMBOL>.parquet, <root>/info/<SYMBOL>.json,
+#   <root>/<financials|balance_sheet|cashflow>/<SYMBOL>.parquet
+class FileProvider:
+    def __init__(self, root='market_data'):
+        self.root = root
+
+    def _path(self, kind, symbol, extension, interval=None):
+        parts = [self.root, kind] + ([interval] if interval else []) + [f"{symbol.replace('/', '_')}.{extension}"]
+        return os.path.join(*parts)
+
+    def _each(self, symbols, load):
+        results, errors = {}, {}
+        for symbol in dict.fromkeys(symbols):
+            try:
+                results[symbol] = load(symbol)
+            except FileNotFoundError:
+                errors[symbol] = "not in snapshot"
+        return results, errors
+
+    def history(self, symbols, interval='1d', period=None, start=None):
+        since = pd.Timestamp(start) if start is not None else period_start(period or 'max')
+        if since is not None and since.tzinfo is None:
+            since = since.tz_localize('UTC')
+
+        def load(symbol):
+            frame = pd.read_parquet(self._path('history', symbol, 'parquet', interval))
+            if since is None:
+                return frame
+            return frame[frame.index >= (since if frame.index.tz is not None else since.tz_localize(None))]
+
+        frames, errors = self._each(symbols, load)
+        for symbol in [symbol for symbol, frame in frames.items() if frame.empty]:
+            errors[symbol] = "no data"
+            del frames[symbol]
+        return frames, errors
+
+    def info(self, symbols, fields=None):
+        def load(symbol):
+            with open(self._path('info', symbol, 'json')) as f:
+                return json.load(f)
+        return self._each(symbols, load)
+
+    # Stored transposed: parquet needs string column names and statements have dates as columns
+    def _statements(self, kind, symbols):
+        return self._each(symbols, lambda symbol: pd.read_parquet(self._path(kind, symbol, 'parquet')).T)
+
+    def financials(self, symbols, fields=None):
+        return self._statements('financials', symbols)
+
+    def balance_sheet(self, symbols, fields=None):
+        return self._statements('balance_sheet', symbols)
+
+    def cashflow(self, symbols, fields=None):
+        return self._statements('cashflow', symbols)
+
+    def save_history(self, symbol, interval, frame):
+        path = self._path('history', symbol, 'parquet', interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame.to_parquet(path)
+
+    def save_info(self, symbol, info):
+        path = self._path('info', symbol, 'json')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(info, f, default=str)
+
+    def save_statement(self, kind, symbol, frame):
+        path = self._path(kind, symbol, 'parquet')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame.T.to_parquet(path)
+
+
+STATEMENTS = ['financials', 'balance_sheet', 'cashflow']
+
+
+# Copy what source serves for symbols into a FileProvider snapshot at root; returns the errors
+def save_snapshot(source, symbols, root, period='1y', interval='1d'):
+    snapshot = FileProvider(root)
+    errors = {}
+    frames, history_errors = source.history(symbols, interval, period=period)
+    for symbol, frame in frames.items():
+        snapshot.save_history(symbol, interval, frame)
+    infos, info_errors = source.info(symbols)
+    for symbol, info in infos.items():
+        snapshot.save_info(symbol, info)
+    all_errors = [('history', history_errors), ('info', info_errors)]
+    for kind in STATEMENTS:
+        statements, statement_errors = getattr(source, kind)(symbols)
+        for symbol, frame in statements.items():
+            snapshot.save_statement(kind, symbol, frame)
+        all_errors.append((kind, statement_errors))
+    for kind, kind_errors in all_errors:
+        for symbol, error in kind_errors.items():
+            errors.setdefault(symbol, {})[kind] = error
+    return errors
+
+
+_providers = {}
+
+
+# Shared provider instances: 'yfinance', or 'files' reading the snapshot in root. yfinance
+# fundamentals go through the cache at cache_path unless it is None.
+def get_provider(name='yfinance', root='market_data', max_workers=8, cache_path='fundamentals_cache.db'):
+    key = (name, root if name == 'files' else cache_path)
+    if key not in _providers:
+        if name == 'yfinance':
+            provider = YFinanceProvider(max_workers=max_workers)
+            _providers[key] = CachedProvider(provider, cache_path) if cache_path else provider
+        elif name == 'files':
+            _providers[key] = FileProvider(root)
+        else:
+            raise ValueError(f"Unknown market data provider {name!r}; expected 'yfinance' or 'files'")
+    return _providers[key]
+
+
+def main():
+    from bar_store import BarStore
+
+    parser = argparse.ArgumentParser(description="Refresh the local bar store for a universe of symbols")
+    parser.add_argument('symbols', nargs='*')
+    parser.add_argument('--symbols-file', help="file with one symbol per line")
+    parser.add_argument('--period', default='1y')
+    parser.add_argument('--interval', default='1d')
+    parser.add_argument('--provider', choices=['yfinance', 'files'], default='yfinance')
+    parser.add_argument('--data-dir', default='market_data', help="snapshot directory of the files provider")
+    parser.add_argument('--bars', default='bars', help="bar store directory")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--save-snapshot', metavar='DIR', help="save history, info and financials for offline use")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    symbols = list(args.symbols)
+    if args.symbols_file:
+        with open(args.symbols_file) as f:
+            symbols += [line.strip() for line in f if line.strip()]
+    provider = get_provider(args.provider, args.data_dir, args.workers)
+
+    start = time.monotonic()
+    if args.save_snapshot:
+        errors = save_snapshot(provider, symbols, args.save_snapshot, args.period, args.interval)
+    else:
+        errors = BarStore(args.bars, provider=provider).refresh(symbols, args.period, args.interval)
+    logger.info(f"Refreshed {len(symbols) - len(errors)}/{len(symbols)} symbols in {time.monotonic() - start:.1f}s")
+    for symbol, error in sorted(errors.items()):
+        logger.warning(f"{symbol}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+# Upper bounds in seconds; tuned for HTTP calls, SQLite commits and rate-limit waits
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+# Base for labelled metrics: one value per combination of label values, guarded by a lock
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames) or any(name not in labels for name in self.labelnames):
+            raise ValueError(f"{self.name} takes labels {list(self.labelnames)}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    # (labels dict, value) for every label combination seen so far
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.samples():
+            lines.append(f"{self.name}{self._label_text(tuple(labels.values()))} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = self._key(labels)
+        with self.lock:
+            return self.values.get(key, 0)
+
+
+# A value that goes up and down; set_function registers a callback read at scrape time instead
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set_function(self, function, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.functions[key] = function
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+            functions = list(self.functions.items())
+        for key, function in functions:
+            try:
+                items.append((key, function()))
+            except Exception as e:
+                logger.debug(f"Error reading gauge {self.name}: {e}")
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items if value is not None]
+
+
+# Bucketed distribution of observations, with their count and sum
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts with a final +Inf bucket, then sum and count
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    # Observe the duration of the with-block
+    @contextmanager
+    def time(self, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self.values.items()]
+        return [(dict(zip(self.labelnames, key)), state) for key, state in items]
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for labels, (counts, total, count) in self.samples():
+            key = tuple(labels.values())
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._label_text(key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+# Named metrics of a process. Registering a name twice returns the existing metric if it has
+# the same type and labels, so modules can declare the metrics they share.
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind} with labels {list(metric.labelnames)}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    # Prometheus text exposition format (version 0.0.4)
+    def expose(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.expose().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Scrapes every few seconds would drown the collector log
+    def log_message(self, format, *args):
+        pass
+
+
+# Serve the registry at http://host:port/metrics from a daemon thread
+def start_http_server(port, host='127.0.0.1', registry=REGISTRY):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    thread = threading.Thread(target=server.serve_forever, name="MetricsServer")
+    thread.daemon = True
+    thread.start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
+
+
+# Collector progress, shared by both collectors and the comment hydrator
+POSTS_FETCHED = REGISTRY.counter('collector_posts_fetched_total', "New posts stored", ['ticker', 'subreddit'])
+POSTS_SKIPPED = REGISTRY.counter('collector_posts_skipped_total', "Posts skipped because they were already stored",
+                                 ['ticker', 'subreddit'])
+COMMENTS_FETCHED = REGISTRY.counter('collector_comments_fetched_total', "New comments stored", ['ticker', 'subreddit'])
+COMMENTS_SKIPPED = REGISTRY.counter('collector_comments_skipped_total',
+                                    "Comments skipped because they were already stored", ['ticker', 'subreddit'])
+
+PROGRESS_COUNTERS = {
+    'posts_fetched': POSTS_FETCHED,
+    'posts_skipped': POSTS_SKIPPED,
+    'comments_fetched': COMMENTS_FETCHED,
+    'comments_skipped': COMMENTS_SKIPPED,
+}
+
+
+# Running progress totals per ticker, summed over subreddits
+def progress_totals():
+    totals = defaultdict(lambda: dict.fromkeys(PROGRESS_COUNTERS, 0))
+    for name, counter in PROGRESS_COUNTERS.items():
+        for labels, value in counter.samples():
+            totals[labels['ticker']][name] += value
+    return dict(totals)
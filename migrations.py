@@ -0,0 +1,171 @@
+import logging
+import sqlite3
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+
+def _add_column(conn, table, column, definition):
+    try:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" not in str(e).lower():
+            raise
+
+
+# Read-side indexes for "posts for ticker T between t0 and t1, with their comments".
+# news_tickers gets the post timestamp so one index range covers every post linked to a
+# ticker, including posts whose news.ticker is another ticker they matched first.
+# A post can match several tickers; news.ticker keeps the first match and news_tickers keeps all
+# of them. The table is created here, and is already there in databases that predate migrations.
+def _read_indexes(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS news_tickers
+                    (post_id TEXT,
+                     ticker TEXT,
+                     PRIMARY KEY (post_id, ticker),
+                     FOREIGN KEY(post_id) REFERENCES news(id))''')
+    _add_column(conn, 'news_tickers', 'timestamp', 'REAL')
+    conn.execute('''UPDATE news_tickers SET timestamp = (SELECT n.timestamp FROM news n WHERE n.id = news_tickers.post_id)
+                    WHERE timestamp IS NULL''')
+    # Posts stored before news_tickers existed are only linked through news.ticker
+    conn.execute('''INSERT OR IGNORE INTO news_tickers (post_id, ticker, timestamp)
+                    SELECT id, ticker, timestamp FROM news WHERE ticker IS NOT NULL''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_news_tickers_ticker_timestamp ON news_tickers (ticker, timestamp, post_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_news_timestamp ON news (timestamp, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments (post_id, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_comments_timestamp ON comments (timestamp, comment_id)")
+
+
+# Partial indexes holding only rows without a sentiment label, for the sentiment scorer.
+# A row leaves its index as soon as it is scored, so finding the backlog stays cheap.
+def _unscored_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_news_unscored ON news (sentiment_label) WHERE sentiment_label IS NULL")
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_comments_unscored ON comments (sentiment_label)
+                    WHERE sentiment_label IS NULL''')
+
+
+# Per-ticker sentiment kept up to date by sentiment_aggregator.py: time buckets of exact sums,
+# and one row of exponentially decayed statistics per ticker and horizon
+def _sentiment_aggregates(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS sentiment_buckets
+                    (ticker TEXT,
+                     bucket_seconds INTEGER,
+                     bucket_start INTEGER,
+                     count INTEGER,
+                     total REAL,
+                     total_sq REAL,
+                     weight REAL,
+                     weighted REAL,
+                     positive INTEGER,
+                     negative INTEGER,
+                     PRIMARY KEY (ticker, bucket_seconds, bucket_start)) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS sentiment_signal
+                    (ticker TEXT,
+                     horizon TEXT,
+                     half_life REAL,
+                     updated_at REAL,
+                     count REAL,
+                     total REAL,
+                     total_sq REAL,
+                     weight REAL,
+                     weighted REAL,
+                     weighted_sq REAL,
+                     PRIMARY KEY (ticker, horizon)) WITHOUT ROWID''')
+
+
+# Posts waiting for their comments, so hydration work survives restarts and a full in-memory
+# queue. Stored posts that report comments but have none stored are queued once here.
+def _comment_hydration(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS comment_hydration
+                    (post_id TEXT PRIMARY KEY,
+                     ticker TEXT,
+                     subreddit TEXT,
+                     num_comments INTEGER,
+                     score INTEGER,
+                     attempts INTEGER DEFAULT 0,
+                     queued_at REAL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_comment_hydration_priority ON comment_hydration (num_comments, score)")
+    conn.execute('''INSERT OR IGNORE INTO comment_hydration (post_id, ticker, num_comments, score, queued_at)
+                    SELECT n.id, n.ticker, n.comments, n.score, n.last_fetched FROM news n
+                    WHERE n.comments > 0 AND NOT EXISTS (SELECT 1 FROM comments c WHERE c.post_id = n.id)''')
+
+
+# Resumable crawl state for asyc_data_bot.py: where each (ticker, subreddit, query) search walk
+# stopped, and the scheduler's yield estimates. Earlier databases got these tables from
+# setup_database, so they are created only if missing.
+def _crawl_state(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS crawl_checkpoints
+                    (ticker TEXT,
+                     subreddit TEXT,
+                     query TEXT,
+                     newest_utc REAL,
+                     oldest_utc REAL,
+                     head_cursor TEXT,
+                     head_newest_utc REAL,
+                     backfill_cursor TEXT,
+                     backfill_done INTEGER DEFAULT 0,
+                     updated_at REAL,
+                     PRIMARY KEY (ticker, subreddit, query))''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS crawl_schedule
+                    (ticker TEXT,
+                     subreddit TEXT,
+                     query TEXT,
+                     runs INTEGER,
+                     last_run_at REAL,
+                     rate_ewma REAL,
+                     backfill_yield_ewma REAL,
+                     backfill_done INTEGER,
+                     last_new_posts INTEGER,
+                     PRIMARY KEY (ticker, subreddit, query))''')
+
+
+# Scoring order for parquet_export.py: the sentiment scorer numbers the rows it labels, so an
+# export finds rows scored since its last run. Rows scored before this step have no number.
+def _scoring_sequence(conn):
+    for table in ('news', 'comments'):
+        _add_column(conn, table, 'scored_seq', 'INTEGER')
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_scored_seq ON {table} (scored_seq)")
+
+
+# Ticker links not yet counted in the sentiment aggregates. The scorer counts a post's scored rows
+# for a ticker it was linked to after scoring, e.g. when it turned up again under another ticker.
+# Existing links are already covered by their rows' own scoring.
+def _aggregated_links(conn):
+    _add_column(conn, 'news_tickers', 'aggregated', 'INTEGER DEFAULT 0')
+    conn.execute("UPDATE news_tickers SET aggregated = 1")
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_news_tickers_unaggregated ON news_tickers (aggregated)
+                    WHERE aggregated = 0''')
+
+
+# Schema changes in order; the database's PRAGMA user_version is the number applied so far.
+# Append new steps at the end and never edit or reorder released ones.
+MIGRATIONS = [
+    _read_indexes,
+    _unscored_indexes,
+    _sentiment_aggregates,
+    _comment_hydration,
+    _crawl_state,
+    _scoring_sequence,
+    _aggregated_links,
+]
+
+
+# Bring news_data.db up to the latest schema version. Each step runs in its own IMMEDIATE
+# transaction, so two collectors starting at once cannot both apply it.
+def migrate(conn):
+    if conn.in_transaction:
+        conn.commit()
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                conn.rollback()
+                return version
+            step = MIGRATIONS[version]
+            logger.info(f"Migrating news_data.db to schema version {version + 1} ({step.__name__.strip('_')})")
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
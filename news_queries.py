@@ -0,0 +1,113 @@
+# Read-side access to news_data.db (indexes come from migrations.py). Every iterator pages with
+# a (timestamp, id) keyset instead of OFFSET, so each page is one index range and no read
+# transaction stays open while the caller works through the rows.
+
+POST_COLUMNS = ['id', 'ticker', 'timestamp', 'title', 'text', 'score', 'comments', 'sentiment_label', 'sentiment_value']
+COMMENT_COLUMNS = ['comment_id', 'post_id', 'author', 'body', 'timestamp', 'score', 'permalink',
+                   'sentiment_label', 'sentiment_value']
+
+
+def _time_range(column, since, until):
+    clauses, params = [], []
+    if since is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{column} < ?")
+        params.append(until)
+    return clauses, params
+
+
+# Posts for a ticker (every post linked to it in news_tickers) or for all tickers, oldest first.
+# since/until are UTC timestamps, until exclusive. Yields one dict per post.
+def iter_posts(conn, ticker=None, since=None, until=None, page_size=1000):
+    columns = ', '.join(f"n.{column}" for column in POST_COLUMNS)
+    if ticker is not None:
+        time_column, id_column = 't.timestamp', 't.post_id'
+        source = "news_tickers t JOIN news n ON n.id = t.post_id"
+        clauses, params = ['t.ticker = ?'], [ticker]
+    else:
+        time_column, id_column = 'n.timestamp', 'n.id'
+        source = "news n"
+        clauses, params = [], []
+    range_clauses, range_params = _time_range(time_column, since, until)
+    clauses += range_clauses + [f"{time_column} IS NOT NULL"]
+    params += range_params
+
+    cursor = None
+    while True:
+        where = list(clauses)
+        page_params = list(params)
+        if cursor is not None:
+            where.append(f"({time_column} > ? OR ({time_column} = ? AND {id_column} > ?))")
+            page_params += [cursor[0], cursor[0], cursor[1]]
+        rows = conn.execute(f"SELECT {columns} FROM {source} WHERE {' AND '.join(where)} "
+                            f"ORDER BY {time_column}, {id_column} LIMIT ?", (*page_params, page_size)).fetchall()
+        for row in rows:
+            yield dict(zip(POST_COLUMNS, row))
+        if len(rows) < page_size:
+            return
+        cursor = (rows[-1][POST_COLUMNS.index('timestamp')], rows[-1][POST_COLUMNS.index('id')])
+
+
+# Comments of the given posts as {post_id: [comment, ...]}, each list oldest first
+def comments_for_posts(conn, post_ids, limit_per_post=None):
+    grouped = {post_id: [] for post_id in post_ids}
+    post_ids = list(grouped)
+    columns = ', '.join(COMMENT_COLUMNS)
+    # Stay below SQLite's bound-parameter limit on older builds
+    for start in range(0, len(post_ids), 900):
+        chunk = post_ids[start:start + 900]
+        rows = conn.execute(f"SELECT {columns} FROM comments WHERE post_id IN ({', '.join('?' * len(chunk))}) "
+                            f"ORDER BY post_id, timestamp", chunk)
+        for row in rows:
+            comment = dict(zip(COMMENT_COLUMNS, row))
+            comments = grouped[comment['post_id']]
+            if limit_per_post is None or len(comments) < limit_per_post:
+                comments.append(comment)
+    return grouped
+
+
+# Posts as iter_posts yields them, each with a 'comment_data' list of its comments.
+# Comments are loaded one page of posts at a time with a single indexed query.
+def iter_posts_with_comments(conn, ticker=None, since=None, until=None, page_size=500, limit_per_post=None):
+    page = []
+    for post in iter_posts(conn, ticker, since, until, page_size):
+        page.append(post)
+        if len(page) >= page_size:
+            yield from _attach_comments(conn, page, limit_per_post)
+            page = []
+    if page:
+        yield from _attach_comments(conn, page, limit_per_post)
+
+
+def _attach_comments(conn, posts, limit_per_post):
+    grouped = comments_for_posts(conn, [post['id'] for post in posts], limit_per_post)
+    for post in posts:
+        post['comment_data'] = grouped[post['id']]
+        yield post
+
+
+# Comments written between since and until on posts linked to a ticker (or all posts), oldest first
+def iter_comments(conn, ticker=None, since=None, until=None, page_size=1000):
+    columns = ', '.join(f"c.{column}" for column in COMMENT_COLUMNS)
+    clauses, params = _time_range('c.timestamp', since, until)
+    clauses.append("c.timestamp IS NOT NULL")
+    if ticker is not None:
+        clauses.append("c.post_id IN (SELECT post_id FROM news_tickers WHERE ticker = ?)")
+        params.append(ticker)
+
+    cursor = None
+    while True:
+        where = list(clauses)
+        page_params = list(params)
+        if cursor is not None:
+            where.append("(c.timestamp > ? OR (c.timestamp = ? AND c.comment_id > ?))")
+            page_params += [cursor[0], cursor[0], cursor[1]]
+        rows = conn.execute(f"SELECT {columns} FROM comments c WHERE {' AND '.join(where)} "
+                            f"ORDER BY c.timestamp, c.comment_id LIMIT ?", (*page_params, page_size)).fetchall()
+        for row in rows:
+            yield dict(zip(COMMENT_COLUMNS, row))
+        if len(rows) < page_size:
+            return
+        cursor = (rows[-1][COMMENT_COLUMNS.index('timestamp')], rows[-1][COMMENT_COLUMNS.index('comment_id')])
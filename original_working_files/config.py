@@ -25,6 +25,16 @@ SETTINGS = {
     'sell_threshold': -0.2,          # Sentiment threshold to consider selling
     'logging_level': 'INFO',         # Logging level (e.g., DEBUG, INFO, WARNING, ERROR)
     'sentiment_model_name': 'distilbert-base-uncased-finetuned-sst-2-english', # Name of the model used for sentiment analysis
-    'sentiment_max_length': 512,     # Max length for sentiment analysis inputs
+    'sentiment_max_length': 512,     # Max tokens per sentiment model window; longer texts are split into overlapping windows
     'use_gpu': False,                # Whether to use GPU for sentiment analysis (set to True if GPU is available)
+    'sentiment_backend': 'pytorch',  # Inference engine: 'pytorch', 'onnx' or 'int8'; the last two run on CPU only
+    'sentiment_cache_path': 'sentiment_cache.db',  # Sentiment results cached by model and normalized text
+    'bar_store_dir': 'bars',         # Local store of downloaded price bars, one file per interval and ticker
+    'bar_refresh_seconds': 900,      # Stored bars are served this long before newer ones are fetched
+    'market_data_provider': 'yfinance',  # 'yfinance', or 'files' to read a snapshot saved by market_data.py
+    'market_data_dir': 'market_data',  # Snapshot directory of the 'files' provider
+    'market_data_workers': 8,        # Concurrent yfinance requests
+    'fundamentals_cache_path': 'fundamentals_cache.db',  # Shared cache of ticker info and statements; None disables it
+    'sentiment_service_address': None,  # Socket of a running sentiment_service.py; None loads the model once in-process
+    'sentiment_service_authkey': None,  # Shared secret for sentiment_service.py
 }
\ No newline at end of file
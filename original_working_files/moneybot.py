@@ -1,25 +1,42 @@
 #!/usr/bin/env python3
-import config
+from . import config
 import logging
 import requests
 import numpy as np
-import yfinance as yf
-from news import RedditNewsFetcher, GDELTFetcher
-from sentiment import AdvancedSentimentAnalyzer
+from .news import RedditNewsFetcher, GDELTFetcher
+from .sentiment import AdvancedSentimentAnalyzer
+from bar_store import BarStore
+from market_data import get_provider
 
 def get_company_name(symbol):
     pass
 
 
+# The provider and bar store every fetcher shares, as configured
+def market_data_provider():
+    return get_provider(config.SETTINGS.get('market_data_provider', 'yfinance'),
+                        config.SETTINGS.get('market_data_dir', 'market_data'),
+                        config.SETTINGS.get('market_data_workers', 8),
+                        config.SETTINGS.get('fundamentals_cache_path', 'fundamentals_cache.db'))
+
+
+def default_bar_store():
+    return BarStore(config.SETTINGS.get('bar_store_dir', 'bars'), config.SETTINGS.get('bar_refresh_seconds', 900),
+                    market_data_provider())
+
+
 class FinancialDataFetcher:
-    def __init__(self, ticker):
+    def __init__(self, ticker, bar_store=None):
         self.ticker = ticker
+        self.bar_store = bar_store or default_bar_store()
 
     def get_realtime_data(self):
         try:
             logging.info(f"Fetching real-time data for {self.ticker}")
-            stock = yf.Ticker(self.ticker)
-            data = stock.history(period="1d").iloc[0].to_dict()
+            frames, errors = market_data_provider().history([self.ticker], period="1d")
+            if self.ticker not in frames:
+                raise RuntimeError(errors.get(self.ticker, "no data"))
+            data = frames[self.ticker].iloc[0].to_dict()
             logging.info(f"Real-time data fetched successfully for {self.ticker}")
             return data
         except Exception as e:
@@ -30,8 +47,8 @@ class FinancialDataFetcher:
         period = period if period else config.SETTINGS['historical_data_length']
         try:
             logging.info(f"Fetching historical data for {self.ticker} for period: {period}")
-            stock = yf.Ticker(self.ticker)
-            hist = stock.history(period=period)
+            # Only bars newer than the stored ones are downloaded
+            hist = self.bar_store.history(self.ticker, period=period)
             historical_data = hist['Close'].tolist()  # Fetching closing prices
             logging.info(f"Historical data fetched successfully for {self.ticker}")
             return historical_data
@@ -40,9 +57,13 @@ class FinancialDataFetcher:
             return []
 
 class Stock:
-    def __init__(self, ticker, company_name):
+    # Pass one sentiment_analyzer to every Stock of a universe; by default each creates its own
+    # analyzer, which still shares the process-wide model
+    def __init__(self, ticker, company_name, sentiment_analyzer=None, bar_store=None):
         self.ticker = ticker
         self.company_name = company_name
+        self.sentiment_analyzer = sentiment_analyzer or AdvancedSentimentAnalyzer()
+        self.bar_store = bar_store
         self.sentiment_score = None
         self.sentiment_reliability = None
         self.technical_score = None
@@ -53,7 +74,7 @@ class Stock:
         self.overall_reliability = None
 
     def fetch_historical_data(self):
-        financial_fetcher = FinancialDataFetcher(self.ticker)
+        financial_fetcher = FinancialDataFetcher(self.ticker, self.bar_store)
         self.historical_data = financial_fetcher.get_historical_data()
         if not self.historical_data:
             logging.error(f"No historical data found for {self.ticker}")
@@ -71,8 +92,7 @@ class Stock:
         logging.info(f"Market news related to world events fetched successfully")
 
     def calculate_sentiment_score(self):
-        adv_sentiment_analyzer = AdvancedSentimentAnalyzer()
-        self.sentiment_score, self.sentiment_reliability = adv_sentiment_analyzer.analyze_sentiment(self.news)
+        self.sentiment_score, self.sentiment_reliability = self.sentiment_analyzer.analyze_sentiment(self.news)
         logging.info(f"Sentiment score for {self.ticker}: {self.sentiment_score}")
         logging.info(f"Sentiment reliability for {self.ticker}: {self.sentiment_reliability}%")
 
@@ -1,24 +1,27 @@
 import logging
 import numpy as np
-from transformers import pipeline
-import config
+from . import config
+import sentiment_service
 
 class AdvancedSentimentAnalyzer:
     def __init__(self):
         logging.info("Initializing advanced sentiment analysis model")
         device = 0 if config.SETTINGS['use_gpu'] else -1
-        self.sentiment_model = pipeline(
-            "sentiment-analysis", 
-            model=config.SETTINGS['sentiment_model_name'], 
-            device=device # (macOS device = -1 # Force CPU usage
+        # The model is loaded once per process (or served by sentiment_service.py), so analyzers are cheap to create
+        self.sentiment_model = sentiment_service.connect(
+            config.SETTINGS.get('sentiment_service_address'),
+            config.SETTINGS.get('sentiment_service_authkey'),
+            model_name=config.SETTINGS['sentiment_model_name'],
+            cache_path=config.SETTINGS.get('sentiment_cache_path', 'sentiment_cache.db'),
+            max_length=config.SETTINGS['sentiment_max_length'],
+            device=device, # (macOS device = -1 # Force CPU usage
+            backend=config.SETTINGS.get('sentiment_backend', 'pytorch')
         )
 
     def analyze_sentiment(self, texts):
         logging.info("Analyzing sentiment using advanced NLP model")
-        max_length = config.SETTINGS['sentiment_max_length']
-        truncated_texts = [text[:max_length] for text in texts]  # Truncate texts if too long
-
-        results = self.sentiment_model(truncated_texts)
+        # Texts longer than sentiment_max_length tokens are scored over overlapping token windows
+        results = self.sentiment_model.predict(texts)
         
         # Convert the results into a simple score (positive or negative)
         scores = []
@@ -0,0 +1,267 @@
+import argparse
+import calendar
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+# Incremental export of news and comments to Parquet, partitioned hive-style by ticker and UTC day:
+#   export/news/ticker=TSLA/date=2024-05-01/part-<run>-<n>.parquet
+# Rows are read from a read-only connection in rowid order above the high-water mark saved in
+# export/_export_state.json, so each run only writes rows added since the last one, and they are
+# streamed to the partition files in record batches so memory does not grow with the backlog.
+# A row exported before the sentiment scorer labelled it is caught by a second mark on scored_seq:
+# every partition holding such a row is rewritten from the database with the sentiment filled in.
+
+NEWS_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('ticker', pa.string()),
+    ('tickers', pa.string()),
+    ('timestamp', pa.float64()),
+    ('title', pa.string()),
+    ('text', pa.string()),
+    ('score', pa.int64()),
+    ('comments', pa.int64()),
+    ('sentiment_label', pa.string()),
+    ('sentiment_value', pa.float64()),
+])
+
+COMMENTS_SCHEMA = pa.schema([
+    ('comment_id', pa.string()),
+    ('post_id', pa.string()),
+    ('ticker', pa.string()),
+    ('author', pa.string()),
+    ('body', pa.string()),
+    ('timestamp', pa.float64()),
+    ('score', pa.int64()),
+    ('permalink', pa.string()),
+    ('sentiment_label', pa.string()),
+    ('sentiment_value', pa.float64()),
+])
+
+# rowid first; the remaining columns follow the table's schema. news.ticker is the partition key,
+# tickers lists every ticker the post matched. The FROM clause is kept apart, with the rowid,
+# partition and scored_seq columns the row filters are built on.
+EXPORT_QUERIES = {
+    'news': ('''SELECT n.rowid, n.id, n.ticker,
+                       (SELECT group_concat(t.ticker) FROM news_tickers t WHERE t.post_id = n.id),
+                       n.timestamp, n.title, n.text, n.score, n.comments, n.sentiment_label, n.sentiment_value''',
+             'FROM news n', NEWS_SCHEMA, ('n.rowid', 'n.ticker', 'n.timestamp', 'n.scored_seq')),
+    'comments': ('''SELECT c.rowid, c.comment_id, c.post_id, n.ticker, c.author, c.body, c.timestamp, c.score,
+                           c.permalink, c.sentiment_label, c.sentiment_value''',
+                 'FROM comments c LEFT JOIN news n ON n.id = c.post_id', COMMENTS_SCHEMA,
+                 ('c.rowid', 'n.ticker', 'c.timestamp', 'c.scored_seq')),
+}
+
+STATE_FILE = '_export_state.json'
+
+
+def _partition(ticker, timestamp):
+    day = time.strftime('%Y-%m-%d', time.gmtime(timestamp)) if timestamp is not None else 'unknown'
+    return ticker or 'unknown', day
+
+
+def _partition_dir(root, partition):
+    ticker, day = partition
+    return os.path.join(root, f"ticker={ticker}", f"date={day}")
+
+
+# SQL filter and parameters selecting exactly the rows _partition maps to a partition
+def _partition_filter(partition, ticker_column, timestamp_column):
+    ticker, day = partition
+    if day == 'unknown':
+        return f"COALESCE({ticker_column}, 'unknown') = ? AND {timestamp_column} IS NULL", (ticker,)
+    start = calendar.timegm(time.strptime(day, '%Y-%m-%d'))
+    return (f"COALESCE({ticker_column}, 'unknown') = ? AND {timestamp_column} >= ? AND {timestamp_column} < ?",
+            (ticker, start, start + 86400))
+
+
+# Parquet writers for the partitions touched by one run. At most max_open files are open at once;
+# a partition whose writer was closed gets a further part file when more rows arrive for it.
+class PartitionWriters:
+    def __init__(self, root, schema, run_id, max_open=64, compression='zstd'):
+        self.root = root
+        self.schema = schema
+        self.run_id = run_id
+        self.max_open = max_open
+        self.compression = compression
+        self.open_writers = OrderedDict()
+        self.parts = 0
+        self.written = []  # (temporary path, final path)
+
+    def write(self, partition, batch):
+        writer = self.open_writers.pop(partition, None)
+        if writer is None:
+            if len(self.open_writers) >= self.max_open:
+                _, oldest = self.open_writers.popitem(last=False)
+                oldest.close()
+            directory = _partition_dir(self.root, partition)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{self.run_id}-{self.parts}.parquet")
+            self.parts += 1
+            self.written.append((path + '.tmp', path))
+            writer = pq.ParquetWriter(path + '.tmp', self.schema, compression=self.compression)
+        writer.write_batch(batch)
+        self.open_writers[partition] = writer
+
+    def close(self):
+        for writer in self.open_writers.values():
+            writer.close()
+        self.open_writers.clear()
+
+    # Make this run's files visible; until then readers and the next run ignore them
+    def publish(self):
+        for temporary, final in self.written:
+            os.replace(temporary, final)
+
+
+def load_state(output_dir):
+    try:
+        with open(os.path.join(output_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(output_dir, state):
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+# Leftovers of a run that died before publishing
+def _remove_unpublished(root):
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.endswith('.parquet.tmp'):
+                os.remove(os.path.join(directory, name))
+
+
+# Stream the rows of `query` with rowids in (rowid, last_rowid] to their partitions; returns
+# (rows written, last rowid read)
+def _export_rows(conn, query, params, rowid, last_rowid, writers, batch_size):
+    schema = writers.schema
+    ticker_index = schema.names.index('ticker')
+    timestamp_index = schema.names.index('timestamp')
+
+    exported = 0
+    while rowid < last_rowid:
+        rows = conn.execute(query, (*params, rowid, last_rowid, batch_size)).fetchall()
+        if not rows:
+            break
+        rowid = rows[-1][0]
+
+        partitions = {}
+        for row in rows:
+            values = row[1:]
+            partitions.setdefault(_partition(values[ticker_index], values[timestamp_index]), []).append(values)
+        for partition, values in partitions.items():
+            columns = list(zip(*values))
+            writers.write(partition, pa.record_batch([pa.array(column, type=field.type)
+                                                      for column, field in zip(columns, schema)], schema=schema))
+        exported += len(rows)
+    return exported, rowid
+
+
+# Export one table's rows above the rowid high-water mark, and rewrite every partition holding rows
+# that were exported before they were scored (scored_seq above the scoring high-water mark).
+# Returns (rows written, new rowid high-water mark, new scoring high-water mark).
+def export_table(conn, table, output_dir, high_water, scored_high_water, run_id, batch_size=50000):
+    columns, from_clause, schema, (rowid_column, ticker_column, timestamp_column, scored_column) = EXPORT_QUERIES[table]
+    select = f"{columns} {from_clause}"
+    root = os.path.join(output_dir, table)
+    _remove_unpublished(root)
+    # The starting rowid keeps part names unique even for two runs within the same second
+    writers = PartitionWriters(root, schema, f"{run_id}-{high_water}")
+
+    # One read transaction, so the marks and every row read agree; rows committed or scored while
+    # the export runs are left for the next run
+    conn.execute("BEGIN")
+    try:
+        last_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+        last_scored = conn.execute(f"SELECT COALESCE(MAX(scored_seq), 0) FROM {table}").fetchone()[0]
+        rescored = {_partition(ticker, timestamp) for ticker, timestamp in conn.execute(
+            f"SELECT DISTINCT {ticker_column}, {timestamp_column} {from_clause} "
+            f"WHERE {scored_column} > ? AND {scored_column} <= ? AND {rowid_column} <= ?",
+            (scored_high_water, last_scored, high_water))}
+        # Files published by earlier runs for the partitions rewritten by this one
+        replaced = [os.path.join(directory, name)
+                    for directory in (_partition_dir(root, partition) for partition in rescored)
+                    if os.path.isdir(directory)
+                    for name in os.listdir(directory) if name.endswith('.parquet')]
+
+        exported = 0
+        try:
+            for partition in sorted(rescored):
+                condition, params = _partition_filter(partition, ticker_column, timestamp_column)
+                rewritten, _ = _export_rows(conn, f"{select} WHERE {condition} AND {rowid_column} > ? AND "
+                                                  f"{rowid_column} <= ? ORDER BY {rowid_column} LIMIT ?",
+                                            params, 0, high_water, writers, batch_size)
+                exported += rewritten
+            added, rowid = _export_rows(conn, f"{select} WHERE {rowid_column} > ? AND {rowid_column} <= ? "
+                                              f"ORDER BY {rowid_column} LIMIT ?",
+                                        (), high_water, last_rowid, writers, batch_size)
+            exported += added
+        finally:
+            writers.close()
+    finally:
+        conn.rollback()
+    # A crash from here until the state is saved only means the next run rewrites these partitions again
+    for path in replaced:
+        os.remove(path)
+    writers.publish()
+    if rescored:
+        logger.info(f"Rewrote {len(rescored)} {table} partitions with rows scored after they were exported")
+    return exported, max(rowid, high_water), max(last_scored, scored_high_water)
+
+
+# Export everything added or scored since the last run, then advance the high-water marks
+def export(db_path, output_dir, batch_size=50000, full=False):
+    if full and os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_state(output_dir)
+
+    # Read-only, so the export never takes a write lock on the collector's database
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    run_id = time.strftime('%Y%m%dT%H%M%S', time.gmtime())
+    try:
+        for table in EXPORT_QUERIES:
+            start = time.monotonic()
+            exported, state[table], state[f"{table}_scored"] = export_table(
+                conn, table, output_dir, state.get(table, 0), state.get(f"{table}_scored", 0), run_id, batch_size)
+            save_state(output_dir, state)
+            logger.info(f"Exported {exported} {table} rows in {time.monotonic() - start:.1f}s")
+    finally:
+        conn.close()
+    return state
+
+
+# Columnar view of an exported table, e.g. open_dataset('export', 'news').to_table(filter=ds.field('ticker') == 'TSLA')
+def open_dataset(output_dir, table):
+    return ds.dataset(os.path.join(output_dir, table), format='parquet', partitioning='hive')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export news_data.db to Parquet partitioned by ticker and day")
+    parser.add_argument('--db', default='news_data.db')
+    parser.add_argument('--output', default='export')
+    parser.add_argument('--batch-size', type=int, default=50000, help="rows read from SQLite per batch")
+    parser.add_argument('--full', action='store_true', help="discard previous exports and export every row")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    export(args.db, args.output, args.batch_size, args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+from prawcore import Requestor
+from metrics import REGISTRY
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+REALTIME = 'realtime'
+BACKFILL = 'backfill'
+
+REQUEST_SECONDS = REGISTRY.histogram('reddit_request_seconds', "Reddit HTTP request latency", ['endpoint'])
+REQUESTS = REGISTRY.counter('reddit_requests_total', "Reddit HTTP requests by response status", ['endpoint', 'status'])
+WAIT_SECONDS = REGISTRY.histogram('reddit_rate_limit_wait_seconds', "Time spent waiting for the request budget",
+                                  ['priority'])
+
+
+# Process-wide token bucket for Reddit requests, fed by the x-ratelimit-* response headers.
+# Tokens refill at remaining / seconds-until-reset, so the quota is spread evenly over the
+# window instead of being spent in a burst and then waited out. Realtime callers are served
+# first, and backfill may not spend the last `realtime_reserve` share of the window's quota.
+class RequestBudget:
+    def __init__(self, burst=5, default_rate=1.0, realtime_reserve=0.1):
+        self.burst = burst
+        self.default_rate = default_rate
+        self.rate = default_rate
+        self.realtime_reserve = realtime_reserve
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.remaining = None
+        self.reset_at = None
+        self.window_quota = None
+        self.waiting = {REALTIME: 0, BACKFILL: 0}
+        self.wait_seconds = 0.0
+        self.condition = threading.Condition()
+        self.local = threading.local()
+
+    # Set the priority of every request made from the calling thread
+    def set_priority(self, priority):
+        self.local.priority = priority
+
+    def _refill(self, now):
+        if self.reset_at is not None and now >= self.reset_at:
+            # The window rolled over; the next response tells us the new quota
+            self.remaining = None
+            self.reset_at = None
+            self.rate = self.default_rate
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def _can_grant(self, priority):
+        if self.tokens < 1:
+            return False
+        if priority == BACKFILL and self.waiting[REALTIME]:
+            return False
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                return False
+            if priority == BACKFILL and self.remaining <= self.realtime_reserve * self.window_quota:
+                return False
+        return True
+
+    def _wait_time(self, now):
+        if self.remaining is not None and self.remaining <= 0 and self.reset_at is not None:
+            return max(self.reset_at - now, 0.01)
+        if self.tokens < 1:
+            return max((1 - self.tokens) / self.rate, 0.01)
+        return 0.1
+
+    # Block until the calling thread may send one request; returns the seconds spent waiting
+    def acquire(self):
+        priority = getattr(self.local, 'priority', BACKFILL)
+        start = time.monotonic()
+        with self.condition:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._can_grant(priority):
+                        self.tokens -= 1
+                        if self.remaining is not None:
+                            self.remaining -= 1
+                        break
+                    self.condition.wait(timeout=min(self._wait_time(now), 1.0))
+            finally:
+                self.waiting[priority] -= 1
+            waited = time.monotonic() - start
+            self.wait_seconds += waited
+            self.condition.notify_all()
+        return waited
+
+    # Re-pace from the rate-limit headers of a response
+    def update(self, headers):
+        if 'x-ratelimit-remaining' not in headers:
+            return
+        remaining = float(headers['x-ratelimit-remaining'])
+        used = float(headers.get('x-ratelimit-used', 0))
+        seconds_to_reset = max(float(headers.get('x-ratelimit-reset', 0)), 1.0)
+
+        with self.condition:
+            now = time.monotonic()
+            reset_at = now + seconds_to_reset
+            # Responses arrive out of order; within one window trust the lowest count we have seen
+            if self.remaining is not None and self.reset_at is not None and abs(reset_at - self.reset_at) < 2:
+                remaining = min(remaining, self.remaining)
+            self.remaining = remaining
+            self.reset_at = reset_at
+            self.window_quota = remaining + used
+            self.rate = max(remaining, 1) / seconds_to_reset
+            self.condition.notify_all()
+
+
+# Metric label for a Reddit API URL: the listing or API call, without subreddit names or IDs
+def endpoint_label(url):
+    parts = urlparse(url).path.strip('/').split('/')
+    if parts[0] == 'r' and len(parts) >= 3:
+        return parts[2]
+    if parts[0] == 'comments':
+        return 'comments'
+    if parts[0] == 'api':
+        return parts[-1] or 'api'
+    return 'other'
+
+
+# prawcore requestor that takes a token from the shared budget before every HTTP request
+class BudgetedRequestor(Requestor):
+    def __init__(self, *args, budget, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.budget = budget
+
+    def request(self, *args, **kwargs):
+        waited = self.budget.acquire()
+        WAIT_SECONDS.observe(waited, priority=getattr(self.budget.local, 'priority', BACKFILL))
+        if waited > 1:
+            logger.debug(f"Waited {waited:.1f}s for Reddit request budget")
+
+        endpoint = endpoint_label(args[1] if len(args) > 1 else kwargs.get('url', ''))
+        start = time.monotonic()
+        try:
+            response = super().request(*args, **kwargs)
+        except Exception:
+            REQUESTS.inc(endpoint=endpoint, status='error')
+            raise
+        finally:
+            REQUEST_SECONDS.observe(time.monotonic() - start, endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        self.budget.update(response.headers)
+        return response
+
+
+# Shared by every Reddit client in the process
+shared_budget = RequestBudget()
+
+REGISTRY.gauge('reddit_rate_limit_remaining', "Requests left in the current rate-limit window").set_function(
+    lambda: shared_budget.remaining)
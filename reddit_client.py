@@ -0,0 +1,49 @@
+import queue
+import threading
+import praw
+import config
+from rate_limiter import BudgetedRequestor, shared_budget
+
+# HTTP session behind every Reddit client; None uses a real requests.Session.
+# bench_ingest.py points this at a fake_reddit session to run the collectors offline.
+session = None
+
+
+# Build a Reddit client whose requests all draw from the process-wide request budget
+def create_reddit():
+    requestor_kwargs = {'budget': shared_budget}
+    if session is not None:
+        requestor_kwargs['session'] = session
+    return praw.Reddit(
+        client_id=config.API_KEYS['reddit_client_id'],
+        client_secret=config.API_KEYS['reddit_client_secret'],
+        user_agent=config.API_KEYS['reddit_user_agent'],
+        requestor_class=BudgetedRequestor,
+        requestor_kwargs=requestor_kwargs
+    )
+
+
+# Fixed set of Reddit clients for the crawl walks. A walk checks a client out for its whole
+# lifetime and returns it when it ends, so each client serves one walk (and one thread) at a time
+# while its session, connection and OAuth token are reused across walks. Clients are created on
+# first use, at most `size` of them; get() blocks while all of them are checked out.
+class RedditPool:
+    def __init__(self, size):
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        return create_reddit() if create else self.idle.get()
+
+    def put(self, reddit):
+        self.idle.put(reddit)
@@ -0,0 +1,157 @@
+import argparse
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+# Full-text indexes over post titles/selftext and comment bodies. Both are external-content FTS5
+# tables: they store only the index and read the text from news/comments by rowid, and triggers
+# keep them in sync with every insert, delete and text update, so the writer path is unchanged.
+FTS_TABLES = {
+    'news_fts': '''CREATE VIRTUAL TABLE news_fts USING fts5
+                   (title, text, content='news', content_rowid='rowid', tokenize='porter unicode61')''',
+    'comments_fts': '''CREATE VIRTUAL TABLE comments_fts USING fts5
+                       (body, content='comments', content_rowid='rowid', tokenize='porter unicode61')''',
+}
+
+FTS_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS news_fts_insert AFTER INSERT ON news BEGIN
+           INSERT INTO news_fts (rowid, title, text) VALUES (new.rowid, new.title, new.text);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS news_fts_delete AFTER DELETE ON news BEGIN
+           INSERT INTO news_fts (news_fts, rowid, title, text) VALUES ('delete', old.rowid, old.title, old.text);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS news_fts_update AFTER UPDATE OF title, text ON news BEGIN
+           INSERT INTO news_fts (news_fts, rowid, title, text) VALUES ('delete', old.rowid, old.title, old.text);
+           INSERT INTO news_fts (rowid, title, text) VALUES (new.rowid, new.title, new.text);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS comments_fts_insert AFTER INSERT ON comments BEGIN
+           INSERT INTO comments_fts (rowid, body) VALUES (new.rowid, new.body);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS comments_fts_delete AFTER DELETE ON comments BEGIN
+           INSERT INTO comments_fts (comments_fts, rowid, body) VALUES ('delete', old.rowid, old.body);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS comments_fts_update AFTER UPDATE OF body ON comments BEGIN
+           INSERT INTO comments_fts (comments_fts, rowid, body) VALUES ('delete', old.rowid, old.body);
+           INSERT INTO comments_fts (rowid, body) VALUES (new.rowid, new.body);
+       END''',
+]
+
+# Title matches count for more than selftext matches
+NEWS_WEIGHTS = (5.0, 1.0)
+
+
+# Create the full-text indexes and their triggers; rows stored before the index existed are indexed once here.
+# Returns False if this SQLite build has no FTS5, in which case collection carries on without the index.
+def create_search_index(conn):
+    c = conn.cursor()
+    existing = {name for (name,) in c.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    try:
+        for name, statement in FTS_TABLES.items():
+            if name not in existing:
+                c.execute(statement)
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e).lower():
+            raise
+        logger.warning(f"SQLite has no FTS5 support, full-text search is disabled: {e}")
+        return False
+
+    for statement in FTS_TRIGGERS:
+        c.execute(statement)
+    for name in FTS_TABLES:
+        if name not in existing:
+            rebuild_search_index(conn, name)
+    conn.commit()
+    return True
+
+
+# Re-index every row from its content table; needed after VACUUM, which may renumber rowids
+def rebuild_search_index(conn, *names):
+    for name in names or FTS_TABLES:
+        start = time.monotonic()
+        conn.execute(f"INSERT INTO {name} ({name}) VALUES ('rebuild')")
+        logger.info(f"Rebuilt full-text index {name} in {time.monotonic() - start:.1f}s")
+    conn.commit()
+
+
+# FTS5 query text for a literal phrase
+def phrase_query(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _filters(timestamp_column, post_id_column, ticker, since, until):
+    clauses, params = [], []
+    if since is not None:
+        clauses.append(f"{timestamp_column} >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{timestamp_column} < ?")
+        params.append(until)
+    if ticker is not None:
+        # news_tickers holds every ticker a post matched, keyed by (post_id, ticker)
+        clauses.append(f"EXISTS (SELECT 1 FROM news_tickers t WHERE t.post_id = {post_id_column} AND t.ticker = ?)")
+        params.append(ticker)
+    return ''.join(f" AND {clause}" for clause in clauses), params
+
+
+# Posts matching an FTS5 query (words, "phrases", AND/OR/NOT, prefix*), best match first.
+# since/until are UTC timestamps; ticker keeps only posts linked to that ticker.
+def search_news(conn, query, ticker=None, since=None, until=None, limit=50):
+    where, params = _filters('n.timestamp', 'n.id', ticker, since, until)
+    c = conn.cursor()
+    c.execute(f'''SELECT n.id, n.ticker, n.timestamp, n.title, n.score, n.comments,
+                         bm25(news_fts, ?, ?) AS rank,
+                         snippet(news_fts, -1, '[', ']', '...', 16) AS snippet
+                  FROM news_fts JOIN news n ON n.rowid = news_fts.rowid
+                  WHERE news_fts MATCH ?{where}
+                  ORDER BY rank LIMIT ?''',
+              (*NEWS_WEIGHTS, query, *params, limit))
+    columns = [column[0] for column in c.description]
+    return [dict(zip(columns, row)) for row in c.fetchall()]
+
+
+# Comments matching an FTS5 query, best match first; ticker filters on the ticker of the parent post
+def search_comments(conn, query, ticker=None, since=None, until=None, limit=50):
+    where, params = _filters('m.timestamp', 'm.post_id', ticker, since, until)
+    c = conn.cursor()
+    c.execute(f'''SELECT m.comment_id, m.post_id, m.timestamp, m.score, m.permalink,
+                         bm25(comments_fts) AS rank,
+                         snippet(comments_fts, 0, '[', ']', '...', 24) AS snippet
+                  FROM comments_fts JOIN comments m ON m.rowid = comments_fts.rowid
+                  WHERE comments_fts MATCH ?{where}
+                  ORDER BY rank LIMIT ?''',
+              (query, *params, limit))
+    columns = [column[0] for column in c.description]
+    return [dict(zip(columns, row)) for row in c.fetchall()]
+
+
+# Command line search over news_data.db, e.g. python search_index.py "rate cut" --phrase --ticker NVDA --hours 24
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over collected posts and comments")
+    parser.add_argument('query', nargs='?', help="FTS5 query: words, \"phrases\", AND/OR/NOT, prefix*")
+    parser.add_argument('--phrase', action='store_true', help="match the query as one literal phrase")
+    parser.add_argument('--ticker')
+    parser.add_argument('--hours', type=float, help="only the last N hours")
+    parser.add_argument('--comments', action='store_true', help="search comment bodies instead of posts")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--rebuild', action='store_true', help="re-index everything, e.g. after VACUUM")
+    parser.add_argument('--db', default='news_data.db')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    conn = sqlite3.connect(args.db)
+    if args.rebuild:
+        rebuild_search_index(conn)
+    if args.query:
+        query = phrase_query(args.query) if args.phrase else args.query
+        since = time.time() - args.hours * 3600 if args.hours else None
+        search = search_comments if args.comments else search_news
+        for result in search(conn, query, ticker=args.ticker, since=since, limit=args.limit):
+            when = time.strftime('%Y-%m-%d %H:%M', time.gmtime(result['timestamp']))
+            print(f"{when}  {result.get('ticker') or result['post_id']}  {result['snippet']}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import math
+import os
+import struct
+import threading
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+SNAPSHOT_MAGIC = b'SEEN1'
+# magic, bit count, hash count, keys added, news rowid and comments rowid covered by the snapshot
+SNAPSHOT_HEADER = struct.Struct('<5sQIQqq')
+
+
+# Fixed-size Bloom filter; never reports a false negative, false positives occur at about error_rate
+class BloomFilter:
+    def __init__(self, capacity, error_rate, num_bits=None, num_hashes=None, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = num_bits or max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = num_hashes or max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    # Set the key's bits and report whether any of them were unset, i.e. whether the key is new
+    def add(self, key):
+        new = False
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+
+# Process-wide index of post and comment IDs already stored in news_data.db.
+# Fetchers claim an ID before doing any work for it, which replaces the per-record
+# existence SELECT; a false positive skips a genuinely new record with probability
+# error_rate, and INSERT OR IGNORE in the writer remains the backstop for duplicates.
+class SeenIndex:
+    def __init__(self, bloom, snapshot_path):
+        self.bloom = bloom
+        self.snapshot_path = snapshot_path
+        self.lock = threading.Lock()
+
+    # Load the snapshot (if any) and add the rows written since it was taken
+    @classmethod
+    def load(cls, conn, snapshot_path='seen_ids.bloom', capacity=5000000, error_rate=1e-6):
+        c = conn.cursor()
+        total_rows = (c.execute("SELECT COUNT(*) FROM news").fetchone()[0] +
+                      c.execute("SELECT COUNT(*) FROM comments").fetchone()[0])
+        # Leave headroom so the error rate holds as the database keeps growing
+        capacity = max(capacity, 2 * total_rows)
+
+        bloom, news_rowid, comments_rowid = None, 0, 0
+        if os.path.exists(snapshot_path):
+            try:
+                bloom, news_rowid, comments_rowid = cls._read_snapshot(snapshot_path, capacity, error_rate)
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning(f"Ignoring unreadable seen-ID snapshot {snapshot_path}: {e}")
+            if bloom is not None and bloom.count + total_rows > bloom.capacity:
+                logger.info("Seen-ID snapshot is too small for the database, rebuilding")
+                bloom = None
+        if bloom is None:
+            bloom, news_rowid, comments_rowid = BloomFilter(capacity, error_rate), 0, 0
+
+        index = cls(bloom, snapshot_path)
+        for (post_id,) in c.execute("SELECT id FROM news WHERE rowid > ?", (news_rowid,)):
+            index.bloom.add('t3_' + post_id)
+        for (comment_id,) in c.execute("SELECT comment_id FROM comments WHERE rowid > ?", (comments_rowid,)):
+            index.bloom.add('t1_' + comment_id)
+        logger.info(f"Loaded seen-ID index with {index.bloom.count} IDs")
+        return index
+
+    @staticmethod
+    def _read_snapshot(path, capacity, error_rate):
+        with open(path, 'rb') as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            magic, num_bits, num_hashes, count, news_rowid, comments_rowid = SNAPSHOT_HEADER.unpack(header)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError("bad magic")
+            bits = bytearray(f.read())
+        if len(bits) != (num_bits + 7) // 8:
+            raise ValueError("truncated snapshot")
+        # Keep the snapshot's own geometry; its capacity is whatever that geometry was sized for
+        snapshot_capacity = int(num_bits * math.log(2) ** 2 / -math.log(error_rate))
+        bloom = BloomFilter(snapshot_capacity, error_rate, num_bits, num_hashes, bits, count)
+        return bloom, news_rowid, comments_rowid
+
+    # Copy the filter, tagged with the rowids it covers so the next load only scans newer rows.
+    # IDs are claimed before their rows are written, so the rowids are read first: every row up to
+    # them is already in the copied bits.
+    def snapshot(self, conn):
+        c = conn.cursor()
+        news_rowid = c.execute("SELECT COALESCE(MAX(rowid), 0) FROM news").fetchone()[0]
+        comments_rowid = c.execute("SELECT COALESCE(MAX(rowid), 0) FROM comments").fetchone()[0]
+        with self.lock:
+            header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.bloom.num_bits, self.bloom.num_hashes,
+                                          self.bloom.count, news_rowid, comments_rowid)
+            return header, bytes(self.bloom.bits)
+
+    # Write a snapshot (by default one taken now) atomically. Every ID in it must also be in the
+    # database, so take it before flushing the writer, or call this once the writer has stopped.
+    def save(self, conn, snapshot=None):
+        header, bits = snapshot or self.snapshot(conn)
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(bits)
+        os.replace(tmp_path, self.snapshot_path)
+        count = SNAPSHOT_HEADER.unpack(header)[3]
+        logger.info(f"Saved seen-ID index with {count} IDs to {self.snapshot_path}")
+
+    def has_post(self, post_id):
+        return 't3_' + post_id in self.bloom
+
+    # Atomically mark a post as seen; True means the caller is the first to see it and should store it
+    def claim_post(self, post_id):
+        with self.lock:
+            return self.bloom.add('t3_' + post_id)
+
+    def claim_comment(self, comment_id):
+        with self.lock:
+            return self.bloom.add('t1_' + comment_id)
@@ -0,0 +1,255 @@
+import argparse
+import heapq
+import logging
+import math
+import sqlite3
+import time
+import config
+from migrations import migrate
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+# Per-ticker sentiment maintained incrementally as posts and comments are scored. Every scored row
+# updates, in O(1):
+#   - its ticker's time bucket in sentiment_buckets: exact counts, sums and sums of squares, plain and
+#     engagement-weighted, so any window is a short range of bucket rows;
+#   - its ticker's exponentially time-decayed statistics in sentiment_signal, one row per horizon
+#     (the horizon is the half-life): decayed count, EWMA and variance, plain and engagement-weighted.
+# Strategies read the current signal with current_sentiment() instead of rescanning history.
+
+# Half-life in seconds per horizon
+HORIZONS = {'1h': 3600, '1d': 86400, '7d': 7 * 86400}
+
+
+# Upvotes and replies make a row count for more, with diminishing returns: 1 + ln(1 + score + comments)
+def engagement_weight(score, comments=0):
+    return 1.0 + math.log1p(max(score or 0, 0) + max(comments or 0, 0))
+
+
+# Exponentially decayed sums of 1, x and x^2, plain and weighted. Decay is anchored at the newest
+# event seen; a late (backfilled) event is decayed by its age instead, so order doesn't matter.
+class DecayedStats:
+    __slots__ = ('half_life', 'updated_at', 'count', 'total', 'total_sq', 'weight', 'weighted', 'weighted_sq')
+
+    def __init__(self, half_life, updated_at=None, count=0.0, total=0.0, total_sq=0.0,
+                 weight=0.0, weighted=0.0, weighted_sq=0.0):
+        self.half_life = half_life
+        self.updated_at = updated_at
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+        self.weight = weight
+        self.weighted = weighted
+        self.weighted_sq = weighted_sq
+
+    def update(self, timestamp, value, weight):
+        if self.updated_at is None:
+            self.updated_at = timestamp
+        age = self.updated_at - timestamp
+        if age >= 0:
+            factor = 0.5 ** (age / self.half_life)
+        else:
+            decay = 0.5 ** (-age / self.half_life)
+            self.count *= decay
+            self.total *= decay
+            self.total_sq *= decay
+            self.weight *= decay
+            self.weighted *= decay
+            self.weighted_sq *= decay
+            self.updated_at = timestamp
+            factor = 1.0
+        self.count += factor
+        self.total += factor * value
+        self.total_sq += factor * value * value
+        self.weight += factor * weight
+        self.weighted += factor * weight * value
+        self.weighted_sq += factor * weight * value * value
+
+    @staticmethod
+    def _moments(weight, total, total_sq):
+        if weight <= 0:
+            return None, None
+        mean = total / weight
+        return mean, max(total_sq / weight - mean * mean, 0.0)
+
+    def summary(self, now=None):
+        mean, variance = self._moments(self.count, self.total, self.total_sq)
+        weighted_mean, weighted_variance = self._moments(self.weight, self.weighted, self.weighted_sq)
+        decay = 1.0
+        if now is not None and self.updated_at is not None and now > self.updated_at:
+            decay = 0.5 ** ((now - self.updated_at) / self.half_life)
+        return {'count': self.count * decay, 'mean': mean, 'std': math.sqrt(variance) if variance is not None else None,
+                'weighted_mean': weighted_mean,
+                'weighted_std': math.sqrt(weighted_variance) if weighted_variance is not None else None,
+                'updated_at': self.updated_at}
+
+
+SIGNAL_COLUMNS = ['half_life', 'updated_at', 'count', 'total', 'total_sq', 'weight', 'weighted', 'weighted_sq']
+
+
+# A post's scored rows for counting it under a newly linked ticker:
+# (timestamp, signed value, score, comment count), the post first, then its comments
+LINKED_QUERIES = [
+    '''SELECT timestamp, sentiment_value, score, comments FROM news
+       WHERE id = ? AND sentiment_label IS NOT NULL AND sentiment_label != 'NEUTRAL' AND timestamp IS NOT NULL''',
+    '''SELECT timestamp, sentiment_value, score, 0 FROM comments INDEXED BY idx_comments_post_id
+       WHERE post_id = ? AND sentiment_label IS NOT NULL AND sentiment_label != 'NEUTRAL' AND timestamp IS NOT NULL''',
+]
+
+
+# Accumulates updates in memory and writes them with flush(), which runs inside the caller's
+# transaction so the sentiment labels and the aggregates they feed are committed together.
+class SentimentAggregator:
+    def __init__(self, conn, horizons=HORIZONS, bucket_seconds=3600):
+        self.conn = conn
+        self.horizons = horizons
+        self.bucket_seconds = bucket_seconds
+        self.reload()
+
+    # Drop unflushed updates and reread the stored state, e.g. after a rolled back transaction
+    def reload(self):
+        self.signals = {}
+        self.dirty = set()
+        self.buckets = {}
+        rows = self.conn.execute(f"SELECT ticker, horizon, {', '.join(SIGNAL_COLUMNS)} FROM sentiment_signal")
+        for ticker, horizon, *values in rows:
+            if horizon in self.horizons:
+                stats = self.signals[(ticker, horizon)] = DecayedStats(*values)
+                stats.half_life = self.horizons[horizon]
+
+    # One scored post or comment; value is the signed sentiment (+ positive, - negative)
+    def update(self, ticker, timestamp, value, weight=1.0):
+        for horizon, half_life in self.horizons.items():
+            stats = self.signals.get((ticker, horizon))
+            if stats is None:
+                stats = self.signals[(ticker, horizon)] = DecayedStats(half_life)
+            stats.update(timestamp, value, weight)
+            self.dirty.add((ticker, horizon))
+
+        key = (ticker, int(timestamp // self.bucket_seconds * self.bucket_seconds))
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [0, 0.0, 0.0, 0.0, 0.0, 0, 0]
+        bucket[0] += 1
+        bucket[1] += value
+        bucket[2] += value * value
+        bucket[3] += weight
+        bucket[4] += weight * value
+        bucket[5] += value > 0
+        bucket[6] += value < 0
+
+    # Count already-scored rows under ticker links added since (news_tickers.aggregated = 0) and mark
+    # the links counted; returns the number of links. Call it in the scorer's write transaction
+    # before new labels are stored: a row scored later is counted for every link it has by then.
+    def add_links(self):
+        links = self.conn.execute("SELECT rowid, post_id, ticker FROM news_tickers WHERE aggregated = 0").fetchall()
+        for _, post_id, ticker in links:
+            for query in LINKED_QUERIES:
+                for timestamp, value, score, comments in self.conn.execute(query, (post_id,)):
+                    self.update(ticker, timestamp, value or 0.0, engagement_weight(score, comments))
+        self.conn.executemany("UPDATE news_tickers SET aggregated = 1 WHERE rowid = ?", [(link[0],) for link in links])
+        return len(links)
+
+    def flush(self):
+        if self.buckets:
+            self.conn.executemany('''INSERT INTO sentiment_buckets (ticker, bucket_seconds, bucket_start, count, total,
+                                                                     total_sq, weight, weighted, positive, negative)
+                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                     ON CONFLICT (ticker, bucket_seconds, bucket_start) DO UPDATE SET
+                                         count = count + excluded.count,
+                                         total = total + excluded.total,
+                                         total_sq = total_sq + excluded.total_sq,
+                                         weight = weight + excluded.weight,
+                                         weighted = weighted + excluded.weighted,
+                                         positive = positive + excluded.positive,
+                                         negative = negative + excluded.negative''',
+                                  [(ticker, self.bucket_seconds, start, *values)
+                                   for (ticker, start), values in self.buckets.items()])
+            self.buckets = {}
+        if self.dirty:
+            self.conn.executemany(f'''INSERT OR REPLACE INTO sentiment_signal (ticker, horizon, {', '.join(SIGNAL_COLUMNS)})
+                                      VALUES ({', '.join('?' * (len(SIGNAL_COLUMNS) + 2))})''',
+                                  [(ticker, horizon, *(getattr(self.signals[(ticker, horizon)], column)
+                                                       for column in SIGNAL_COLUMNS))
+                                   for ticker, horizon in self.dirty])
+            self.dirty = set()
+
+
+# Current sentiment for a ticker, one summary per horizon; counts are decayed to now
+def current_sentiment(conn, ticker, now=None):
+    now = time.time() if now is None else now
+    rows = conn.execute(f"SELECT horizon, {', '.join(SIGNAL_COLUMNS)} FROM sentiment_signal WHERE ticker = ?", (ticker,))
+    return {horizon: DecayedStats(*values).summary(now) for horizon, *values in rows}
+
+
+# Exact totals for a ticker over [since, until) from the time buckets, at bucket resolution
+def window_sentiment(conn, ticker, since, until=None, bucket_seconds=3600):
+    until = time.time() if until is None else until
+    count, total, total_sq, weight, weighted, positive, negative = conn.execute(
+        '''SELECT COALESCE(SUM(count), 0), COALESCE(SUM(total), 0), COALESCE(SUM(total_sq), 0), COALESCE(SUM(weight), 0),
+                  COALESCE(SUM(weighted), 0), COALESCE(SUM(positive), 0), COALESCE(SUM(negative), 0)
+           FROM sentiment_buckets WHERE ticker = ? AND bucket_seconds = ? AND bucket_start >= ? AND bucket_start < ?''',
+        (ticker, bucket_seconds, since, until)).fetchone()
+    mean = total / count if count else None
+    return {'count': count, 'positive': positive, 'negative': negative, 'mean': mean,
+            'std': math.sqrt(max(total_sq / count - mean * mean, 0.0)) if count else None,
+            'weighted_mean': weighted / weight if weight else None}
+
+
+# Scored rows for the rebuild: (timestamp, signed value, engagement weight, comma-separated tickers)
+REBUILD_QUERIES = [
+    '''SELECT n.timestamp, n.sentiment_value, n.score, n.comments,
+              (SELECT group_concat(t.ticker) FROM news_tickers t WHERE t.post_id = n.id)
+       FROM news n WHERE n.sentiment_label IS NOT NULL AND n.sentiment_label != 'NEUTRAL' AND n.timestamp IS NOT NULL
+       ORDER BY n.timestamp''',
+    '''SELECT c.timestamp, c.sentiment_value, c.score, 0,
+              (SELECT group_concat(t.ticker) FROM news_tickers t WHERE t.post_id = c.post_id)
+       FROM comments c WHERE c.sentiment_label IS NOT NULL AND c.sentiment_label != 'NEUTRAL' AND c.timestamp IS NOT NULL
+       ORDER BY c.timestamp''',
+]
+
+
+# Recompute the aggregates from every scored row, e.g. after changing horizons or bucket size
+def rebuild(conn, horizons=HORIZONS, bucket_seconds=3600, batch_size=50000):
+    with conn:
+        conn.execute("DELETE FROM sentiment_signal")
+        conn.execute("DELETE FROM sentiment_buckets")
+        # Every link is counted below
+        conn.execute("UPDATE news_tickers SET aggregated = 1 WHERE aggregated = 0")
+        aggregator = SentimentAggregator(conn, horizons, bucket_seconds)
+        rows = heapq.merge(*(conn.execute(query) for query in REBUILD_QUERIES), key=lambda row: row[0])
+        for n, (timestamp, value, score, comments, tickers) in enumerate(rows, 1):
+            weight = engagement_weight(score, comments)
+            for ticker in (tickers or '').split(','):
+                if ticker:
+                    aggregator.update(ticker, timestamp, value or 0.0, weight)
+            if n % batch_size == 0:
+                aggregator.flush()
+        aggregator.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or rebuild per-ticker sentiment aggregates")
+    parser.add_argument('--db', default='news_data.db')
+    parser.add_argument('--rebuild', action='store_true', help="recompute the aggregates from every scored row")
+    parser.add_argument('tickers', nargs='*')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    conn = sqlite3.connect(args.db, timeout=60)
+    migrate(conn)
+    bucket_seconds = config.SETTINGS.get('sentiment_bucket_seconds', 3600)
+    if args.rebuild:
+        start = time.monotonic()
+        rebuild(conn, config.SETTINGS.get('sentiment_horizons', HORIZONS), bucket_seconds)
+        logger.info(f"Rebuilt sentiment aggregates in {time.monotonic() - start:.1f}s")
+    for ticker in args.tickers or list(config.SETTINGS['tickers_and_keywords']):
+        for horizon, summary in current_sentiment(conn, ticker).items():
+            mean = f"{summary['mean']:+.3f}" if summary['mean'] is not None else "n/a"
+            weighted = f"{summary['weighted_mean']:+.3f}" if summary['weighted_mean'] is not None else "n/a"
+            std = f"{summary['std']:.3f}" if summary['std'] is not None else "n/a"
+            print(f"{ticker:8} {horizon:4} count {summary['count']:10.1f}  ewma {mean}  std {std}  weighted {weighted}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import logging
+import os
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+# Inference backends for SentimentModel. Each one is called with padded int64 input_ids and
+# attention_mask arrays and returns the class probabilities as a (batch, labels) array.
+
+
+def _softmax(logits):
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _labels(config):
+    return [config.id2label[i] for i in range(config.num_labels)]
+
+
+# Eager PyTorch, the same model and weights the transformers sentiment pipeline runs
+class PyTorchBackend:
+    def __init__(self, model_name, device=-1, threads=None):
+        if threads:
+            torch.set_num_threads(threads)
+        self.device = 'cpu' if device < 0 else f'cuda:{device}'
+        self.model = self._load(model_name).to(self.device).eval()
+        self.labels = _labels(self.model.config)
+
+    def _load(self, model_name):
+        return AutoModelForSequenceClassification.from_pretrained(model_name)
+
+    def __call__(self, input_ids, attention_mask):
+        with torch.inference_mode():
+            logits = self.model(input_ids=torch.from_numpy(input_ids).to(self.device),
+                                attention_mask=torch.from_numpy(attention_mask).to(self.device)).logits
+        return _softmax(logits.float().cpu().numpy())
+
+
+# Linear layers quantized to int8 after loading (dynamic quantization): CPU only, no calibration data
+# needed, about a quarter of the weight memory, at the cost of a small drift in the scores
+class QuantizedBackend(PyTorchBackend):
+    def __init__(self, model_name, device=-1, threads=None):
+        if device >= 0:
+            logger.warning("The int8 sentiment backend runs on CPU only; ignoring the GPU device")
+        super().__init__(model_name, -1, threads)
+
+    def _load(self, model_name):
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# ONNX Runtime on CPU. The model is exported to onnx_dir on first use and the graph is reused after that.
+class OnnxBackend:
+    def __init__(self, model_name, device=-1, threads=None, onnx_dir='onnx_models'):
+        import onnxruntime
+
+        if device >= 0:
+            logger.warning("The onnx sentiment backend runs on CPU only; ignoring the GPU device")
+        path = os.path.join(onnx_dir, model_name.replace('/', '--') + '.onnx')
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.labels = _labels(model.config)
+        if not os.path.exists(path):
+            export_onnx(model, AutoTokenizer.from_pretrained(model_name), path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {graph_input.name for graph_input in self.session.get_inputs()}
+
+    def __call__(self, input_ids, attention_mask):
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        logits = self.session.run(['logits'], {name: value for name, value in feeds.items() if name in self.input_names})[0]
+        return _softmax(logits)
+
+
+# Export a sequence classifier with dynamic batch and sequence axes
+def export_onnx(model, tokenizer, path):
+    logger.info(f"Exporting sentiment model to {path}")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    sample = tokenizer(["Exporting the sentiment model"], return_tensors='pt')
+    temporary = path + '.tmp'
+    torch.onnx.export(model.eval(), (sample['input_ids'], sample['attention_mask']), temporary,
+                      input_names=['input_ids', 'attention_mask'], output_names=['logits'],
+                      dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'},
+                                    'attention_mask': {0: 'batch', 1: 'sequence'},
+                                    'logits': {0: 'batch'}},
+                      opset_version=14)
+    os.replace(temporary, path)
+
+
+BACKENDS = {
+    'pytorch': PyTorchBackend,
+    'onnx': OnnxBackend,
+    'int8': QuantizedBackend,
+}
+
+
+def create_backend(name, model_name, device=-1, threads=None):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    logger.info(f"Loading sentiment model {model_name} with the {name} backend")
+    return BACKENDS[name](model_name, device=device, threads=threads)
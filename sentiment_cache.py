@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+# Texts that differ only in Unicode form or whitespace get the same sentiment
+def normalize_text(text):
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+# Cache key: model configuration (name, backend, windowing) plus normalized text, so switching
+# models or settings never serves stale results
+def text_key(model_name, text):
+    return hashlib.blake2b(f"{model_name}\0{normalize_text(text)}".encode(), digest_size=16).digest()
+
+
+# Persistent sentiment results keyed by text_key, with an in-memory LRU in front of SQLite.
+# Results are stored as the pipeline returns them: {'label': ..., 'score': ...}.
+class SentimentCache:
+    def __init__(self, path='sentiment_cache.db', lru_size=100000):
+        self.lru_size = lru_size
+        self.lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS sentiment_cache
+                             (key BLOB PRIMARY KEY,
+                              label TEXT,
+                              score REAL) WITHOUT ROWID''')
+        self.conn.commit()
+
+    def _remember(self, key, result):
+        self.lru[key] = result
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    # Cached results for a batch of keys, None where missing; SQLite is asked once for all LRU misses
+    def get_many(self, keys):
+        results = [None] * len(keys)
+        missing = {}
+        with self.lock:
+            for i, key in enumerate(keys):
+                result = self.lru.get(key)
+                if result is not None:
+                    self.lru.move_to_end(key)
+                    results[i] = result
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            missing_keys = list(missing)
+            # Stay below SQLite's bound-parameter limit on older builds
+            for start in range(0, len(missing_keys), 900):
+                chunk = missing_keys[start:start + 900]
+                rows = self.conn.execute(f"SELECT key, label, score FROM sentiment_cache "
+                                         f"WHERE key IN ({', '.join('?' * len(chunk))})", chunk)
+                for key, label, score in rows:
+                    result = {'label': label, 'score': score}
+                    self._remember(key, result)
+                    for i in missing[key]:
+                        results[i] = result
+        return results
+
+    def put_many(self, keys, results):
+        with self.lock:
+            for key, result in zip(keys, results):
+                self._remember(key, result)
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO sentiment_cache (key, label, score) VALUES (?, ?, ?)",
+                                      [(key, result['label'], result['score']) for key, result in zip(keys, results)])
+
+    # Results for texts in order; only texts not cached yet reach classify, each distinct text once.
+    # classify takes a list of texts and returns a list of {'label', 'score'} dicts.
+    def lookup(self, model_name, texts, classify):
+        keys = [text_key(model_name, text) for text in texts]
+        results = self.get_many(keys)
+
+        misses = {}
+        for i, result in enumerate(results):
+            if result is None:
+                misses.setdefault(keys[i], []).append(i)
+        self.hits += len(texts) - sum(len(indices) for indices in misses.values())
+        self.misses += len(misses)
+        if misses:
+            miss_keys = list(misses)
+            computed = classify([texts[misses[key][0]] for key in miss_keys])
+            self.put_many(miss_keys, computed)
+            for key, result in zip(miss_keys, computed):
+                for i in misses[key]:
+                    results[i] = result
+        return results
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,113 @@
+import logging
+import numpy as np
+from transformers import AutoTokenizer
+from sentiment_backends import create_backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'distilbert-base-uncased-finetuned-sst-2-english'
+
+# Label and value stored for texts with nothing to score
+NEUTRAL = ('NEUTRAL', 0.0)
+
+
+# +score for POSITIVE, -score for NEGATIVE, as AdvancedSentimentAnalyzer reports it
+def signed_score(result):
+    return result['score'] if result['label'] == 'POSITIVE' else -result['score']
+
+
+# Group sequence indices into batches of similar length. Every sequence in a batch is padded to
+# the longest one, so batches are cut when max_batch_size sequences are reached or when the
+# padded size (longest length x batch size) would exceed max_batch_tokens: short sequences are
+# packed densely into large batches and long ones go in small batches.
+def length_buckets(lengths, max_batch_tokens=8192, max_batch_size=64):
+    batches, batch = [], []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if batch and (len(batch) >= max_batch_size or lengths[index] * (len(batch) + 1) > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+# Split token ids into windows of at most `size` tokens, consecutive windows sharing `overlap`
+# tokens so no sentence is only ever seen cut in half. At most max_windows windows are taken.
+def token_windows(ids, size, overlap=64, max_windows=None):
+    step = max(size - overlap, 1)
+    windows, start = [], 0
+    while True:
+        windows.append(ids[start:start + size])
+        if start + size >= len(ids) or (max_windows and len(windows) >= max_windows):
+            return windows
+        start += step
+
+
+# Sentiment classifier for batches of texts. Each text is tokenized once; texts longer than
+# max_length tokens are split into overlapping windows, all windows of a call are scored
+# together in length-bucketed batches, and each text gets the token-weighted mean of its
+# windows' class probabilities. With a SentimentCache, texts scored before skip the model.
+# backend picks the inference engine (see sentiment_backends.BACKENDS).
+class SentimentModel:
+    def __init__(self, model_name=DEFAULT_MODEL, max_length=512, window_overlap=64, max_windows=16,
+                 max_batch_tokens=8192, max_batch_size=64, device=-1, cache=None, backend='pytorch', threads=None):
+        self.model_name = model_name
+        self.backend_name = backend
+        self.window_overlap = window_overlap
+        self.max_windows = max_windows
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        # Quantized and exported models score slightly differently, and so does another windowing of
+        # long texts, so each combination gets its own cache entries
+        engine = model_name if backend == 'pytorch' else f"{model_name}@{backend}"
+        self.cache_name = f"{engine}#{max_length}/{window_overlap}/{max_windows}"
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.backend = create_backend(backend, model_name, device, threads)
+        self.labels = self.backend.labels
+        # Room left in a window once [CLS]/[SEP] (or the model's equivalents) are added
+        self.window_size = max_length - self.tokenizer.num_special_tokens_to_add()
+
+    # Class probabilities for one batch of token id sequences (special tokens included)
+    def _forward(self, sequences):
+        encoded = self.tokenizer.pad({'input_ids': sequences}, return_tensors='np')
+        return self.backend(encoded['input_ids'].astype(np.int64), encoded['attention_mask'].astype(np.int64))
+
+    # Model results ({'label', 'score'}) for non-empty texts, in input order
+    def classify(self, texts):
+        if not texts:
+            return []
+        token_ids = self.tokenizer(list(texts), add_special_tokens=False, truncation=False, verbose=False)['input_ids']
+        windows, owners = [], []
+        for owner, ids in enumerate(token_ids):
+            for window in token_windows(ids, self.window_size, self.window_overlap, self.max_windows):
+                windows.append(self.tokenizer.build_inputs_with_special_tokens(window))
+                owners.append(owner)
+
+        lengths = [len(window) for window in windows]
+        probabilities = np.zeros((len(windows), len(self.labels)))
+        for batch in length_buckets(lengths, self.max_batch_tokens, self.max_batch_size):
+            probabilities[batch] = self._forward([windows[i] for i in batch])
+
+        totals = np.zeros((len(texts), len(self.labels)))
+        np.add.at(totals, owners, probabilities * np.array(lengths)[:, None])
+        totals /= totals.sum(axis=1, keepdims=True)
+        return [{'label': self.labels[row.argmax()], 'score': float(row.max())} for row in totals]
+
+    # Results for any texts, empty ones included, in the shape the sentiment pipeline returns
+    def predict(self, texts):
+        results = [{'label': NEUTRAL[0], 'score': NEUTRAL[1]}] * len(texts)
+        pending = [i for i, text in enumerate(texts) if text and text.strip()]
+        pending_texts = [texts[i] for i in pending]
+        if self.cache is not None:
+            outputs = self.cache.lookup(self.cache_name, pending_texts, self.classify)
+        else:
+            outputs = self.classify(pending_texts)
+        for i, output in zip(pending, outputs):
+            results[i] = output
+        return results
+
+    # (label, signed score) per text, in input order
+    def score(self, texts):
+        return [(result['label'], signed_score(result)) for result in self.predict(texts)]
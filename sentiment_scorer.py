@@ -0,0 +1,173 @@
+import argparse
+import logging
+import sqlite3
+import time
+import config
+import metrics
+from migrations import migrate
+from sentiment_aggregator import HORIZONS, SentimentAggregator, engagement_weight
+from sentiment_model import NEUTRAL, SentimentModel
+from sentiment_cache import SentimentCache
+
+logger = logging.getLogger("NewsDataCollectionBot")
+
+# Rows still to score, oldest first (the partial indexes from migrations.py hold exactly these),
+# and the statement that stores a result. Posts are scored on title and selftext together.
+# Each stored result also gets the next scored_seq, taken under the write lock, so rows are
+# numbered in the order their labels were committed.
+# Every row ends with timestamp, score, comment count and post ID, for the sentiment aggregates.
+SCORING_QUERIES = {
+    'news': ('''SELECT rowid, title, text, timestamp, score, comments, id
+                FROM news INDEXED BY idx_news_unscored
+                WHERE sentiment_label IS NULL AND rowid > ? ORDER BY rowid LIMIT ?''',
+             "UPDATE news SET sentiment_label = ?, sentiment_value = ?, scored_seq = "
+             "(SELECT COALESCE(MAX(scored_seq), 0) + 1 FROM news) WHERE rowid = ?"),
+    'comments': ('''SELECT rowid, body, timestamp, score, 0, post_id
+                    FROM comments INDEXED BY idx_comments_unscored
+                    WHERE sentiment_label IS NULL AND rowid > ? ORDER BY rowid LIMIT ?''',
+                 "UPDATE comments SET sentiment_label = ?, sentiment_value = ?, scored_seq = "
+                 "(SELECT COALESCE(MAX(scored_seq), 0) + 1 FROM comments) WHERE rowid = ?"),
+}
+
+SCORED = metrics.REGISTRY.counter('sentiment_rows_scored_total', "Rows given a sentiment label", ['table'])
+CHUNK_SECONDS = metrics.REGISTRY.histogram('sentiment_chunk_seconds', "Time to score and store one chunk of rows",
+                                           ['table'])
+BACKLOG = metrics.REGISTRY.gauge('sentiment_backlog', "Rows waiting for a sentiment label", ['table'])
+
+
+def row_text(table, row):
+    if table == 'news':
+        title, text = row[1] or '', row[2] or ''
+        return f"{title}\n{text}" if text else title
+    return row[1] or ''
+
+
+# Fills in sentiment_label/sentiment_value for news and comments as the collectors store them.
+# Results are committed one chunk per transaction, and a row counts as done once its label is
+# set, so after a crash the scorer picks up exactly the rows that were never stored. With an
+# aggregator, each chunk's per-ticker aggregates are committed in the same transaction, counted
+# under the tickers the rows are linked to at commit time; links added later are counted by
+# SentimentAggregator.add_links.
+class SentimentScorer:
+    def __init__(self, conn, model, chunk_size=1024, poll_interval=30, aggregator=None):
+        self.conn = conn
+        self.model = model
+        self.aggregator = aggregator
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        # Rows that failed to score are passed over until the next restart
+        self.cursors = dict.fromkeys(SCORING_QUERIES, 0)
+
+    # Score the next chunk of a table; returns the number of rows read
+    def score_chunk(self, table):
+        select, update = SCORING_QUERIES[table]
+        rows = self.conn.execute(select, (self.cursors[table], self.chunk_size)).fetchall()
+        if not rows:
+            return 0
+        self.cursors[table] = rows[-1][0]
+
+        start = time.monotonic()
+        try:
+            results = self.model.score([row_text(table, row) for row in rows])
+        except Exception as e:
+            logger.error(f"Error scoring {len(rows)} {table} rows up to rowid {rows[-1][0]}: {e}")
+            return len(rows)
+        try:
+            with self.conn:
+                # Take the write lock before reading any ticker link, so no link can be added between
+                # counting the links and storing the labels
+                self.conn.execute("BEGIN IMMEDIATE")
+                if self.aggregator is not None:
+                    self.aggregator.add_links()
+                self.conn.executemany(update, [(label, value, row[0]) for row, (label, value) in zip(rows, results)])
+                if self.aggregator is not None:
+                    self.aggregate(rows, results)
+        except Exception:
+            if self.aggregator is not None:
+                self.aggregator.reload()
+            raise
+        CHUNK_SECONDS.observe(time.monotonic() - start, table=table)
+        SCORED.inc(len(rows), table=table)
+        return len(rows)
+
+    def aggregate(self, rows, results):
+        post_ids = list({row[-1] for row in rows})
+        tickers = {}
+        # Stay below SQLite's bound-parameter limit on older builds
+        for start in range(0, len(post_ids), 900):
+            chunk = post_ids[start:start + 900]
+            for post_id, ticker in self.conn.execute(f"SELECT post_id, ticker FROM news_tickers "
+                                                     f"WHERE post_id IN ({', '.join('?' * len(chunk))})", chunk):
+                tickers.setdefault(post_id, []).append(ticker)
+        for row, (label, value) in zip(rows, results):
+            timestamp, score, comments, post_id = row[-4:]
+            if label == NEUTRAL[0] or timestamp is None:
+                continue
+            weight = engagement_weight(score, comments)
+            for ticker in tickers.get(post_id, ()):
+                self.aggregator.update(ticker, timestamp, value, weight)
+        self.aggregator.flush()
+
+    # Count scored rows under ticker links added since they were scored, when there is nothing to score
+    def aggregate_links(self):
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                if self.aggregator.add_links():
+                    self.aggregator.flush()
+        except Exception:
+            self.aggregator.reload()
+            raise
+
+    def backlog(self, table):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE sentiment_label IS NULL").fetchone()[0]
+
+    # Score everything pending, then poll for new rows forever
+    def run(self):
+        for table in SCORING_QUERIES:
+            logger.info(f"{self.backlog(table)} {table} rows waiting for sentiment")
+        while True:
+            scored = 0
+            for table in SCORING_QUERIES:
+                scored += self.score_chunk(table)
+            if not scored:
+                if self.aggregator is not None:
+                    self.aggregate_links()
+                for table in SCORING_QUERIES:
+                    BACKLOG.set(self.backlog(table), table=table)
+                time.sleep(self.poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill in sentiment for stored posts and comments")
+    parser.add_argument('--db', default='news_data.db')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    port = config.SETTINGS.get('sentiment_metrics_port')
+    if port is not None:
+        metrics.start_http_server(port, host=config.SETTINGS.get('metrics_host', '127.0.0.1'))
+
+    # The collector's writer holds the write lock for one batch at a time; wait for it rather than fail
+    conn = sqlite3.connect(args.db, timeout=60)
+    migrate(conn)
+    model = SentimentModel(config.SETTINGS.get('sentiment_model_name'),
+                           max_length=config.SETTINGS.get('sentiment_max_length', 512),
+                           window_overlap=config.SETTINGS.get('sentiment_window_overlap', 64),
+                           max_windows=config.SETTINGS.get('sentiment_max_windows', 16),
+                           max_batch_tokens=config.SETTINGS.get('sentiment_batch_tokens', 8192),
+                           max_batch_size=config.SETTINGS.get('sentiment_max_batch_size', 64),
+                           backend=config.SETTINGS.get('sentiment_backend', 'pytorch'),
+                           threads=config.SETTINGS.get('sentiment_threads'),
+                           cache=SentimentCache(config.SETTINGS.get('sentiment_cache_path', 'sentiment_cache.db'),
+                                                config.SETTINGS.get('sentiment_cache_lru_size', 100000)))
+    aggregator = SentimentAggregator(conn, config.SETTINGS.get('sentiment_horizons', HORIZONS),
+                                     config.SETTINGS.get('sentiment_bucket_seconds', 3600))
+    SentimentScorer(conn, model,
+                    chunk_size=config.SETTINGS.get('sentiment_chunk_size', 1024),
+                    poll_interval=config.SETTINGS.get('sentiment_poll_interval', 30),
+                    aggregator=aggregator).run()
+
+
+if __name__ == "__main__":
+    main()
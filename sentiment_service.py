@@ -0,0 +1,235 @@
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+import config
+import metrics
+from sentiment_cache import SentimentCache
+from sentiment_model import DEFAULT_MODEL, SentimentModel, signed_score
+
+logger = logging.getLogger(__name__)
+
+# A sentiment model loaded once and shared by every caller. In-process, shared_service() hands out
+# one SentimentService per model configuration; across processes, `python sentiment_service.py`
+# serves one over a local socket and connect() returns a client for it. Either way concurrent
+# predict() calls are queued and run together as micro-batches.
+
+BATCH_TEXTS = metrics.REGISTRY.histogram('sentiment_service_batch_texts', "Texts per micro-batch run by the model",
+                                         buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+QUEUE_WAIT = metrics.REGISTRY.histogram('sentiment_service_queue_seconds', "Time a request waited for its micro-batch")
+
+# Short and window-filling texts, so the first real request doesn't pay for lazy initialisation
+WARMUP_TEXTS = ["Shares jumped after earnings beat expectations.",
+                "Terrible guidance, I'm selling.",
+                " ".join(["The company reported revenue growth but margins came under pressure."] * 60)]
+
+
+# Runs a SentimentModel on a worker thread. Requests arriving within max_wait seconds of each other
+# are scored in one predict() call (up to max_batch_texts texts), so many callers with a few texts
+# each still fill the model's length-bucketed batches.
+class SentimentService:
+    def __init__(self, model, max_batch_texts=256, max_wait=0.01):
+        self.model = model
+        self.max_batch_texts = max_batch_texts
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="sentiment-service", daemon=True)
+        self.worker.start()
+
+    def warmup(self):
+        start = time.monotonic()
+        # classify() rather than predict() so cached results can't skip the model
+        self.model.classify(WARMUP_TEXTS)
+        logger.info(f"Sentiment model warmed up in {time.monotonic() - start:.2f}s")
+
+    # Results ({'label', 'score'}) for texts, in input order; blocks until their batch has run
+    def predict(self, texts):
+        if not texts:
+            return []
+        future = Future()
+        self.requests.put((list(texts), future, time.monotonic()))
+        return future.result()
+
+    # (label, signed score) per text, as SentimentModel.score returns them
+    def score(self, texts):
+        return [(result['label'], signed_score(result)) for result in self.predict(texts)]
+
+    def close(self):
+        self.requests.put(None)
+        self.worker.join()
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            batch, count = [request], len(request[0])
+            deadline = time.monotonic() + self.max_wait
+            while count < self.max_batch_texts:
+                try:
+                    request = self.requests.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    # Finish this batch first, then stop
+                    self.requests.put(None)
+                    break
+                batch.append(request)
+                count += len(request[0])
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.monotonic()
+        for _, _, queued in batch:
+            QUEUE_WAIT.observe(started - queued)
+        texts = [text for request_texts, _, _ in batch for text in request_texts]
+        BATCH_TEXTS.observe(len(texts))
+        try:
+            results = self.model.predict(texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        offset = 0
+        for request_texts, future, _ in batch:
+            future.set_result(results[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+# The process-wide service for a model configuration, loaded and warmed up on first use.
+# model_options are passed to SentimentModel (max_length, device, backend, ...).
+def shared_service(model_name=DEFAULT_MODEL, cache_path=None, **model_options):
+    key = (model_name, cache_path, tuple(sorted(model_options.items())))
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            cache = SentimentCache(cache_path) if cache_path else None
+            service = SentimentService(SentimentModel(model_name, cache=cache, **model_options))
+            service.warmup()
+            _services[key] = service
+    return service
+
+
+# 'host:port' for TCP, anything else is a Unix socket path
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+# Authkeys come from config as strings; multiprocessing.connection wants bytes
+def encode_authkey(authkey):
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+# Serves a SentimentService to other processes. Each connection gets a thread, so requests from
+# several clients are micro-batched together by the service.
+class SentimentServer:
+    def __init__(self, service, address, authkey=None):
+        self.service = service
+        authkey = encode_authkey(authkey) or None
+        address = parse_address(address)
+        if isinstance(address, tuple):
+            # Connections carry pickles, so TCP clients must authenticate
+            if authkey is None:
+                raise ValueError("A TCP sentiment service needs an authkey")
+        elif os.path.exists(address):
+            # Left behind by a server that did not shut down cleanly
+            os.remove(address)
+        self.listener = Listener(address, authkey=authkey)
+        if not isinstance(address, tuple):
+            os.chmod(address, 0o600)
+        logger.info(f"Sentiment service listening on {self.listener.address}")
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                logger.warning("Rejected a sentiment service client with the wrong authkey")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    texts = conn.recv()
+                except EOFError:
+                    return
+                try:
+                    conn.send(('ok', self.service.predict(texts)))
+                except Exception as e:
+                    logger.error(f"Error scoring {len(texts)} texts for a client: {e}")
+                    conn.send(('error', str(e)))
+
+
+# Client for a SentimentServer, with the same predict()/score() interface as SentimentService
+class SentimentClient:
+    def __init__(self, address, authkey=None):
+        self.conn = Client(parse_address(address), authkey=encode_authkey(authkey) or None)
+        self.lock = threading.Lock()
+
+    def predict(self, texts):
+        if not texts:
+            return []
+        with self.lock:
+            self.conn.send(list(texts))
+            status, payload = self.conn.recv()
+        if status == 'error':
+            raise RuntimeError(f"Sentiment service failed: {payload}")
+        return payload
+
+    def score(self, texts):
+        return [(result['label'], signed_score(result)) for result in self.predict(texts)]
+
+    def close(self):
+        self.conn.close()
+
+
+# A client for the service at address if one is running there, otherwise the shared in-process service
+def connect(address=None, authkey=None, **service_options):
+    if address:
+        try:
+            return SentimentClient(address, authkey)
+        except (OSError, AuthenticationError) as e:
+            logger.warning(f"Sentiment service at {address} unavailable ({e}); loading the model in-process")
+    return shared_service(**service_options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the sentiment model to other processes over a local socket")
+    parser.add_argument('--address', default=config.SETTINGS.get('sentiment_service_address') or 'sentiment_service.sock',
+                        help="Unix socket path or host:port")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    model = SentimentModel(config.SETTINGS.get('sentiment_model_name'),
+                           max_length=config.SETTINGS.get('sentiment_max_length', 512),
+                           window_overlap=config.SETTINGS.get('sentiment_window_overlap', 64),
+                           max_windows=config.SETTINGS.get('sentiment_max_windows', 16),
+                           max_batch_tokens=config.SETTINGS.get('sentiment_batch_tokens', 8192),
+                           max_batch_size=config.SETTINGS.get('sentiment_max_batch_size', 64),
+                           backend=config.SETTINGS.get('sentiment_backend', 'pytorch'),
+                           threads=config.SETTINGS.get('sentiment_threads'),
+                           cache=SentimentCache(config.SETTINGS.get('sentiment_cache_path', 'sentiment_cache.db'),
+                                                config.SETTINGS.get('sentiment_cache_lru_size', 100000)))
+    service = SentimentService(model,
+                               max_batch_texts=config.SETTINGS.get('sentiment_service_max_batch', 256),
+                               max_wait=config.SETTINGS.get('sentiment_service_max_wait', 0.01))
+    service.warmup()
+    SentimentServer(service, args.address, config.SETTINGS.get('sentiment_service_authkey')).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
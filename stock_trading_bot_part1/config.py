@@ -24,4 +24,10 @@ SETTINGS = {
     'sentiment_model_name': 'distilbert-base-uncased-finetuned-sst-2-english',  # Name of the model used for sentiment analysis
     'sentiment_max_length': 512,  # Max length for sentiment analysis inputs
     'use_gpu': False,  # Whether to use GPU for sentiment analysis (set to True if GPU is available)
+    'bar_store_dir': 'bars',  # Local store of downloaded price bars, one file per interval and ticker
+    'bar_refresh_seconds': 900,  # Stored bars are served this long before newer ones are fetched
+    'market_data_provider': 'yfinance',  # 'yfinance', or 'files' to read a snapshot saved by market_data.py
+    'market_data_dir': 'market_data',  # Snapshot directory of the 'files' provider
+    'market_data_workers': 8,  # Concurrent yfinance requests
+    'fundamentals_cache_path': 'fundamentals_cache.db',  # Shared cache of ticker info and statements; None disables it
 }
@@ -2,7 +2,7 @@
 import logging
 import praw
 import requests
-import config
+from . import config
 
 class RedditNewsFetcher:
     def __init__(self, company_name):
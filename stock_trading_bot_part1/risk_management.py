@@ -1,6 +1,6 @@
 
 import logging
-import config
+from . import config
 
 logger = logging.getLogger(__name__)
 logger.setLevel(getattr(logging, config.SETTINGS['logging_level']))
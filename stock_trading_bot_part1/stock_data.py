@@ -1,25 +1,36 @@
 
-import yfinance as yf
 import pandas as pd
 import logging
-import config
+from . import config
+from bar_store import BarStore
+from indicators import IndicatorEngine
+from market_data import get_provider
 
 logger = logging.getLogger(__name__)
 logger.setLevel(getattr(logging, config.SETTINGS['logging_level']))
 
 class StockData:
-    def __init__(self, ticker):
+    def __init__(self, ticker, bar_store=None):
         self.ticker = ticker
         self.data = pd.DataFrame()
+        self.indicators = None
+        self.bar_store = bar_store or BarStore(config.SETTINGS.get('bar_store_dir', 'bars'),
+                                               config.SETTINGS.get('bar_refresh_seconds', 900),
+                                               get_provider(config.SETTINGS.get('market_data_provider', 'yfinance'),
+                                                            config.SETTINGS.get('market_data_dir', 'market_data'),
+                                                            config.SETTINGS.get('market_data_workers', 8),
+                                                            config.SETTINGS.get('fundamentals_cache_path',
+                                                                                'fundamentals_cache.db')))
 
     def fetch_new_data(self):
-        """Fetch new historical data and append it to the existing dataset."""
+        """Fetch bars newer than the stored ones and load the configured history from the bar store."""
         try:
             logger.info(f"Fetching historical data for {self.ticker}")
-            new_data = yf.Ticker(self.ticker).history(period=config.SETTINGS['historical_data_length'])
+            new_data = self.bar_store.history(self.ticker, period=config.SETTINGS['historical_data_length'])
             if not new_data.empty:
-                logger.info(f"Fetched {len(new_data)} new data points for {self.ticker}")
-                self.data = pd.concat([self.data, new_data]).drop_duplicates().sort_index()
+                logger.info(f"Loaded {len(new_data)} data points for {self.ticker}")
+                self.data = new_data
+                self.indicators = IndicatorEngine(new_data['Close'], new_data.index)
             else:
                 logger.warning(f"No new data found for {self.ticker}")
         except Exception as e:
@@ -29,20 +40,14 @@ class StockData:
         """Calculate the Simple Moving Average (SMA) for the specified window."""
         if not self.data.empty:
             logger.info(f"Calculating SMA for {self.ticker} with window {window}")
-            self.data[f'SMA_{window}'] = self.data['Close'].rolling(window=window).mean()
+            self.data[f'SMA_{window}'] = self.indicators.sma([window])[0][:, 0]
             logger.info(f"Calculated SMA for {self.ticker}")
 
     def calculate_rsi(self, window=14):
         """Calculate the Relative Strength Index (RSI) for the specified window."""
         if not self.data.empty:
             logger.info(f"Calculating RSI for {self.ticker} with window {window}")
-            delta = self.data['Close'].diff(1)
-            gain = delta.where(delta > 0, 0)
-            loss = -delta.where delta < 0, 0)
-            avg_gain = gain.rolling(window=window).mean()
-            avg_loss = loss.rolling(window=window).mean()
-            rs = avg_gain / avg_loss
-            self.data[f'RSI_{window}'] = 100 - (100 / (1 + rs))
+            self.data[f'RSI_{window}'] = self.indicators.rsi([window], method='sma')[0][:, 0]
             logger.info(f"Calculated RSI for {self.ticker}")
 
     def get_latest_close(self):
@@ -1,6 +1,8 @@
 
 import logging
-import config
+import numpy as np
+from . import config
+from indicators import IndicatorEngine, StreamingMACross, StreamingVariance
 
 logger = logging.getLogger(__name__)
 logger.setLevel(getattr(logging, config.SETTINGS['logging_level']))
@@ -29,34 +31,84 @@ class MovingAverageStrategy:
     def __init__(self, short_window=50, long_window=200):
         self.short_window = short_window
         self.long_window = long_window
+        self.streams = {}  # ticker -> StreamingMACross fed by update()
+
+    # Cross state on the last bar of every ticker: 1 above (golden cross), -1 below (death cross)
+    def signals(self, engine):
+        state, _ = engine.ma_cross([self.short_window], [self.long_window])
+        return state[0, 0, -1]
 
     def execute(self, historical_data):
-        short_ma = historical_data['Close'].rolling(window=self.short_window).mean()
-        long_ma = historical_data['Close'].rolling(window=self.long_window).mean()
-        
-        signal = 0
-        if short_ma.iloc[-1] > long_ma.iloc[-1]:
-            signal = 1  # Golden Cross - Bullish
-            logger.info("Golden Cross detected - Buy Signal")
-        elif short_ma.iloc[-1] < long_ma.iloc[-1]:
-            signal = -1  # Death Cross - Bearish
-            logger.info("Death Cross detected - Sell Signal")
+        signal = int(self.signals(IndicatorEngine(historical_data['Close']))[0])
+        if signal == 1:
+            logger.info("Golden Cross detected - Buy Signal")  # Bullish
+        elif signal == -1:
+            logger.info("Death Cross detected - Sell Signal")  # Bearish
+        return signal
+
+    # Signals for a whole universe ({ticker: OHLCV frame}) in one vectorized pass
+    def screen(self, frames):
+        engine = IndicatorEngine.from_frames(frames)
+        return dict(zip(engine.tickers, self.signals(engine).tolist()))
+
+    # Live signal from the newest price, in constant time per tick; feed the history first
+    def update(self, ticker, price):
+        stream = self.streams.get(ticker)
+        if stream is None:
+            stream = self.streams[ticker] = StreamingMACross(self.short_window, self.long_window)
+        signal, cross = stream.update(price)
+        if cross == 1:
+            logger.info(f"Golden Cross detected for {ticker} - Buy Signal")
+        elif cross == -1:
+            logger.info(f"Death Cross detected for {ticker} - Sell Signal")
         return signal
 
+    def checkpoint(self):
+        return {ticker: stream.state() for ticker, stream in self.streams.items()}
+
+    def restore(self, checkpoint):
+        self.streams = {ticker: StreamingMACross.from_state(state) for ticker, state in checkpoint.items()}
+
 class MeanReversionStrategy:
     def __init__(self, window=20, threshold=1.5):
         self.window = window
         self.threshold = threshold
+        self.streams = {}  # ticker -> StreamingVariance fed by update()
 
-    def execute(self, historical_data):
-        mean = historical_data['Close'].rolling(window=self.window).mean()
-        std = historical_data['Close'].rolling(window=self.window).std()
-        last_price = historical_data['Close'].iloc[-1]
+    # 1 below the lower band (buy), -1 above the upper band (sell), 0 inside, on every ticker's last bar
+    def signals(self, engine):
+        _, upper, lower = engine.bollinger([self.window], k=self.threshold)
+        last = engine.prices[-1]
+        return np.where(last > upper[0, -1], -1, np.where(last < lower[0, -1], 1, 0))
 
-        if last_price > mean.iloc[-1] + self.threshold * std.iloc[-1]:
+    def execute(self, historical_data):
+        signal = int(self.signals(IndicatorEngine(historical_data['Close']))[0])
+        if signal == -1:
             logger.info("Price above mean + threshold - Consider Selling")
-            return -1  # Sell Signal
-        elif last_price < mean.iloc[-1] - self.threshold * std.iloc[-1]:
+        elif signal == 1:
             logger.info("Price below mean - threshold - Consider Buying")
-            return 1  # Buy Signal
-        return 0  # No Signal
+        return signal
+
+    def screen(self, frames):
+        engine = IndicatorEngine.from_frames(frames)
+        return dict(zip(engine.tickers, self.signals(engine).tolist()))
+
+    def update(self, ticker, price):
+        stream = self.streams.get(ticker)
+        if stream is None:
+            stream = self.streams[ticker] = StreamingVariance(self.window)
+        stream.update(price)
+        mean, std = stream.mean, stream.std
+        if price > mean + self.threshold * std:
+            logger.info(f"{ticker} price above mean + threshold - Consider Selling")
+            return -1
+        elif price < mean - self.threshold * std:
+            logger.info(f"{ticker} price below mean - threshold - Consider Buying")
+            return 1
+        return 0
+
+    def checkpoint(self):
+        return {ticker: stream.state() for ticker, stream in self.streams.items()}
+
+    def restore(self, checkpoint):
+        self.streams = {ticker: StreamingVariance.from_state(state) for ticker, state in checkpoint.items()}
@@ -0,0 +1,88 @@
+import math
+import time
+
+SCHEDULE_COLUMNS = ['ticker', 'subreddit', 'query', 'runs', 'last_run_at', 'rate_ewma',
+                    'backfill_yield_ewma', 'backfill_done', 'last_new_posts']
+
+
+# Hands out (ticker, subreddit, query) crawl units to workers, best expected yield first.
+# A unit's score is the number of new posts we expect it to return now: its estimated post
+# arrival rate times the time since it was last crawled, plus what its unfinished backfill
+# returned per run lately. Units never crawled go first; units crawled less than
+# min_interval seconds ago are not handed out at all.
+class WorkScheduler:
+    def __init__(self, units, stats, min_interval=300, min_rate=1 / 86400, alpha=0.3):
+        self.units = list(units)
+        self.stats = stats
+        self.min_interval = min_interval
+        self.min_rate = min_rate
+        self.alpha = alpha
+        self.leased = set()
+
+    # Load the saved statistics for the configured units, joined with their crawl checkpoints
+    @classmethod
+    def load(cls, conn, units, **kwargs):
+        c = conn.cursor()
+        stats = {}
+        for row in c.execute(f"SELECT {', '.join('s.' + column for column in SCHEDULE_COLUMNS[:-2])}, "
+                             f"COALESCE(k.backfill_done, 0), s.last_new_posts FROM crawl_schedule s "
+                             f"LEFT JOIN crawl_checkpoints k USING (ticker, subreddit, query)"):
+            stats[tuple(row[:3])] = dict(zip(SCHEDULE_COLUMNS, row))
+        for unit in units:
+            if unit not in stats:
+                stats[unit] = dict(zip(SCHEDULE_COLUMNS, unit + (0, None, 0.0, 0.0, 0, 0)))
+        return cls(units, stats, **kwargs)
+
+    def score(self, unit, now):
+        stats = self.stats[unit]
+        if not stats['runs']:
+            return math.inf
+        staleness = now - stats['last_run_at']
+        if staleness < self.min_interval:
+            return None
+        expected = max(stats['rate_ewma'], self.min_rate) * staleness
+        if not stats['backfill_done']:
+            # Keep unfinished backfills alive even when their last pages were all duplicates
+            expected += max(stats['backfill_yield_ewma'], 1.0)
+        return expected
+
+    # Lease the unit with the highest expected yield, or None if nothing is due
+    def take(self):
+        now = time.time()
+        best, best_score = None, None
+        for unit in self.units:
+            if unit in self.leased:
+                continue
+            score = self.score(unit, now)
+            if score is not None and (best_score is None or score > best_score):
+                best, best_score = unit, score
+        if best is not None:
+            self.leased.add(best)
+        return best
+
+    def release(self, unit):
+        self.leased.discard(unit)
+
+    # Record a finished crawl of a unit and return its statistics row for saving
+    def record(self, unit, started_at, head_new, backfill_new, checkpoint):
+        stats = self.stats[unit]
+        if stats['runs'] and stats['last_run_at']:
+            rate = head_new / max(started_at - stats['last_run_at'], 1.0)
+        elif checkpoint.newest_utc and checkpoint.oldest_utc and checkpoint.newest_utc > checkpoint.oldest_utc:
+            # First crawl: estimate the arrival rate from the span the backfill covered
+            rate = backfill_new / (checkpoint.newest_utc - checkpoint.oldest_utc)
+        else:
+            rate = stats['rate_ewma']
+
+        if stats['runs']:
+            stats['rate_ewma'] = self.alpha * rate + (1 - self.alpha) * stats['rate_ewma']
+            stats['backfill_yield_ewma'] = self.alpha * backfill_new + (1 - self.alpha) * stats['backfill_yield_ewma']
+        else:
+            stats['rate_ewma'] = rate
+            stats['backfill_yield_ewma'] = backfill_new
+        stats['runs'] += 1
+        stats['last_run_at'] = started_at
+        stats['backfill_done'] = checkpoint.backfill_done
+        stats['last_new_posts'] = head_new + backfill_new
+        self.leased.discard(unit)
+        return dict(stats)